@@ -203,7 +203,7 @@ class GooglePlacesRequest(BaseModel):
         return values
 
     def to_args(self) -> list[str]:
-        args: list[str] = [sys.executable, "-u", os.path.join("etl", "google_places.py")]
+        args: list[str] = [sys.executable, "-u", "-m", "etl.google_places"]
         if self.location:
             args.extend(["--location", self.location])
         if self.lat is not None and self.lng is not None:
@@ -240,7 +240,7 @@ def etl_pipeline_start():
 
 @app.post("/automation/auto_refresh/start")
 def automation_auto_refresh_start():
-    args = [sys.executable, "-u", os.path.join("automation", "auto_refresh.py")]
+    args = [sys.executable, "-u", "-m", "automation.auto_refresh"]
     if not _start_job("auto_refresh", args):
         raise HTTPException(status_code=409, detail="auto_refresh already running")
     return {"status": "started"}
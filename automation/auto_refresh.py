@@ -10,6 +10,10 @@ from dataclasses import dataclass
 import psycopg2
 from dotenv import load_dotenv
 
+from etl.enrich import change_index
+from etl.enrich.client import load_client_from_env
+from etl.enrich.runner import EnrichmentRunner
+
 logger = logging.getLogger("automation.auto_refresh")
 
 
@@ -41,6 +45,9 @@ class StalenessReport:
     enrichment_candidates: int
     metrics_missing: int
     metrics_stale: int
+    enrichment_missing: int = 0
+    enrichment_changed: int = 0
+    enrichment_expired: int = 0
 
     @property
     def metrics_needed(self) -> bool:
@@ -48,18 +55,16 @@ class StalenessReport:
 
 
 def compute_staleness(conn: psycopg2.extensions.connection, ttl_days: int) -> StalenessReport:
+    """Count enrichment candidates through the change index, plus missing/stale metrics.
+
+    The index is refreshed first, so businesses whose name, website, types or
+    location changed since their last completed enrichment count even when
+    their facts are younger than ``ttl_days``.
+    """
+    change_index.refresh(conn)
+    conn.commit()
+    enrichment = change_index.count_stale(conn, ttl_days)
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT COUNT(*)
-            FROM places_clean p
-            LEFT JOIN business_facts bf ON bf.business_id = p.place_id
-            WHERE bf.business_id IS NULL OR bf.updated_at < now() - %s::interval
-            """,
-            (f"{ttl_days} days",),
-        )
-        enrichment_candidates = int(cur.fetchone()[0])
-
         cur.execute(
             """
             SELECT
@@ -82,9 +87,12 @@ def compute_staleness(conn: psycopg2.extensions.connection, ttl_days: int) -> St
         metrics_stale = int(row[1] or 0)
 
     return StalenessReport(
-        enrichment_candidates=enrichment_candidates,
+        enrichment_candidates=sum(enrichment.values()),
         metrics_missing=metrics_missing,
         metrics_stale=metrics_stale,
+        enrichment_missing=enrichment["missing"],
+        enrichment_changed=enrichment["changed"],
+        enrichment_expired=enrichment["expired"],
     )
 
 
@@ -98,6 +106,28 @@ def run_enrichment(limit: int, ttl_days: int | None, force: bool) -> None:
     subprocess.run(cmd, check=True)
 
 
+def log_enrichment_forecast(pg: dict[str, str], report: StalenessReport, ttl_days: int, args: argparse.Namespace) -> None:
+    """Log the tokens, cost and duration the enrichment loop would need (no provider calls)."""
+    if args.max_enrich_batches:
+        limit = args.enrich_limit * args.max_enrich_batches
+        if not args.force_enrichment:
+            limit = min(limit, report.enrichment_candidates)
+    else:
+        limit = report.enrichment_candidates if not args.force_enrichment else args.enrich_limit
+    try:
+        client = load_client_from_env(logger)
+    except ValueError as exc:
+        # A dry run never calls the provider: missing credentials only lose model pricing.
+        logger.warning("LLM client not configured (%s); forecasting without model pricing", exc)
+        client = None
+    runner = EnrichmentRunner(pg=pg, client=client)
+    forecast = runner.forecast(limit=limit, force=args.force_enrichment, ttl_days=ttl_days)
+    if forecast is None:
+        logger.info("Forecast: no businesses to enrich")
+        return
+    forecast.log_summary(logger)
+
+
 def run_metrics_builder() -> None:
     cmd = [sys.executable, "-m", "feature_builder.build_metrics"]
     logger.info("Launching metrics builder: %s", " ".join(cmd))
@@ -138,9 +168,13 @@ def run_enrichment_batches(
             current_report = compute_staleness(conn, ttl_days)
         remaining = current_report.enrichment_candidates
         logger.info(
-            "Staleness after batch %d -> enrichment_candidates=%d, metrics_missing=%d, metrics_stale=%d",
+            "Staleness after batch %d -> enrichment_candidates=%d (missing=%d changed=%d expired=%d), "
+            "metrics_missing=%d, metrics_stale=%d",
             batch,
             current_report.enrichment_candidates,
+            current_report.enrichment_missing,
+            current_report.enrichment_changed,
+            current_report.enrichment_expired,
             current_report.metrics_missing,
             current_report.metrics_stale,
         )
@@ -167,7 +201,7 @@ def parse_args() -> argparse.Namespace:
         "--enrich-ttl-days",
         type=int,
         default=None,
-        help="Override TTL in days for enrichment staleness checks.",
+        help="Override TTL in days for unchanged businesses (changed ones are picked up by the change index).",
     )
     parser.add_argument(
         "--force-enrichment",
@@ -210,7 +244,7 @@ def main() -> int:
 
     logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s")
 
-    ttl_env = os.getenv("ENRICHMENT_TTL_DAYS", "30")
+    ttl_env = os.getenv("ENRICHMENT_TTL_DAYS", "180")
     ttl_override = args.enrich_ttl_days or os.getenv("AUTO_REFRESH_ENRICH_TTL")
     ttl_days = int(ttl_override or ttl_env)
 
@@ -223,8 +257,11 @@ def main() -> int:
         return 1
 
     logger.info(
-        "Staleness report — enrichment:%d metrics_missing:%d metrics_stale:%d",
+        "Staleness report — enrichment:%d (missing:%d changed:%d expired:%d) metrics_missing:%d metrics_stale:%d",
         report.enrichment_candidates,
+        report.enrichment_missing,
+        report.enrichment_changed,
+        report.enrichment_expired,
         report.metrics_missing,
         report.metrics_stale,
     )
@@ -238,6 +275,12 @@ def main() -> int:
             "yes" if should_run_enrichment else "no",
             "yes" if should_run_metrics else "no",
         )
+        if should_run_enrichment:
+            try:
+                log_enrichment_forecast(pg, report, ttl_days, args)
+            except psycopg2.Error as exc:
+                logger.error("Failed to compute the enrichment forecast: %s", exc)
+                return 1
         return 0
 
     try:
@@ -255,7 +298,7 @@ def main() -> int:
             if not args.force_enrichment:
                 logger.info("Remaining enrichment candidates after loop: %d", report.enrichment_candidates)
         else:
-            logger.info("Skipping enrichment: data is within TTL.")
+            logger.info("Skipping enrichment: no new or changed businesses and data is within TTL.")
             logger.info("Tip: usa --force-enrichment oppure abbassa ENRICHMENT_TTL_DAYS/--enrich-ttl-days per forzare un nuovo giro.")
 
         if should_run_metrics and not (args.metrics_each_batch and metrics_ran_during_batches):
@@ -0,0 +1 @@
+"""Benchmarks for the enrichment pipeline (not used at runtime)."""
@@ -0,0 +1,361 @@
+"""Throughput benchmark for ``EnrichmentRunner`` against the local mock LLM.
+
+Seeds a synthetic ``places_raw`` / ``places_clean`` dataset (place ids
+prefixed ``bench_``), then for every combination of ``--workers`` and
+``--batch-sizes`` clears the enrichment state, plans and works the whole
+backlog against ``benchmarks.mock_llm_server`` and reports businesses/s,
+provider-call and request latency percentiles, and cumulative DB time vs.
+provider time. Use a scratch database with the project schema applied: the
+benchmark refuses to run when ``places_clean`` holds non-benchmark rows.
+
+    BENCHMARK_POSTGRES_DB=ct_bench python -m benchmarks.enrichment_throughput \\
+        --businesses 500 --workers 1,4,8 --batch-sizes 1,5 --latency-ms 300 --rate-429 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+from benchmarks.mock_llm_server import add_mock_arguments, config_from_args, start_server
+from etl.enrich.client import CompletionResult, LLMClient, OpenAIChatClient
+from etl.enrich.ratelimit import RateLimiter
+from etl.enrich.runner import EnrichmentRunner
+
+PREFIX = "bench_"
+CATEGORIES = ["bar", "pizzeria", "gelateria", "supermarket", "pharmacy", "hairdresser", "restaurant", "bakery"]
+CITIES = [("Milano", 45.4642, 9.19), ("Torino", 45.0703, 7.6869), ("Bologna", 44.4949, 11.3426)]
+TYPES = ["point_of_interest", "establishment", "food", "store"]
+
+
+class Timer:
+    """Thread-safe accumulator of durations in seconds."""
+
+    def __init__(self) -> None:
+        self.samples: list[float] = []
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples = []
+
+    @property
+    def total(self) -> float:
+        with self._lock:
+            return sum(self.samples)
+
+
+DB_TIMER = Timer()
+_TIMED_CURSORS: dict[type, type] = {}
+
+
+def _timed_cursor(base: type) -> type:
+    if base not in _TIMED_CURSORS:
+
+        class TimedCursor(base):  # type: ignore[misc, valid-type]
+            def execute(self, query: Any, vars: Any = None) -> Any:  # noqa: A002
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    DB_TIMER.add(time.perf_counter() - started)
+
+        _TIMED_CURSORS[base] = TimedCursor
+    return _TIMED_CURSORS[base]
+
+
+class TimedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors (any ``cursor_factory``) and commits add to ``DB_TIMER``."""
+
+    def cursor(self, *args: Any, **kwargs: Any) -> Any:
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _timed_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self) -> None:
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            DB_TIMER.add(time.perf_counter() - started)
+
+
+class TimedClient(LLMClient):
+    """Delegating client that records the duration of every provider call."""
+
+    def __init__(self, inner: LLMClient) -> None:
+        self.inner = inner
+        self.calls = Timer()
+        self.transport_stats = getattr(inner, "transport_stats", None)
+        self.label = getattr(inner, "label", "LLM")
+
+    def complete(self, *, prompt: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> CompletionResult:
+        started = time.perf_counter()
+        try:
+            return self.inner.complete(prompt=prompt, temperature=temperature, max_tokens=max_tokens)
+        finally:
+            self.calls.add(time.perf_counter() - started)
+
+
+def build_pg_config() -> dict[str, Any]:
+    return {
+        "host": os.getenv("BENCHMARK_POSTGRES_HOST") or os.getenv("POSTGRES_HOST", "localhost"),
+        "port": os.getenv("BENCHMARK_POSTGRES_PORT") or os.getenv("POSTGRES_PORT", "5432"),
+        "dbname": os.getenv("BENCHMARK_POSTGRES_DB") or os.getenv("POSTGRES_DB"),
+        "user": os.getenv("BENCHMARK_POSTGRES_USER") or os.getenv("POSTGRES_USER"),
+        "password": os.getenv("BENCHMARK_POSTGRES_PASSWORD") or os.getenv("POSTGRES_PASSWORD"),
+    }
+
+
+def seed_places(conn: psycopg2.extensions.connection, count: int, seed: int) -> None:
+    """Replace the benchmark rows with ``count`` synthetic businesses (deterministic for ``seed``)."""
+    rng = random.Random(seed)
+    raw_rows, clean_rows = [], []
+    for idx in range(count):
+        place_id = f"{PREFIX}{idx:06d}"
+        category = CATEGORIES[idx % len(CATEGORIES)]
+        city, lat, lon = CITIES[idx % len(CITIES)]
+        lat += rng.uniform(-0.05, 0.05)
+        lon += rng.uniform(-0.05, 0.05)
+        name = f"{category.title()} Bench {idx}"
+        address = f"Via Prova {rng.randint(1, 200)}, {city}"
+        rating = round(rng.uniform(3.0, 5.0), 1)
+        reviews = rng.randint(0, 2000)
+        has_phone, has_website = rng.random() < 0.8, rng.random() < 0.5
+        website = f"https://www.bench{idx}.example.it" if has_website else None
+        types = [category, *rng.sample(TYPES, 2)]
+        raw_rows.append((place_id, name, address, "+39 02 0000" if has_phone else None, website, types, rating, reviews, lon, lat))
+        clean_rows.append((place_id, name, address, city, category, rating, reviews, rng.randint(20, 90), has_phone, has_website, lon, lat))
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM places_clean WHERE place_id LIKE %s", (PREFIX + "%",))
+        cur.execute("DELETE FROM places_raw WHERE place_id LIKE %s", (PREFIX + "%",))
+        execute_values(
+            cur,
+            """
+            INSERT INTO places_raw (place_id, name, formatted_address, phone, website, types, rating,
+                                    user_ratings_total, location)
+            VALUES %s
+            """,
+            raw_rows,
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography)",
+        )
+        execute_values(
+            cur,
+            """
+            INSERT INTO places_clean (place_id, name, address, city, category, rating, user_ratings_total,
+                                      hours_weekly, has_phone, has_website, location)
+            VALUES %s
+            """,
+            clean_rows,
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography)",
+        )
+    conn.commit()
+
+
+def reset_enrichment(conn: psycopg2.extensions.connection) -> None:
+    with conn.cursor() as cur:
+        for table, column in (
+            ("enrichment_request", "business_id"),
+            ("business_facts", "business_id"),
+            ("enrichment_change_index", "business_id"),
+        ):
+            cur.execute(f"DELETE FROM {table} WHERE {column} LIKE %s", (PREFIX + "%",))
+        cur.execute("DELETE FROM enrichment_brand_cache")
+    conn.commit()
+
+
+def request_latencies(conn: psycopg2.extensions.connection) -> list[float]:
+    """Claim-to-persist time of every completed benchmark request, in seconds."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT EXTRACT(EPOCH FROM finished_at - started_at)
+            FROM enrichment_request
+            WHERE business_id LIKE %s AND status = 'completed' AND started_at IS NOT NULL
+            """,
+            (PREFIX + "%",),
+        )
+        return [float(row[0]) for row in cur.fetchall()]
+
+
+def _percentile(values: list[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+@dataclass
+class BenchResult:
+    workers: int
+    batch_size: int
+    businesses: int
+    completed: int
+    failed: int
+    plan_s: float
+    work_s: float
+    businesses_per_s: float
+    provider_calls: int
+    provider_s: float
+    db_s: float
+    call_ms: dict[str, Optional[float]] = field(default_factory=dict)
+    request_ms: dict[str, Optional[float]] = field(default_factory=dict)
+    mock: dict[str, int] = field(default_factory=dict)
+
+
+def _ms_percentiles(values: list[float]) -> dict[str, Optional[float]]:
+    out = {}
+    for pct in (50, 95, 99):
+        value = _percentile(values, pct)
+        out[f"p{pct}"] = None if value is None else round(value * 1000, 1)
+    return out
+
+
+def run_case(pg: dict[str, Any], url: str, mock, *, workers: int, batch_size: int, businesses: int) -> BenchResult:
+    timed_pg = {**pg, "connection_factory": TimedConnection}
+    with psycopg2.connect(**pg) as conn:
+        reset_enrichment(conn)
+    client = TimedClient(OpenAIChatClient("benchmark", endpoint=url, pool_size=max(10, workers)))
+    runner = EnrichmentRunner(
+        timed_pg,
+        client,
+        provider_name="openai",
+        workers=workers,
+        rate_limiter=RateLimiter(None),
+        reuse_responses=False,
+        use_brand_cache=False,
+        batch_size=batch_size,
+    )
+    mock_before = mock.stats.as_dict()
+    DB_TIMER.reset()
+    started = time.perf_counter()
+    runner.plan(limit=businesses, force=True)
+    plan_s = time.perf_counter() - started
+    DB_TIMER.reset()
+    started = time.perf_counter()
+    stats = runner.work(limit=businesses)
+    work_s = time.perf_counter() - started
+    db_s = DB_TIMER.total
+    with psycopg2.connect(**pg) as conn:
+        latencies = request_latencies(conn)
+    mock_after = mock.stats.as_dict()
+    client.inner.close()
+    return BenchResult(
+        workers=workers,
+        batch_size=batch_size,
+        businesses=businesses,
+        completed=stats.completed,
+        failed=stats.failed,
+        plan_s=round(plan_s, 3),
+        work_s=round(work_s, 3),
+        businesses_per_s=round(stats.completed / max(work_s, 1e-6), 2),
+        provider_calls=len(client.calls.samples),
+        provider_s=round(client.calls.total, 3),
+        db_s=round(db_s, 3),
+        call_ms=_ms_percentiles(client.calls.samples),
+        request_ms=_ms_percentiles(latencies),
+        mock={key: mock_after[key] - mock_before[key] for key in mock_after},
+    )
+
+
+def print_results(results: list[BenchResult]) -> None:
+    header = (
+        f"{'workers':>7}{'batch':>6}{'done':>7}{'fail':>6}{'biz/s':>8}{'calls':>7}"
+        f"{'call p50':>9}{'p95':>7}{'p99':>7}{'req p50':>9}{'p95':>7}{'p99':>7}"
+        f"{'provider s':>11}{'db s':>8}{'plan s':>8}"
+    )
+    print(header)
+
+    def fmt(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.0f}"
+
+    for res in results:
+        print(
+            f"{res.workers:>7}{res.batch_size:>6}{res.completed:>7}{res.failed:>6}{res.businesses_per_s:>8.1f}"
+            f"{res.provider_calls:>7}{fmt(res.call_ms['p50']):>9}{fmt(res.call_ms['p95']):>7}{fmt(res.call_ms['p99']):>7}"
+            f"{fmt(res.request_ms['p50']):>9}{fmt(res.request_ms['p95']):>7}{fmt(res.request_ms['p99']):>7}"
+            f"{res.provider_s:>11.1f}{res.db_s:>8.1f}{res.plan_s:>8.2f}"
+        )
+    print("\nprovider s / db s: cumulative time over all workers spent in provider calls / in Postgres (work phase).")
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure enrichment throughput against the local mock LLM.")
+    parser.add_argument("--businesses", type=int, default=200, help="Synthetic businesses to seed and enrich.")
+    parser.add_argument("--workers", type=_int_list, default=[1, 4], help="Comma-separated worker counts.")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1], help="Comma-separated batch sizes.")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON (for regression comparisons).")
+    parser.add_argument("--keep", action="store_true", help="Leave the benchmark rows in the database.")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the runner during the benchmark.")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    if args.seed is None:
+        args.seed = 42
+    return args
+
+
+def main() -> int:
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s")
+    pg = build_pg_config()
+    with psycopg2.connect(**pg) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM places_clean WHERE place_id NOT LIKE %s", (PREFIX + "%",))
+            foreign = cur.fetchone()[0]
+        if foreign:
+            print(
+                f"places_clean in database {pg['dbname']} holds {foreign} non-benchmark rows; "
+                "point BENCHMARK_POSTGRES_DB to a scratch database.",
+                file=sys.stderr,
+            )
+            return 2
+        seed_places(conn, args.businesses, args.seed)
+
+    server, mock, url = start_server(config_from_args(args))
+    results = []
+    try:
+        for workers in args.workers:
+            for batch_size in args.batch_sizes:
+                results.append(
+                    run_case(pg, url, mock, workers=workers, batch_size=batch_size, businesses=args.businesses)
+                )
+    finally:
+        server.shutdown()
+        if not args.keep:
+            with psycopg2.connect(**pg) as conn:
+                reset_enrichment(conn)
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM places_clean WHERE place_id LIKE %s", (PREFIX + "%",))
+                    cur.execute("DELETE FROM places_raw WHERE place_id LIKE %s", (PREFIX + "%",))
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump([asdict(res) for res in results], fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Local stand-in for the OpenAI / Perplexity chat completions API.
+
+Answers enrichment prompts (single and batched, plain or ``stream: true``)
+with schema-shaped JSON for every ``Identificativo interno`` found in the
+prompt, after a latency drawn from a configurable distribution. A share of
+the calls can fail with 429/500 or return malformed output (prose around
+the JSON, a truncated answer or plain text), so retries, JSON repair and
+batching can be exercised without paying for real calls.
+
+    python -m benchmarks.mock_llm_server --port 8099 --latency-ms 800 --latency-dist lognormal
+    OPENAI_ENDPOINT=http://127.0.0.1:8099/v1/chat/completions OPENAI_API_KEY=x LLM_PROVIDER=openai \\
+        python -m etl.enrich.run_enrichment --limit 100
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+PLACE_ID_RE = re.compile(r"Identificativo interno: (\S+)")
+BATCH_MARKER = "Attivita da arricchire:"
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+MALFORMED_KINDS = ("prose", "truncated", "text")
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 500.0
+    latency_dist: str = "lognormal"
+    # Spread: +/- range for uniform, standard deviation (as a fraction of the
+    # mean) for normal and lognormal; ignored by fixed and exponential.
+    latency_spread: float = 0.5
+    # Extra time per generated token, so batched answers take longer.
+    ms_per_token: float = 0.0
+    rate_429: float = 0.0
+    rate_500: float = 0.0
+    malformed_rate: float = 0.0
+    completion_tokens: int = 150
+    model: str = "mock-1"
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockStats:
+    calls: int = 0
+    businesses: int = 0
+    errors_429: int = 0
+    errors_500: int = 0
+    malformed: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "businesses": self.businesses,
+                "errors_429": self.errors_429,
+                "errors_500": self.errors_500,
+                "malformed": self.malformed,
+            }
+
+
+class MockLLM:
+    """Generates latencies, failures and answers for one server."""
+
+    def __init__(self, config: MockConfig) -> None:
+        if config.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{config.latency_dist}'")
+        self.config = config
+        self.stats = MockStats()
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def _draw(self, kind: str, *args: float) -> float:
+        with self._lock:
+            return getattr(self._random, kind)(*args)
+
+    def latency_seconds(self, completion_tokens: int) -> float:
+        cfg = self.config
+        mean = cfg.latency_ms
+        if cfg.latency_dist == "fixed":
+            value = mean
+        elif cfg.latency_dist == "uniform":
+            value = self._draw("uniform", mean * (1 - cfg.latency_spread), mean * (1 + cfg.latency_spread))
+        elif cfg.latency_dist == "normal":
+            value = self._draw("gauss", mean, mean * cfg.latency_spread)
+        elif cfg.latency_dist == "lognormal":
+            # Parameters chosen so the distribution mean is ``mean``.
+            sigma = cfg.latency_spread
+            value = self._draw("lognormvariate", 0.0, sigma) * mean / (2.718281828 ** (sigma * sigma / 2))
+        else:
+            value = self._draw("expovariate", 1 / mean) if mean > 0 else 0.0
+        return max(0.0, value + cfg.ms_per_token * completion_tokens) / 1000
+
+    def failure(self) -> Optional[int]:
+        roll = self._draw("random")
+        if roll < self.config.rate_429:
+            return 429
+        if roll < self.config.rate_429 + self.config.rate_500:
+            return 500
+        return None
+
+    def _facts(self, place_id: str) -> dict[str, Any]:
+        slug = re.sub(r"[^a-z0-9]+", "", place_id.lower()) or "attivita"
+        # Pad the reasoning so the answer is about ``completion_tokens`` long.
+        filler = "Locale di quartiere con clientela abituale. " * max(1, self.config.completion_tokens // 12)
+        return {
+            "size_class": None,
+            "is_chain": None,
+            "website_url": f"https://www.{slug}.example.it",
+            "social": {"instagram": f"https://www.instagram.com/{slug}"},
+            "marketing_attitude": None,
+            "umbrella_affinity": None,
+            "ad_budget_band": None,
+            "confidence": None,
+            "provenance": {"reasoning": filler.strip(), "citations": [f"https://www.{slug}.example.it"]},
+        }
+
+    def answer(self, prompt: str) -> str:
+        place_ids = PLACE_ID_RE.findall(prompt) or ["sconosciuto"]
+        self.stats.add("businesses", len(place_ids))
+        if BATCH_MARKER in prompt:
+            text = json.dumps([{"place_id": pid, **self._facts(pid)} for pid in place_ids], ensure_ascii=False)
+        else:
+            text = json.dumps(self._facts(place_ids[0]), ensure_ascii=False)
+        if self._draw("random") < self.config.malformed_rate:
+            self.stats.add("malformed")
+            kind = MALFORMED_KINDS[int(self._draw("random") * len(MALFORMED_KINDS))]
+            if kind == "prose":
+                text = f"Ecco il risultato richiesto:\n```json\n{text}\n```\nFammi sapere se serve altro."
+            elif kind == "truncated":
+                text = text[: max(1, int(len(text) * 0.8))]
+            else:
+                text = "Non ho trovato informazioni affidabili su questa attivita."
+        return text
+
+
+def make_handler(mock: MockLLM) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            pass
+
+        def _send_json(self, status: int, body: dict[str, Any], headers: Optional[dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_chunk(self, payload: dict[str, Any] | str) -> None:
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            raw = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+            self.wfile.flush()
+
+        def do_POST(self) -> None:  # noqa: N802
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                prompt = request["messages"][-1]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                self._send_json(400, {"error": {"message": "invalid request"}})
+                return
+            mock.stats.add("calls")
+            status = mock.failure()
+            if status is not None:
+                mock.stats.add("errors_429" if status == 429 else "errors_500")
+                time.sleep(mock.latency_seconds(0) / 4)
+                headers = {"Retry-After": "1"} if status == 429 else None
+                self._send_json(status, {"error": {"message": f"mock error {status}"}}, headers)
+                return
+
+            text = mock.answer(prompt)
+            prompt_tokens = max(1, len(prompt) // 4)
+            completion_tokens = max(1, len(text) // 4)
+            time.sleep(mock.latency_seconds(completion_tokens))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+            if not request.get("stream"):
+                self._send_json(
+                    200,
+                    {
+                        "model": mock.config.model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    },
+                )
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for start in range(0, len(text), 16):
+                    delta = {"content": text[start : start + 16]}
+                    self._send_chunk({"model": mock.config.model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                self._send_chunk({"model": mock.config.model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage})
+                self._send_chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream early once its JSON was complete.
+                self.close_connection = True
+
+    return Handler
+
+
+def start_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, MockLLM, str]:
+    """Serve in a daemon thread; returns the server, its state and the chat completions URL."""
+    mock = MockLLM(config)
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server, mock, f"http://{host}:{server.server_port}/v1/chat/completions"
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Mean response latency.")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-spread", type=float, default=0.5,
+                        help="Spread of the latency distribution (fraction of the mean).")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Extra latency per completion token.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of calls answered with 429.")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="Share of calls answered with 500.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Share of answers with prose around the JSON, truncated JSON or plain text.")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Approximate answer length per business.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latencies, failures and malformed answers.")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        latency_spread=args.latency_spread,
+        ms_per_token=args.ms_per_token,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        malformed_rate=args.malformed_rate,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server for enrichment tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    server, mock, url = start_server(config_from_args(args), host=args.host, port=args.port)
+    print(f"Mock LLM listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(mock.stats.as_dict()))
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
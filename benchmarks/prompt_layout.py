@@ -0,0 +1,202 @@
+"""Compare the legacy prompt layout with the cache-friendly one.
+
+Offline it measures prompt build time, prompt size and the prefix shared by
+consecutive prompts (what a provider prompt cache can reuse). With ``--live``
+it also sends both layouts, interleaved, to the provider configured in
+``.env`` (LLM_PROVIDER, or a stub via OPENAI_ENDPOINT / PERPLEXITY_ENDPOINT)
+and reports billed prompt tokens, cached tokens, cost and latency.
+
+    python -m benchmarks.prompt_layout --samples 200
+    python -m benchmarks.prompt_layout --samples 20 --live
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping, Optional
+
+from dotenv import load_dotenv
+
+from etl.enrich.client import load_client_from_env
+from etl.enrich.prompts import (
+    COMMON_RULES,
+    INTRO,
+    SCHEMA_EXAMPLE,
+    SINGLE_OUTPUT_RULE,
+    _business_lines,
+    build_prompt,
+    estimate_tokens,
+    prompt_prefix,
+)
+
+CATEGORIES = ["bar", "pizzeria", "gelateria", "supermarket", "pharmacy", "hairdresser", "restaurant", "bakery"]
+CITIES = [("Milano", 45.4642, 9.19), ("Torino", 45.0703, 7.6869), ("Bologna", 44.4949, 11.3426)]
+# OpenAI only caches prompts of at least this many tokens (system prompt included).
+CACHE_MIN_TOKENS = 1024
+
+
+def legacy_prompt(business: Mapping[str, Any]) -> str:
+    """Layout used up to prompt version 2: business details first, schema re-serialized per call."""
+    schema_block = json.dumps(SCHEMA_EXAMPLE, ensure_ascii=False, indent=2)
+    rules = "Regole:\n" + "\n".join(f"- {rule}" for rule in [SINGLE_OUTPUT_RULE, *COMMON_RULES])
+    return "\n\n".join(
+        [
+            f"{INTRO}\n"
+            "Devi arricchire le informazioni dell'attivita descritta qui sotto, partendo dai dati Google Places, "
+            "compilando *solo* i campi dello schema dati.",
+            "Attivita:\n" + "\n".join(_business_lines(business)),
+            rules,
+            f"Schema esempio:\n{schema_block}",
+        ]
+    )
+
+
+LAYOUTS: dict[str, Callable[[Mapping[str, Any]], str]] = {"legacy": legacy_prompt, "cached-prefix": build_prompt}
+
+
+def sample_businesses(count: int) -> list[dict[str, Any]]:
+    businesses = []
+    for idx in range(count):
+        category = CATEGORIES[idx % len(CATEGORIES)]
+        city, lat, lon = CITIES[idx % len(CITIES)]
+        businesses.append(
+            {
+                "place_id": f"bench{idx:05d}",
+                "name": f"{category.title()} Prova {idx}",
+                "category": category,
+                "address": f"Via Roma {idx + 1}",
+                "city": city,
+                "types": [category, "point_of_interest", "establishment"],
+                "rating": 3.5 + (idx % 15) / 10,
+                "user_ratings_total": 10 + idx,
+                "has_phone": idx % 2 == 0,
+                "has_website": idx % 3 == 0,
+                "latitude": lat + idx * 1e-4,
+                "longitude": lon - idx * 1e-4,
+                "search_radius_m": 200,
+            }
+        )
+    return businesses
+
+
+def _common_prefix(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    idx = 0
+    while idx < limit and a[idx] == b[idx]:
+        idx += 1
+    return idx
+
+
+@dataclass
+class LayoutReport:
+    name: str
+    build_us: list[float] = field(default_factory=list)
+    prompt_chars: list[int] = field(default_factory=list)
+    prompt_tokens_est: list[int] = field(default_factory=list)
+    shared_prefix_chars: list[int] = field(default_factory=list)
+    latency_ms: list[float] = field(default_factory=list)
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cost_cents: float = 0.0
+    calls: int = 0
+    errors: int = 0
+
+
+def measure_offline(name: str, layout: Callable[[Mapping[str, Any]], str], businesses: list[dict[str, Any]]) -> tuple[LayoutReport, list[str]]:
+    report = LayoutReport(name=name)
+    prompts = []
+    previous: Optional[str] = None
+    for business in businesses:
+        started = time.perf_counter()
+        prompt = layout(business)
+        report.build_us.append((time.perf_counter() - started) * 1_000_000)
+        report.prompt_chars.append(len(prompt))
+        report.prompt_tokens_est.append(estimate_tokens(prompt))
+        if previous is not None:
+            report.shared_prefix_chars.append(_common_prefix(previous, prompt))
+        previous = prompt
+        prompts.append(prompt)
+    return report, prompts
+
+
+def measure_live(reports: dict[str, LayoutReport], prompts: dict[str, list[str]]) -> None:
+    client = load_client_from_env()
+    if client is None:
+        raise SystemExit("LLM_PROVIDER is not configured; cannot run --live")
+    count = len(next(iter(prompts.values())))
+    for idx in range(count):
+        for name, report in reports.items():
+            started = time.perf_counter()
+            try:
+                result = client.complete(prompt=prompts[name][idx])
+            except Exception as exc:  # noqa: BLE001
+                report.errors += 1
+                print(f"[{name}] call {idx} failed: {exc}", file=sys.stderr)
+                continue
+            report.latency_ms.append((time.perf_counter() - started) * 1000)
+            report.calls += 1
+            report.prompt_tokens += result.prompt_tokens or 0
+            report.cached_tokens += result.cached_tokens or 0
+            report.cost_cents += result.cost_cents or 0.0
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def print_report(reports: dict[str, LayoutReport], live: bool) -> None:
+    print(f"{'layout':<15}{'build us':>10}{'chars':>8}{'est tok':>9}{'shared prefix':>15}{'cacheable':>11}")
+    for report in reports.values():
+        chars = statistics.mean(report.prompt_chars)
+        shared = statistics.mean(report.shared_prefix_chars) if report.shared_prefix_chars else 0.0
+        print(
+            f"{report.name:<15}{statistics.median(report.build_us):>10.1f}{chars:>8.0f}"
+            f"{statistics.mean(report.prompt_tokens_est):>9.0f}{shared:>15.0f}{shared / chars:>10.0%}"
+        )
+    print()
+    for batch in (False, True):
+        tokens = estimate_tokens(prompt_prefix(batch))
+        verdict = "cacheable" if tokens >= CACHE_MIN_TOKENS else f"below the {CACHE_MIN_TOKENS}-token cache minimum"
+        print(f"{'batch' if batch else 'single'} static prefix: ~{tokens} tokens ({verdict})")
+    if not live:
+        return
+    print()
+    print(f"{'layout':<15}{'calls':>6}{'prompt tok':>12}{'cached tok':>12}{'cost cents':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    for report in reports.values():
+        print(
+            f"{report.name:<15}{report.calls:>6}{report.prompt_tokens:>12}{report.cached_tokens:>12}"
+            f"{report.cost_cents:>12.3f}{_percentile(report.latency_ms, 50):>9.0f}{_percentile(report.latency_ms, 95):>9.0f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark prompt layouts for provider-side prompt caching.")
+    parser.add_argument("--samples", type=int, default=100, help="Number of synthetic businesses.")
+    parser.add_argument("--live", action="store_true", help="Also call the configured provider with both layouts.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+    args = parse_args()
+    businesses = sample_businesses(args.samples)
+    reports: dict[str, LayoutReport] = {}
+    prompts: dict[str, list[str]] = {}
+    for name, layout in LAYOUTS.items():
+        reports[name], prompts[name] = measure_offline(name, layout, businesses)
+    if args.live:
+        measure_live(reports, prompts)
+    print_report(reports, args.live)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 from typing import Any, Dict, Mapping, Optional, Sequence
 
 AFFINITY_RULES: Dict[str, float] = {
@@ -129,11 +130,28 @@ def default_affinity(category: Optional[str], types: Optional[Sequence[str]] = N
     return 0.5
 
 
-def _detect_brand(name: Optional[str]) -> bool:
+# Keywords match whole words only ("pam" in "Pam Panorama", not in
+# "Pampanini"), optionally with a possessive/plural "s" ("McDonald's");
+# the longest keyword wins ("ipercoop" over "coop").
+_CHAIN_KEYWORD_PATTERNS = [
+    (keyword.strip(), re.compile(r"(?<!\w)" + re.escape(keyword.strip()) + r"(?:'?s)?(?!\w)"))
+    for keyword in sorted(CHAIN_KEYWORDS, key=lambda value: len(value.strip()), reverse=True)
+]
+
+
+def detect_brand(name: Optional[str]) -> Optional[str]:
+    """Return the chain keyword matched as whole words in ``name`` (longest match wins), if any."""
     if not name:
-        return False
+        return None
     lowered = name.lower()
-    return any(keyword in lowered for keyword in CHAIN_KEYWORDS)
+    for keyword, pattern in _CHAIN_KEYWORD_PATTERNS:
+        if pattern.search(lowered):
+            return keyword
+    return None
+
+
+def _detect_brand(name: Optional[str]) -> bool:
+    return detect_brand(name) is not None
 
 
 def estimate_is_chain(
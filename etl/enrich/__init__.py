@@ -1,14 +1,16 @@
 """LLM enrichment package for CustomerTarget."""
 
-from .client import load_client_from_env, LLMClient, LLMError
-from .schema import EnrichedFacts, parse_enriched_facts
+from .client import load_client_from_env, HedgedClient, LLMClient, LLMError
+from .schema import EnrichedFacts, parse_enriched_facts, parse_enriched_facts_batch
 from .runner import EnrichmentRunner
 
 __all__ = [
     "load_client_from_env",
+    "HedgedClient",
     "LLMClient",
     "LLMError",
     "EnrichedFacts",
     "parse_enriched_facts",
+    "parse_enriched_facts_batch",
     "EnrichmentRunner",
 ]
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor
+
+from common.business_rules import detect_brand
+
+from .schema import EnrichedFacts
+
+BRAND_CACHE_TTL_DAYS = int(os.getenv("ENRICHMENT_BRAND_CACHE_TTL_DAYS", "90"))
+# A ``site:`` entry is only served once this many distinct businesses produced
+# it: a single business sharing a host with nobody is not a brand.
+MIN_SITE_SOURCES = 2
+# Distinct source businesses remembered per entry (enough to count to MIN_SITE_SOURCES).
+MAX_SOURCE_BUSINESSES = 10
+
+# Hosts shared by unrelated businesses: a website on one of these says nothing
+# about brand identity, so it must never become a cache key.
+SHARED_HOSTS = {
+    "facebook.com",
+    "instagram.com",
+    "linktr.ee",
+    "sites.google.com",
+    "business.site",
+    "wixsite.com",
+    "paginegialle.it",
+    "tripadvisor.it",
+    "tripadvisor.com",
+    "thefork.it",
+    "justeat.it",
+    "deliveroo.it",
+    "glovoapp.com",
+}
+
+
+def _split(url: Optional[str]):
+    if not url:
+        return None
+    value = url.strip()
+    if "://" not in value:
+        value = "https://" + value
+    parts = urlsplit(value)
+    return parts if parts.hostname else None
+
+
+def _host(url: Optional[str]) -> Optional[str]:
+    parts = _split(url)
+    if parts is None:
+        return None
+    host = parts.hostname.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _is_shared_host(host: str) -> bool:
+    return any(host == shared or host.endswith("." + shared) for shared in SHARED_HOSTS)
+
+
+def _same_site(host: str, other: str) -> bool:
+    return host == other or host.endswith("." + other) or other.endswith("." + host)
+
+
+def site_root(url: Optional[str]) -> Optional[str]:
+    """Reduce a branch URL (e.g. ``conad.it/negozi/123``) to the brand home page."""
+    parts = _split(url)
+    if parts is None or _is_shared_host(_host(url) or ""):
+        return None
+    return f"{parts.scheme}://{parts.hostname.lower()}/"
+
+
+def brand_key(name: Optional[str], website: Optional[str]) -> Optional[str]:
+    """Normalized identity shared by all storefronts of the same brand.
+
+    Known chains are keyed on the matched ``CHAIN_KEYWORDS`` entry; other
+    businesses are keyed on their Google website host, so duplicate storefronts
+    of the same independent brand share an entry too.
+    """
+    keyword = detect_brand(name)
+    if keyword:
+        return f"brand:{keyword}"
+    host = _host(website)
+    if host and not _is_shared_host(host):
+        return f"site:{host}"
+    return None
+
+
+@dataclass
+class BrandEntry:
+    brand_key: str
+    website_url: Optional[str]
+    social: Optional[dict[str, Any]]
+    source_request_id: Optional[str]
+    source_provider: Optional[str]
+    source_model: Optional[str]
+
+    def matches_website(self, website: Optional[str]) -> bool:
+        """False when the business's own website points to a different site than the entry."""
+        own = _host(website)
+        cached = _host(self.website_url)
+        if not own or not cached or _is_shared_host(own):
+            return True
+        return _same_site(own, cached)
+
+    def to_facts(self) -> EnrichedFacts:
+        """Chain-level facts for a branch; location-specific fields stay null."""
+        citations = [self.website_url] if self.website_url else []
+        return EnrichedFacts.model_validate(
+            {
+                # Only a matched chain keyword says the business is a chain;
+                # sharing a website host does not.
+                "is_chain": True if self.brand_key.startswith("brand:") else None,
+                "website_url": self.website_url,
+                "social": self.social or None,
+                "provenance": {
+                    "reasoning": f"Dati condivisi con le altre sedi dello stesso marchio ({self.brand_key}).",
+                    "citations": citations,
+                    "brand_cache": self.brand_key,
+                },
+            }
+        )
+
+
+def lookup(
+    conn: psycopg2.extensions.connection,
+    key: str,
+    business_id: str,
+    website: Optional[str] = None,
+) -> Optional[BrandEntry]:
+    """Fresh entry for ``key`` usable by ``business_id``, counting the hit.
+
+    Entries last written from the business's own response are skipped (it
+    would only get its previous answer back, without the change that
+    re-queued it), as are ``site:`` entries seen for fewer than
+    MIN_SITE_SOURCES businesses and entries whose site differs from the
+    business's own website.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            SELECT bc.brand_key, bc.website_url, bc.social, bc.source_request_id, bc.source_provider, bc.source_model
+            FROM enrichment_brand_cache bc
+            LEFT JOIN enrichment_request src ON src.request_id = bc.source_request_id
+            WHERE bc.brand_key = %(key)s
+              AND bc.updated_at > now() - make_interval(days => %(ttl)s)
+              AND src.business_id IS DISTINCT FROM %(business_id)s
+              AND (bc.brand_key LIKE 'brand:%%' OR cardinality(bc.source_businesses) >= %(min_sources)s)
+            """,
+            {"key": key, "ttl": BRAND_CACHE_TTL_DAYS, "business_id": business_id, "min_sources": MIN_SITE_SOURCES},
+        )
+        row = cur.fetchone()
+        if not row:
+            return None
+        entry = BrandEntry(**row)
+        if not entry.matches_website(website):
+            return None
+        cur.execute("UPDATE enrichment_brand_cache SET hits = hits + 1 WHERE brand_key = %s", (key,))
+    return entry
+
+
+def store(
+    cur: psycopg2.extensions.cursor,
+    key: str,
+    facts_json: dict[str, Any],
+    request_id: str,
+    provider: str,
+    model: Optional[str],
+    business_id: str,
+) -> None:
+    """Record chain-level facts learned from a paid completion for ``business_id``."""
+    website = site_root(facts_json.get("website_url"))
+    if not website:
+        return
+    social = facts_json.get("social") or None
+    cur.execute(
+        """
+        INSERT INTO enrichment_brand_cache AS bc (
+          brand_key, website_url, social, source_request_id, source_provider, source_model,
+          source_businesses, updated_at
+        )
+        VALUES (%(key)s, %(website)s, %(social)s, %(request_id)s, %(provider)s, %(model)s, ARRAY[%(business_id)s], now())
+        ON CONFLICT (brand_key) DO UPDATE SET
+          website_url = EXCLUDED.website_url,
+          social = COALESCE(EXCLUDED.social, bc.social),
+          source_request_id = EXCLUDED.source_request_id,
+          source_provider = EXCLUDED.source_provider,
+          source_model = EXCLUDED.source_model,
+          source_businesses = CASE
+            WHEN %(business_id)s = ANY(bc.source_businesses)
+              OR cardinality(bc.source_businesses) >= %(max_sources)s
+            THEN bc.source_businesses
+            ELSE array_append(bc.source_businesses, %(business_id)s)
+          END,
+          updated_at = now()
+        """,
+        {
+            "key": key,
+            "website": website,
+            "social": Json(social) if social else None,
+            "request_id": request_id,
+            "provider": provider,
+            "model": model,
+            "business_id": business_id,
+            "max_sources": MAX_SOURCE_BUSINESSES,
+        },
+    )
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional
+
+import psycopg2
+
+from . import dead_letter
+
+logger = logging.getLogger(__name__)
+
+# Current value (places_clean p / places_raw pr) vs. the value sent with the
+# last completed request (input_payload b.payload) for every tracked field.
+# Coordinates are compared at ~10 m so geocoding jitter is not a change;
+# types are compared as sets.
+FIELD_CHANGED_SQL = {
+    "name": "btrim(COALESCE(p.name, '')) IS DISTINCT FROM btrim(COALESCE(b.payload->>'name', ''))",
+    "website": "NULLIF(btrim(pr.website), '') IS DISTINCT FROM NULLIF(btrim(b.payload->>'raw_website'), '')",
+    "types": """NOT (
+          to_jsonb(COALESCE(pr.types, '{}'::text[])) @> COALESCE(b.payload->'types', '[]'::jsonb)
+          AND to_jsonb(COALESCE(pr.types, '{}'::text[])) <@ COALESCE(b.payload->'types', '[]'::jsonb)
+        )""",
+    "location": """(
+          round(ST_Y(p.location::geometry)::numeric, 4) IS DISTINCT FROM round((b.payload->>'latitude')::numeric, 4)
+          OR round(ST_X(p.location::geometry)::numeric, 4) IS DISTINCT FROM round((b.payload->>'longitude')::numeric, 4)
+        )""",
+}
+DEFAULT_TRACKED_FIELDS = ("name", "website", "types", "location")
+
+
+def tracked_fields() -> list[str]:
+    """Fields whose change re-queues a business (ENRICHMENT_CHANGE_FIELDS, comma-separated)."""
+    raw = os.getenv("ENRICHMENT_CHANGE_FIELDS")
+    fields = [part.strip().lower() for part in raw.split(",")] if raw else list(DEFAULT_TRACKED_FIELDS)
+    unknown = [name for name in fields if name not in FIELD_CHANGED_SQL]
+    if unknown:
+        raise ValueError(f"Unsupported ENRICHMENT_CHANGE_FIELDS entries: {', '.join(unknown)}")
+    return [name for name in fields if name]
+
+
+REFRESH_SQL = """
+    INSERT INTO enrichment_change_index AS ci (
+      business_id, baseline_request_id, changed_fields, detected_at, checked_at
+    )
+    SELECT
+      p.place_id,
+      b.request_id,
+      CASE WHEN b.request_id IS NULL THEN '{{}}'::text[] ELSE ARRAY_REMOVE(ARRAY[{diff}]::text[], NULL) END,
+      now(),
+      now()
+    FROM places_clean p
+    JOIN places_raw pr ON pr.place_id = p.place_id
+    LEFT JOIN LATERAL (
+      SELECT r.request_id, r.input_payload AS payload
+      FROM enrichment_request r
+      WHERE r.business_id = p.place_id AND r.status = 'completed'
+      ORDER BY r.finished_at DESC NULLS LAST
+      LIMIT 1
+    ) b ON TRUE
+    ON CONFLICT (business_id) DO UPDATE
+    SET baseline_request_id = EXCLUDED.baseline_request_id,
+        changed_fields = EXCLUDED.changed_fields,
+        detected_at = CASE
+          WHEN ci.changed_fields = EXCLUDED.changed_fields THEN ci.detected_at
+          ELSE EXCLUDED.detected_at
+        END,
+        checked_at = EXCLUDED.checked_at
+    WHERE ci.baseline_request_id IS DISTINCT FROM EXCLUDED.baseline_request_id
+       OR ci.changed_fields IS DISTINCT FROM EXCLUDED.changed_fields
+"""
+
+# Businesses that need a (new) enrichment: never enriched, a tracked field
+# changed since the last completed request, or facts older than the TTL.
+# Expects ``bf`` (business_facts) and ``ci`` (enrichment_change_index) joined.
+STALE_PREDICATE = """
+    bf.business_id IS NULL
+    OR cardinality(ci.changed_fields) > 0
+    OR bf.updated_at < now() - make_interval(days => %(ttl_days)s)
+"""
+
+
+def refresh(conn: psycopg2.extensions.connection, fields: Optional[list[str]] = None) -> int:
+    """Recompute the field-level diff of every business against its last completed request.
+
+    Only rows whose baseline or diff changed are written. Returns that
+    number; the caller commits.
+    """
+    fields = tracked_fields() if fields is None else fields
+    if fields:
+        diff = ", ".join(
+            f"CASE WHEN {FIELD_CHANGED_SQL[name]} THEN '{name}' END" for name in fields
+        )
+    else:
+        diff = "NULL"
+    with conn.cursor() as cur:
+        cur.execute(REFRESH_SQL.format(diff=diff))
+        updated = cur.rowcount
+    logger.debug("Change index refreshed: %d rows updated (tracked fields: %s)", updated, ", ".join(fields))
+    return updated
+
+
+def count_stale(conn: psycopg2.extensions.connection, ttl_days: int) -> dict[str, int]:
+    """Enrichment candidates by reason (a business counts once, in the first matching bucket).
+
+    Businesses held back by a failure backoff or dead-lettered are not counted.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT
+              COUNT(*) FILTER (WHERE bf.business_id IS NULL) AS missing,
+              COUNT(*) FILTER (WHERE bf.business_id IS NOT NULL AND cardinality(ci.changed_fields) > 0) AS changed,
+              COUNT(*) FILTER (
+                WHERE bf.business_id IS NOT NULL
+                  AND COALESCE(cardinality(ci.changed_fields), 0) = 0
+                  AND bf.updated_at < now() - make_interval(days => %(ttl_days)s)
+              ) AS expired
+            FROM places_clean p
+            LEFT JOIN business_facts bf ON bf.business_id = p.place_id
+            LEFT JOIN enrichment_change_index ci ON ci.business_id = p.place_id
+            WHERE ({STALE_PREDICATE})
+              AND NOT {dead_letter.BLOCKED_PREDICATE}
+            """,
+            {"ttl_days": ttl_days},
+        )
+        missing, changed, expired = cur.fetchone()
+    return {"missing": int(missing or 0), "changed": int(changed or 0), "expired": int(expired or 0)}
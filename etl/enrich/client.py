@@ -2,16 +2,84 @@ import abc
 import json
 import logging
 import os
-from dataclasses import dataclass
-from typing import Any, Optional
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import Any, Callable, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from .jsonscan import JsonScanner
+from .pricing import cost_cents
+from .prompts import estimate_tokens
+from .ratelimit import RateLimiter
+from .schema import is_usable_response
 
 logger = logging.getLogger(__name__)
 
 
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+# Bad key, missing permission or wrong endpoint/model: every call would fail the same way.
+FATAL_STATUS_CODES = {401, 403, 404}
+
+
 class LLMError(RuntimeError):
-    """Raised when an LLM provider call fails."""
+    """Raised when an LLM provider call fails.
+
+    ``status_code`` is None for transport errors (timeouts, resets), which are
+    retryable like 429/5xx responses; ``retry_after`` carries the provider's
+    ``Retry-After`` hint in seconds when one was sent.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: Optional[bool] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        if retryable is None:
+            retryable = status_code in RETRYABLE_STATUS_CODES
+        self.retryable = retryable
+
+    @property
+    def throttled(self) -> bool:
+        return self.status_code in THROTTLE_STATUS_CODES
+
+    @property
+    def fatal(self) -> bool:
+        """Authentication or configuration error: not specific to the business being enriched."""
+        return self.status_code in FATAL_STATUS_CODES
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
 
 
 @dataclass
@@ -22,39 +90,133 @@ class CompletionResult:
     completion_tokens: Optional[int]
     cost_cents: Optional[float]
     raw: dict[str, Any]
+    latency_ms: Optional[float] = None
+    connection_reused: Optional[bool] = None
+    provider: Optional[str] = None
+    cached_tokens: Optional[int] = None
+    # Streaming only: time to the first content token, and an upper-bound
+    # estimate of the generation time avoided by closing the stream early.
+    ttft_ms: Optional[float] = None
+    stream_saved_ms: Optional[float] = None
+
+
+@dataclass
+class TransportStats:
+    """Latency of calls on fresh vs. kept-alive connections (thread-safe)."""
+
+    cold_calls: int = 0
+    warm_calls: int = 0
+    cold_ms: float = 0.0
+    warm_ms: float = 0.0
+    streamed_calls: int = 0
+    early_stops: int = 0
+    ttft_ms: float = 0.0
+    stream_saved_ms: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def record(self, *, reused: Optional[bool], elapsed_ms: float) -> None:
+        if reused is None:
+            return
+        with self._lock:
+            if reused:
+                self.warm_calls += 1
+                self.warm_ms += elapsed_ms
+            else:
+                self.cold_calls += 1
+                self.cold_ms += elapsed_ms
+
+    def record_stream(self, *, ttft_ms: Optional[float], saved_ms: Optional[float]) -> None:
+        with self._lock:
+            self.streamed_calls += 1
+            self.ttft_ms += ttft_ms or 0.0
+            if saved_ms is not None:
+                self.early_stops += 1
+                self.stream_saved_ms += saved_ms
+
+    def saved_ms_per_call(self) -> Optional[float]:
+        """Average handshake cost avoided by a reused connection, if measurable."""
+        with self._lock:
+            if not self.cold_calls or not self.warm_calls:
+                return None
+            return max(0.0, self.cold_ms / self.cold_calls - self.warm_ms / self.warm_calls)
+
+    def total_saved_ms(self) -> Optional[float]:
+        per_call = self.saved_ms_per_call()
+        return None if per_call is None else per_call * self.warm_calls
 
 
 class LLMClient(abc.ABC):
     """Abstract base class for chat-based LLM clients."""
 
     @abc.abstractmethod
-    def complete(self, *, prompt: str, temperature: float = 0.2, max_tokens: int = 600) -> CompletionResult:
+    def complete(
+        self,
+        *,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> CompletionResult:
         """Execute a completion request and return the assistant message content."""
 
 
-class OpenAIChatClient(LLMClient):
-    """Thin wrapper around the OpenAI chat completions API."""
+class ChatCompletionsClient(LLMClient):
+    """Shared transport for OpenAI-compatible chat completions endpoints.
+
+    Each client owns one ``requests.Session`` whose connection pool keeps
+    TLS connections alive between calls. The session is configured once in
+    ``__init__`` and never mutated afterwards (headers are passed per call),
+    so a single client can be shared by all enrichment workers; size the pool
+    to at least the number of workers.
+
+    With ``stream=True`` the answer is read as server-sent events and the
+    stream is closed as soon as the JSON value that opens the answer (after
+    an optional code fence) is complete and parses, so trailing text up to
+    ``max_tokens`` is neither waited for nor generated. Answers that start
+    with prose, or whose first value does not parse, are read to the end.
+    Usage is then estimated when the provider had not sent it yet.
+    """
+
+    label = "LLM"
+    provider_name = "llm"
+    default_model = ""
+    default_endpoint = ""
+    default_temperature = 0.2
+    default_max_tokens = 600
+    # Ask for a final usage chunk when streaming (OpenAI ``stream_options``).
+    stream_usage_option = False
 
     def __init__(
         self,
         api_key: str,
-        model: str = "gpt-4o-mini",
-        endpoint: str = "https://api.openai.com/v1/chat/completions",
+        model: str | None = None,
+        endpoint: str | None = None,
         system_prompt: str | None = None,
-        timeout: int = 60,
+        timeout: int | None = None,
+        connect_timeout: float = 10.0,
+        pool_size: int = 10,
+        stream: bool = False,
     ) -> None:
         if not api_key:
-            raise ValueError("OpenAI API key is required")
+            raise ValueError(f"{self.label} API key is required")
         self.api_key = api_key
-        self.model = model
-        self.endpoint = endpoint
+        self.model = model or self.default_model
+        self.endpoint = endpoint or self.default_endpoint
         self.system_prompt = system_prompt or (
             "Sei un analista marketing locale. Rispondi SEMPRE e SOLO in JSON valido."
         )
-        self.timeout = timeout
+        self.timeout = (connect_timeout, timeout or 60)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stream = stream
+        self.transport_stats = TransportStats()
+
+    def close(self) -> None:
+        self.session.close()
 
-    def complete(self, *, prompt: str, temperature: float = 0.2, max_tokens: int = 600) -> CompletionResult:
-        payload = {
+    def build_payload(self, prompt: str, temperature: float, max_tokens: int) -> dict[str, Any]:
+        return {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": self.system_prompt},
@@ -63,131 +225,491 @@ class OpenAIChatClient(LLMClient):
             "temperature": max(0.0, min(2.0, temperature)),
             "max_tokens": max_tokens,
         }
-        headers = {
+
+    def _headers(self) -> dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+
+    def complete(
+        self,
+        *,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> CompletionResult:
+        payload = self.build_payload(
+            prompt,
+            self.default_temperature if temperature is None else temperature,
+            self.default_max_tokens if max_tokens is None else max_tokens,
+        )
+        if self.stream:
+            payload["stream"] = True
+            if self.stream_usage_option:
+                payload["stream_options"] = {"include_usage": True}
+        started = time.perf_counter()
         try:
-            resp = requests.post(
+            resp = self.session.post(
                 self.endpoint,
-                headers=headers,
+                headers=self._headers(),
                 data=json.dumps(payload),
                 timeout=self.timeout,
+                stream=True,
             )
+            reused = _connection_reused(resp)
+            if self.stream and resp.status_code < 400:
+                result = self._read_stream(resp, started, prompt, payload["max_tokens"])
+                body_text = None
+            else:
+                body_text = resp.text
         except requests.RequestException as exc:
-            raise LLMError(f"OpenAI request failed: {exc}") from exc
+            raise LLMError(f"{self.label} request failed: {exc}", retryable=True) from exc
+        elapsed_ms = (time.perf_counter() - started) * 1000
 
-        if resp.status_code >= 400:
-            raise LLMError(f"OpenAI API error {resp.status_code}: {resp.text}")
+        if body_text is None:
+            # Full-stream time depends on the answer length; TTFT is the
+            # comparable per-connection latency.
+            self.transport_stats.record(reused=reused, elapsed_ms=result.ttft_ms or elapsed_ms)
+            self.transport_stats.record_stream(ttft_ms=result.ttft_ms, saved_ms=result.stream_saved_ms)
+        else:
+            self.transport_stats.record(reused=reused, elapsed_ms=elapsed_ms)
+            if resp.status_code >= 400:
+                raise LLMError(
+                    f"{self.label} API error {resp.status_code}: {body_text[:500]}",
+                    status_code=resp.status_code,
+                    retry_after=_parse_retry_after(resp.headers.get("Retry-After")),
+                )
+            try:
+                body = json.loads(body_text)
+            except ValueError as exc:
+                raise LLMError(f"Malformed {self.label} response: {body_text[:500]}") from exc
+            result = self.parse_body(body)
+        result.cost_cents = cost_cents(
+            result.model or self.model,
+            result.prompt_tokens,
+            result.completion_tokens,
+            cached_tokens=result.cached_tokens,
+        )
+        result.latency_ms = elapsed_ms
+        result.connection_reused = reused
+        result.provider = self.provider_name
+        return result
+
+    def parse_body(self, body: dict[str, Any]) -> CompletionResult:
+        return parse_chat_completion(body, label=self.label)
 
-        body = resp.json()
+    def _read_stream(
+        self,
+        resp: requests.Response,
+        started: float,
+        prompt: str,
+        max_tokens: int,
+    ) -> CompletionResult:
+        """Consume an SSE chat completion, stopping once the JSON answer is complete."""
+        scanner = JsonScanner(anchored=True)
+        answered = False
+        parts: list[str] = []
+        model: Optional[str] = None
+        usage: dict[str, Any] = {}
+        finish_reason: Optional[str] = None
+        first_token_at: Optional[float] = None
+        content_chunks = 0
+        early_stop = False
         try:
-            message = body["choices"][0]["message"]["content"]
-        except (KeyError, IndexError) as exc:
-            raise LLMError(f"Malformed OpenAI response: {body}") from exc
-
-        usage = body.get("usage") or {}
-        return CompletionResult(
-            text=message,
-            model=body.get("model"),
-            prompt_tokens=usage.get("prompt_tokens"),
-            completion_tokens=usage.get("completion_tokens"),
-            cost_cents=None,
-            raw=body,
-        )
+            for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError as exc:
+                    raise LLMError(f"Malformed {self.label} stream chunk: {data[:500]}") from exc
+                model = chunk.get("model") or model
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices") or []:
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    text = (choice.get("delta") or {}).get("content")
+                    if not text:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    content_chunks += 1
+                    parts.append(text)
+                    if not scanner.complete and scanner.feed(text):
+                        answered = _parses(scanner.value_text())
+                        early_stop = answered and finish_reason is None
+                if answered:
+                    break
+        finally:
+            resp.close()
+        stopped_at = time.perf_counter()
+
+        text = "".join(parts)
+        ttft_ms = None if first_token_at is None else (first_token_at - started) * 1000
+        saved_ms = None
+        if early_stop and first_token_at is not None:
+            # Upper bound: the rest of the max_tokens budget at the observed token rate.
+            per_chunk = (stopped_at - first_token_at) / max(1, content_chunks - 1)
+            saved_ms = max(0, max_tokens - content_chunks) * per_chunk * 1000
+        usage_estimated = not usage
+        if usage_estimated:
+            usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": content_chunks}
+        body = {
+            "model": model,
+            "choices": [{"message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+            "usage": usage,
+            "stream": {
+                "ttft_ms": ttft_ms,
+                "early_stop": early_stop,
+                "saved_ms_estimate": saved_ms,
+                "usage_estimated": usage_estimated,
+            },
+        }
+        result = self.parse_body(body)
+        result.ttft_ms = ttft_ms
+        result.stream_saved_ms = saved_ms
+        return result
+
+
+def _parses(text: Optional[str]) -> bool:
+    try:
+        json.loads(text or "")
+    except ValueError:
+        return False
+    return True
+
+
+def parse_chat_completion(body: dict[str, Any], label: str = "LLM") -> CompletionResult:
+    """Turn an OpenAI-compatible chat completion body into a CompletionResult."""
+    try:
+        message = body["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError) as exc:
+        raise LLMError(f"Malformed {label} response: {body}") from exc
+
+    usage = body.get("usage") or {}
+    return CompletionResult(
+        text=message,
+        model=body.get("model"),
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        cost_cents=None,
+        raw=body,
+        cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+    )
 
 
-class PerplexityClient(LLMClient):
+def _connection_reused(resp: requests.Response) -> Optional[bool]:
+    """Tell whether the underlying urllib3 connection served an earlier call.
+
+    Requires ``stream=True`` so the connection is still attached to the
+    response; each connection is tagged with a use counter the first time
+    it is seen.
+    """
+    conn = getattr(resp.raw, "connection", None) or getattr(resp.raw, "_connection", None)
+    if conn is None:
+        return None
+    uses = getattr(conn, "_enrichment_uses", 0)
+    conn._enrichment_uses = uses + 1
+    return uses > 0
+
+
+class OpenAIChatClient(ChatCompletionsClient):
+    """Thin wrapper around the OpenAI chat completions API."""
+
+    label = "OpenAI"
+    provider_name = "openai"
+    default_model = "gpt-4o-mini"
+    default_endpoint = "https://api.openai.com/v1/chat/completions"
+    default_temperature = 0.2
+    default_max_tokens = 600
+    stream_usage_option = True
+
+
+class PerplexityClient(ChatCompletionsClient):
     """Wrapper around the Perplexity chat completions endpoint."""
 
+    label = "Perplexity"
+    provider_name = "perplexity"
+    default_model = "sonar"
+    default_endpoint = "https://api.perplexity.ai/chat/completions"
+    default_temperature = 0.1
+    default_max_tokens = 800
+
+
+class HedgedClient(LLMClient):
+    """Composite client that hedges slow calls and fails over between providers.
+
+    Calls go to the first healthy client. When it has not answered within the
+    ``hedge_percentile`` of its recent latencies, the same prompt is sent to
+    the next client and the first response accepted by ``validator`` wins
+    (the slower call is left to finish and discarded). A call that fails or
+    returns an unusable answer moves on to the next client immediately. A
+    client that fails ``failure_threshold`` times in a row is skipped for
+    ``cooldown`` seconds. ``CompletionResult.provider`` tells which client
+    produced the answer.
+
+    Discarded answers (losing hedges, answers rejected by ``validator``) are
+    paid for too: every extra launch takes a slot from ``rate_limiter`` like
+    the caller's own call, their usage settles the token bucket, and their
+    cost is reported through ``drain_discarded_cost``.
+    """
+
     def __init__(
         self,
-        api_key: str,
-        model: str = "sonar",
-        endpoint: str = "https://api.perplexity.ai/chat/completions",
-        system_prompt: str | None = None,
-        timeout: int = 60,
+        clients: list[ChatCompletionsClient],
+        *,
+        hedge_percentile: float = 95.0,
+        min_samples: int = 20,
+        min_hedge_delay: float = 1.0,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0,
+        validator: Optional[Callable[[str], bool]] = None,
+        max_workers: int = 16,
+        rate_limiter: Optional[RateLimiter] = None,
+        completion_tokens_estimate: int = 600,
     ) -> None:
-        if not api_key:
-            raise ValueError("Perplexity API key is required")
-        self.api_key = api_key
-        self.model = model
-        self.endpoint = endpoint
-        self.system_prompt = system_prompt or (
-            "Sei un analista marketing locale. Rispondi SEMPRE e SOLO in JSON valido."
+        if len(clients) < 2:
+            raise ValueError("HedgedClient needs at least two clients")
+        self.clients = list(clients)
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.validator = validator or is_usable_response
+        self.rate_limiter = rate_limiter
+        self.completion_tokens_estimate = completion_tokens_estimate
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.discarded_calls = 0
+        self.discarded_cost_cents = 0.0
+        self._unreported_cost_cents = 0.0
+        self._latencies = [deque(maxlen=200) for _ in self.clients]
+        self._failures = [0 for _ in self.clients]
+        self._down_until = [0.0 for _ in self.clients]
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for client in self.clients:
+            client.close()
+
+    def _order(self) -> list[int]:
+        """Healthy clients in configured order, then the ones cooling down as a last resort."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [idx for idx in range(len(self.clients)) if self._down_until[idx] <= now]
+        return healthy + [idx for idx in range(len(self.clients)) if idx not in healthy]
+
+    def hedge_delay(self, idx: int) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies[idx])
+        if len(samples) < self.min_samples:
+            return None
+        rank = max(0, math.ceil(self.hedge_percentile / 100 * len(samples)) - 1)
+        return max(self.min_hedge_delay, samples[rank] / 1000)
+
+    def _record(self, idx: int, *, ok: bool, latency_ms: Optional[float] = None) -> None:
+        with self._lock:
+            if ok:
+                self._failures[idx] = 0
+                if latency_ms is not None:
+                    self._latencies[idx].append(latency_ms)
+                return
+            self._failures[idx] += 1
+            if self._failures[idx] >= self.failure_threshold:
+                self._down_until[idx] = time.monotonic() + self.cooldown
+                self._failures[idx] = 0
+                logger.warning(
+                    "%s failed %d times in a row; routing to the other providers for %.0fs",
+                    self.clients[idx].label,
+                    self.failure_threshold,
+                    self.cooldown,
+                )
+
+    def _call(
+        self,
+        idx: int,
+        prompt: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        estimated: int,
+    ) -> CompletionResult:
+        client = self.clients[idx]
+        result = client.complete(prompt=prompt, temperature=temperature, max_tokens=max_tokens)
+        if not self.validator(result.text):
+            self._discard(result, estimated)
+            raise LLMError(f"{client.label} returned an unusable response", retryable=True)
+        return result
+
+    def _discard(self, result: CompletionResult, estimated: int) -> None:
+        """Account for a paid answer that will not be returned."""
+        if self.rate_limiter is not None and (result.prompt_tokens is not None or result.completion_tokens is not None):
+            self.rate_limiter.settle(estimated, (result.prompt_tokens or 0) + (result.completion_tokens or 0))
+        with self._lock:
+            self.discarded_calls += 1
+            self.discarded_cost_cents += result.cost_cents or 0.0
+            self._unreported_cost_cents += result.cost_cents or 0.0
+
+    def _discard_future(self, future: Future, estimated: int) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._discard(future.result(), estimated)
+
+    def drain_discarded_cost(self) -> float:
+        """Cost of discarded answers since the last call (losing hedges may finish later)."""
+        with self._lock:
+            cost, self._unreported_cost_cents = self._unreported_cost_cents, 0.0
+        return cost
+
+    def complete(
+        self,
+        *,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> CompletionResult:
+        order = self._order()
+        in_flight: dict[Future, tuple[int, bool]] = {}
+        errors: list[LLMError] = []
+        launched = 0
+        estimated = estimate_tokens(prompt) + (max_tokens or self.completion_tokens_estimate)
+
+        def launch(hedge: bool) -> None:
+            nonlocal launched
+            idx = order[launched]
+            # The caller reserved the first call; hedges and failovers are extra paid calls.
+            if launched and self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimated)
+            launched += 1
+            future = self._executor.submit(self._call, idx, prompt, temperature, max_tokens, estimated)
+            in_flight[future] = (idx, hedge)
+
+        started = time.monotonic()
+        launch(hedge=False)
+        while in_flight:
+            timeout = None
+            if launched == 1 and len(order) > 1:
+                delay = self.hedge_delay(order[0])
+                if delay is not None:
+                    timeout = max(0.0, started + delay - time.monotonic())
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                with self._lock:
+                    self.hedges += 1
+                launch(hedge=True)
+                continue
+            for future in done:
+                idx, hedge = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except LLMError as exc:
+                    self._record(idx, ok=False)
+                    errors.append(exc)
+                    continue
+                self._record(idx, ok=True, latency_ms=result.latency_ms)
+                if hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                # Calls still running (or done in the same wait) are discarded once they finish.
+                for other in in_flight:
+                    other.add_done_callback(partial(self._discard_future, estimated=estimated))
+                return result
+            if not in_flight and launched < len(order):
+                with self._lock:
+                    self.failovers += 1
+                launch(hedge=False)
+
+        retry_after = [exc.retry_after for exc in errors if exc.retry_after is not None]
+        raise LLMError(
+            "All providers failed: " + "; ".join(str(exc) for exc in errors),
+            status_code=errors[0].status_code,
+            retry_after=min(retry_after) if retry_after else None,
+            retryable=any(exc.retryable for exc in errors),
         )
-        self.timeout = timeout
 
-    def complete(self, *, prompt: str, temperature: float = 0.1, max_tokens: int = 800) -> CompletionResult:
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            "temperature": max(0.0, min(2.0, temperature)),
-            "max_tokens": max_tokens,
-        }
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        try:
-            resp = requests.post(
-                self.endpoint,
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=self.timeout,
-            )
-        except requests.RequestException as exc:
-            raise LLMError(f"Perplexity request failed: {exc}") from exc
+    def log_summary(self, log: logging.Logger) -> None:
+        log.info(
+            "Provider hedging: %d hedged calls (%d won by the hedge), %d failovers, "
+            "%d discarded answers (%.2f cents)",
+            self.hedges,
+            self.hedge_wins,
+            self.failovers,
+            self.discarded_calls,
+            self.discarded_cost_cents,
+        )
 
-        if resp.status_code >= 400:
-            raise LLMError(f"Perplexity API error {resp.status_code}: {resp.text}")
 
-        body = resp.json()
-        try:
-            message = body["choices"][0]["message"]["content"]
-        except (KeyError, IndexError) as exc:
-            raise LLMError(f"Malformed Perplexity response: {body}") from exc
-
-        usage = body.get("usage") or {}
-        return CompletionResult(
-            text=message,
-            model=body.get("model"),
-            prompt_tokens=usage.get("prompt_tokens"),
-            completion_tokens=usage.get("completion_tokens"),
-            cost_cents=None,
-            raw=body,
+def _transport_options() -> dict[str, Any]:
+    return {
+        "connect_timeout": float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+        "timeout": int(os.getenv("LLM_READ_TIMEOUT", "60")),
+        "pool_size": int(os.getenv("LLM_POOL_SIZE", "10")),
+        "stream": os.getenv("LLM_STREAM", "").strip().lower() in {"1", "true", "yes", "on"},
+    }
+
+
+def _build_provider_client(provider: str, model: Optional[str]) -> ChatCompletionsClient:
+    if provider == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is required when LLM_PROVIDER includes openai")
+        return OpenAIChatClient(
+            api_key=api_key,
+            model=model or os.getenv("OPENAI_MODEL") or "gpt-4o-mini",
+            endpoint=os.getenv("OPENAI_ENDPOINT"),
+            **_transport_options(),
         )
 
+    if provider in {"perplexity", "px"}:
+        api_key = os.getenv("PERPLEXITY_API_KEY")
+        if not api_key:
+            raise ValueError("PERPLEXITY_API_KEY is required when LLM_PROVIDER includes perplexity")
+        return PerplexityClient(
+            api_key=api_key,
+            model=model or os.getenv("PERPLEXITY_MODEL") or "sonar",
+            endpoint=os.getenv("PERPLEXITY_ENDPOINT"),
+            **_transport_options(),
+        )
+
+    raise ValueError(f"Unsupported LLM_PROVIDER '{provider}'")
+
 
 def load_client_from_env(logger_: logging.Logger | None = None) -> LLMClient | None:
     """Instantiate a client based on environment variables.
 
     Expected variables:
-        - LLM_PROVIDER: 'openai' | 'perplexity'
+        - LLM_PROVIDER: 'openai' | 'perplexity', or a comma-separated list
+          (e.g. 'perplexity,openai') for hedged calls with failover, first = primary
         - OPENAI_API_KEY / PERPLEXITY_API_KEY
-        - LLM_MODEL (optional override)
+        - LLM_MODEL (optional override, single provider only; wins over OPENAI_MODEL / PERPLEXITY_MODEL)
+        - OPENAI_MODEL / PERPLEXITY_MODEL, OPENAI_ENDPOINT / PERPLEXITY_ENDPOINT (optional)
+        - LLM_CONNECT_TIMEOUT / LLM_READ_TIMEOUT (seconds, default 10 / 60)
+        - LLM_POOL_SIZE (kept-alive connections per client, default 10)
+        - LLM_STREAM (1 to stream answers and stop once the JSON is complete)
+        - LLM_HEDGE_PERCENTILE / LLM_HEDGE_MIN_DELAY (default 95 / 1.0 s),
+          LLM_FAILOVER_THRESHOLD / LLM_FAILOVER_COOLDOWN (default 3 / 60 s)
     """
     log = logger_ or logger
-    provider = (os.getenv("LLM_PROVIDER") or "").strip().lower()
-    if not provider:
+    providers = [part.strip().lower() for part in (os.getenv("LLM_PROVIDER") or "").split(",") if part.strip()]
+    if not providers:
         log.warning("LLM_PROVIDER not set; enrichment will run in dry-run mode")
         return None
 
-    if provider == "openai":
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY is required when LLM_PROVIDER=openai")
-        model = os.getenv("LLM_MODEL") or "gpt-4o-mini"
-        return OpenAIChatClient(api_key=api_key, model=model)
-
-    if provider in {"perplexity", "px"}:
-        api_key = os.getenv("PERPLEXITY_API_KEY")
-        if not api_key:
-            raise ValueError("PERPLEXITY_API_KEY is required when LLM_PROVIDER=perplexity")
-        model = os.getenv("LLM_MODEL") or "sonar"
-        return PerplexityClient(api_key=api_key, model=model)
+    if len(providers) == 1:
+        return _build_provider_client(providers[0], os.getenv("LLM_MODEL"))
 
-    raise ValueError(f"Unsupported LLM_PROVIDER '{provider}'")
+    pool_size = int(os.getenv("LLM_POOL_SIZE", "10"))
+    return HedgedClient(
+        [_build_provider_client(provider, None) for provider in providers],
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+        min_hedge_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0")),
+        failure_threshold=int(os.getenv("LLM_FAILOVER_THRESHOLD", "3")),
+        cooldown=float(os.getenv("LLM_FAILOVER_COOLDOWN", "60")),
+        max_workers=pool_size * len(providers),
+    )
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Optional, Sequence
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# A failed request is retried after BACKOFF_BASE_MINUTES * 2^(failures - 1),
+# capped at BACKOFF_MAX_HOURS; after MAX_ATTEMPTS failures it becomes 'dead'
+# and its business is no longer selected until it is requeued by hand.
+MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_MINUTES = float(os.getenv("ENRICHMENT_BACKOFF_BASE_MINUTES", "30"))
+BACKOFF_MAX_HOURS = float(os.getenv("ENRICHMENT_BACKOFF_MAX_HOURS", "72"))
+
+# Failures of the business so far. A Places refresh that changes the input
+# hash (e.g. the review count) starts a new request row, so the count of the
+# business's other rows that failed since its last completed request is
+# carried over; otherwise a poison business would never reach MAX_ATTEMPTS.
+PRIOR_FAILURES_SQL = """GREATEST(r.attempt_count, COALESCE((
+      SELECT max(f.attempt_count)
+      FROM enrichment_request f
+      WHERE f.business_id = r.business_id
+        AND f.request_id <> r.request_id
+        AND f.status IN ('error', 'dead')
+        AND f.finished_at > COALESCE((
+          SELECT max(c.finished_at)
+          FROM enrichment_request c
+          WHERE c.business_id = r.business_id AND c.status = 'completed'
+        ), '-infinity')
+    ), 0))"""
+
+# Status, attempt counter and next retry time for a request that just
+# failed (``v.status = 'error'``) or completed, as SET expressions over the
+# request ``r`` being updated.
+ERROR_STATUS_SQL = (
+    f"CASE WHEN v.status = 'error' AND {PRIOR_FAILURES_SQL} + 1 >= {MAX_ATTEMPTS} THEN 'dead' ELSE v.status END"
+)
+ATTEMPT_COUNT_SQL = f"CASE WHEN v.status = 'error' THEN {PRIOR_FAILURES_SQL} + 1 ELSE 0 END"
+NEXT_ATTEMPT_SQL = (
+    "CASE WHEN v.status = 'error' THEN now() + make_interval(secs => LEAST("
+    f"{BACKOFF_MAX_HOURS * 3600}, {BACKOFF_BASE_MINUTES * 60} * power(2, {PRIOR_FAILURES_SQL}))) END"
+)
+
+# Businesses with a dead request, or a failed one still backing off, are
+# left out of candidate selection. Expects ``p`` (places_clean).
+BLOCKED_PREDICATE = """
+    EXISTS (
+      SELECT 1
+      FROM enrichment_request f
+      WHERE f.business_id = p.place_id
+        AND (f.status = 'dead' OR (f.status = 'error' AND f.next_attempt_at > now()))
+    )
+"""
+
+
+def list_dead(conn: psycopg2.extensions.connection, limit: int = 100) -> list[dict[str, Any]]:
+    """Dead-lettered requests, most recent failure first."""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            SELECT r.request_id, r.business_id, p.name, r.provider, r.attempt_count, r.finished_at, r.error
+            FROM enrichment_request r
+            LEFT JOIN places_clean p ON p.place_id = r.business_id
+            WHERE r.status = 'dead'
+            ORDER BY r.finished_at DESC NULLS LAST
+            LIMIT %s
+            """,
+            (limit,),
+        )
+        return cur.fetchall()
+
+
+def requeue(conn: psycopg2.extensions.connection, business_ids: Optional[Sequence[str]] = None) -> int:
+    """Put dead requests (all, or those of ``business_ids``) back in the queue with a fresh attempt budget."""
+    with conn.cursor() as cur:
+        # Earlier failed rows of the same businesses would otherwise be carried over again.
+        cur.execute(
+            """
+            UPDATE enrichment_request
+               SET attempt_count = 0
+             WHERE status = 'error'
+               AND business_id IN (
+                 SELECT business_id FROM enrichment_request
+                 WHERE status = 'dead' AND (%(all)s OR business_id = ANY(%(ids)s))
+               )
+            """,
+            {"all": not business_ids, "ids": list(business_ids or [])},
+        )
+        cur.execute(
+            """
+            UPDATE enrichment_request
+               SET status = 'queued',
+                   attempt_count = 0,
+                   next_attempt_at = NULL,
+                   error = NULL,
+                   started_at = NULL,
+                   finished_at = NULL,
+                   lease_expires_at = NULL,
+                   claimed_by = NULL,
+                   queued_at = now()
+             WHERE status = 'dead'
+               AND (%(all)s OR business_id = ANY(%(ids)s))
+            """,
+            {"all": not business_ids, "ids": list(business_ids or [])},
+        )
+        return cur.rowcount
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from .pricing import cost_cents
+from .prompts import estimate_tokens
+from .ratelimit import RateLimiter
+
+HISTORY_DAYS = int(os.getenv("ENRICHMENT_FORECAST_HISTORY_DAYS", "30"))
+MAX_WORKERS = int(os.getenv("ENRICHMENT_FORECAST_MAX_WORKERS", "32"))
+# Worker time per business when there is no history yet (provider call included).
+DEFAULT_SECONDS_PER_BUSINESS = float(os.getenv("ENRICHMENT_FORECAST_SECONDS_PER_BUSINESS", "4"))
+CALIBRATION_SAMPLE = 200
+
+
+@dataclass
+class History:
+    """Per-business averages of recent provider-backed enrichments."""
+
+    responses: int = 0
+    prompt_tokens: Optional[float] = None
+    completion_tokens: Optional[float] = None
+    cost_cents: Optional[float] = None
+    # Worker time per business excluding rate-limiter waits, and where it came from.
+    seconds_per_business: Optional[float] = None
+    latency_source: str = "default"
+    # Real prompt tokens / local approximation for the same prompts.
+    token_ratio: Optional[float] = None
+    calibration_samples: int = 0
+
+
+def load_history(
+    conn: psycopg2.extensions.connection,
+    *,
+    model: Optional[str],
+    batch_size: int,
+    prompt_for_payload: Callable[[dict[str, Any]], str],
+    days: int = HISTORY_DAYS,
+) -> History:
+    """Usage, cost, service time and tokenizer calibration from the last ``days`` days.
+
+    Only responses of ``model`` (dated snapshots included) count when it is
+    known; brand-cache completions never do, since no provider was called.
+    """
+    params = {"days": days, "model": model, "batch_size": batch_size, "sample": CALIBRATION_SAMPLE}
+    history = History()
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            """
+            SELECT count(*) AS responses,
+                   avg(resp.prompt_tokens) AS prompt_tokens,
+                   avg(resp.completion_tokens) AS completion_tokens,
+                   avg(resp.cost_cents) AS cost_cents
+            FROM enrichment_response resp
+            JOIN enrichment_request r ON r.request_id = resp.request_id
+            WHERE resp.created_at >= now() - make_interval(days => %(days)s)
+              AND r.provider <> 'brand_cache'
+              AND resp.completion_tokens IS NOT NULL
+              AND (%(model)s::text IS NULL OR resp.model ILIKE %(model)s || '%%')
+            """,
+            params,
+        )
+        row = cur.fetchone()
+        history.responses = int(row["responses"] or 0)
+        if history.responses:
+            history.prompt_tokens = _float(row["prompt_tokens"])
+            history.completion_tokens = _float(row["completion_tokens"])
+            history.cost_cents = _float(row["cost_cents"])
+
+        # Service time per business from the phase timings, preferring runs
+        # with the same batch size.
+        cur.execute(
+            """
+            SELECT batch_size,
+                   count(*) AS requests,
+                   avg(COALESCE(claim_ms, 0) + COALESCE(cache_ms, 0) + COALESCE(prompt_ms, 0) + COALESCE(http_ms, 0)
+                       + COALESCE(parse_ms, 0) + COALESCE(rules_ms, 0) + COALESCE(persist_ms, 0)) AS busy_ms
+            FROM enrichment_timing
+            WHERE recorded_at >= now() - make_interval(days => %(days)s)
+              AND status = 'completed'
+              AND batch_size >= 1
+              AND http_ms IS NOT NULL
+              AND (%(model)s::text IS NULL OR model ILIKE %(model)s || '%%')
+            GROUP BY batch_size
+            ORDER BY batch_size = %(batch_size)s DESC, count(*) DESC
+            LIMIT 1
+            """,
+            params,
+        )
+        row = cur.fetchone()
+        if row is not None:
+            history.seconds_per_business = float(row["busy_ms"]) / 1000
+            history.latency_source = f"timings ({row['requests']} requests, batch size {row['batch_size']})"
+        else:
+            cur.execute(
+                """
+                SELECT count(*) AS requests, avg(EXTRACT(EPOCH FROM r.finished_at - r.started_at)) AS seconds
+                FROM enrichment_request r
+                WHERE r.status = 'completed'
+                  AND r.provider <> 'brand_cache'
+                  AND r.finished_at >= now() - make_interval(days => %(days)s)
+                  AND r.started_at IS NOT NULL
+                """,
+                params,
+            )
+            row = cur.fetchone()
+            if row["requests"]:
+                history.seconds_per_business = float(row["seconds"])
+                history.latency_source = f"request durations ({row['requests']} requests)"
+
+        cur.execute(
+            """
+            SELECT r.input_payload, resp.prompt_tokens
+            FROM enrichment_response resp
+            JOIN enrichment_request r ON r.request_id = resp.request_id
+            LEFT JOIN enrichment_timing t ON t.request_id = r.request_id
+            WHERE resp.created_at >= now() - make_interval(days => %(days)s)
+              AND r.provider <> 'brand_cache'
+              AND resp.prompt_tokens IS NOT NULL
+              AND COALESCE(t.batch_size, 1) = 1
+              AND NOT COALESCE(resp.raw_response ? 'json_fix', FALSE)
+            ORDER BY resp.created_at DESC
+            LIMIT %(sample)s
+            """,
+            params,
+        )
+        samples = cur.fetchall()
+    estimated = actual = 0
+    for sample in samples:
+        try:
+            estimated += estimate_tokens(prompt_for_payload(sample["input_payload"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        actual += int(sample["prompt_tokens"])
+        history.calibration_samples += 1
+    if estimated and actual:
+        history.token_ratio = actual / estimated
+    return history
+
+
+def _float(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+@dataclass
+class Forecast:
+    businesses: int
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost_cents: Optional[float]
+    cost_source: str
+    seconds_per_business: float
+    latency_source: str
+    requests_per_minute: Optional[float]
+    tokens_per_minute: Optional[float]
+    workers: int
+    duration_seconds: float
+    recommended_workers: int
+    recommended_duration_seconds: float
+    limited_by: str
+    history_responses: int
+    token_ratio: Optional[float]
+    calibration_samples: int
+
+    def log_summary(self, log: logging.Logger) -> None:
+        log.info(
+            "Forecast for %d businesses in %d provider calls: ~%d prompt + ~%d completion tokens "
+            "(tokenizer calibration x%.2f from %d prompts; usage history from %d responses)",
+            self.businesses,
+            self.calls,
+            self.prompt_tokens,
+            self.completion_tokens,
+            self.token_ratio or 1.0,
+            self.calibration_samples,
+            self.history_responses,
+        )
+        log.info(
+            "Forecast cost: %s",
+            f"~{self.cost_cents:.2f} cents ({self.cost_source})" if self.cost_cents is not None else "unknown (no price and no history)",
+        )
+        limits = ", ".join(
+            part
+            for part in (
+                f"{self.requests_per_minute:.0f} RPM" if self.requests_per_minute else "",
+                f"{self.tokens_per_minute:.0f} TPM" if self.tokens_per_minute else "",
+            )
+            if part
+        )
+        log.info(
+            "Forecast duration: ~%s with %d worker(s); ~%s with the recommended %d worker(s) "
+            "(%.2fs per business from %s; limited by %s%s)",
+            _format_duration(self.duration_seconds),
+            self.workers,
+            _format_duration(self.recommended_duration_seconds),
+            self.recommended_workers,
+            self.seconds_per_business,
+            self.latency_source,
+            self.limited_by,
+            f", limits {limits}" if limits else ", no rate limit configured",
+        )
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def build_forecast(
+    call_prompts: Sequence[tuple[str, int]],
+    *,
+    history: History,
+    model: Optional[str],
+    rate_limiter: RateLimiter,
+    workers: int,
+    completion_tokens_estimate: int,
+) -> Forecast:
+    """Project tokens, cost and wall-clock time for ``(prompt, businesses)`` provider calls.
+
+    Throughput per worker comes from the historical service time; the
+    configured RPM/TPM cap the total, and the recommended worker count is
+    the smallest one that reaches that cap (at most MAX_WORKERS).
+    """
+    ratio = history.token_ratio or 1.0
+    completion_per_business = history.completion_tokens or completion_tokens_estimate
+    businesses = sum(count for _, count in call_prompts)
+    calls = len(call_prompts)
+
+    prompt_tokens = completion_tokens = 0
+    priced: Optional[float] = 0.0
+    for prompt, count in call_prompts:
+        call_prompt = int(estimate_tokens(prompt) * ratio)
+        call_completion = int(completion_per_business * count)
+        prompt_tokens += call_prompt
+        completion_tokens += call_completion
+        call_cost = cost_cents(model, call_prompt, call_completion)
+        priced = None if call_cost is None or priced is None else priced + call_cost
+    if priced is not None and model:
+        total_cost, cost_source = priced, f"{model} list price"
+    elif history.cost_cents is not None:
+        total_cost, cost_source = history.cost_cents * businesses, "historical average"
+    else:
+        total_cost, cost_source = None, "unknown"
+
+    seconds_per_business = history.seconds_per_business or DEFAULT_SECONDS_PER_BUSINESS
+    rpm = rate_limiter.requests.rate_per_second * 60 if rate_limiter.requests is not None else None
+    tpm = rate_limiter.tokens.rate_per_second * 60 if rate_limiter.tokens is not None else None
+    # Rate caps expressed in businesses per second.
+    caps: dict[str, float] = {}
+    if rpm and calls:
+        caps["RPM"] = rpm / 60 * businesses / calls
+    if tpm and businesses:
+        caps["TPM"] = tpm / 60 / max(1.0, (prompt_tokens + completion_tokens) / businesses)
+
+    def throughput(count: int) -> float:
+        return min([count / seconds_per_business, *caps.values()])
+
+    if caps:
+        limit_name, cap = min(caps.items(), key=lambda item: item[1])
+        recommended = min(MAX_WORKERS, max(1, math.ceil(cap * seconds_per_business)))
+        limited_by = limit_name if throughput(recommended) >= cap else "workers"
+    else:
+        recommended = min(MAX_WORKERS, max(1, businesses))
+        limited_by = "workers"
+
+    def duration(count: int) -> float:
+        return businesses / throughput(count) if businesses else 0.0
+
+    return Forecast(
+        businesses=businesses,
+        calls=calls,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost_cents=total_cost,
+        cost_source=cost_source,
+        seconds_per_business=seconds_per_business,
+        latency_source=history.latency_source,
+        requests_per_minute=rpm,
+        tokens_per_minute=tpm,
+        workers=workers,
+        duration_seconds=duration(workers),
+        recommended_workers=recommended,
+        recommended_duration_seconds=duration(recommended),
+        limited_by=limited_by,
+        history_responses=history.responses,
+        token_ratio=history.token_ratio,
+        calibration_samples=history.calibration_samples,
+    )
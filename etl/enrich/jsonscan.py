@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import ast
+import json
+import re
+from typing import Any, Optional
+
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+MAX_TRUNCATION_ATTEMPTS = 50
+# Text allowed before the value in anchored mode: whitespace and a code fence
+# (``ANCHOR_PARTIAL_RE`` also accepts a fence still being streamed).
+ANCHOR_PREFIX_RE = re.compile(r"\s*(?:```[A-Za-z]*\s*)?")
+ANCHOR_PARTIAL_RE = re.compile(r"\s*(?:`{1,2}|```[A-Za-z]*\s*)?")
+
+
+class JsonScanner:
+    """Incremental scanner that finds the first complete top-level JSON value.
+
+    Text can be fed in arbitrary chunks (e.g. streamed tokens). The scanner
+    skips any prose before the first ``{`` or ``[``, tracks nesting outside
+    string literals and reports ``complete`` as soon as that value closes.
+
+    With ``anchored=True`` the value must open the text (after whitespace or a
+    code fence); a ``{`` inside prose such as "use the {name} field" is not
+    taken for the answer, and the scanner gives up (``abandoned``) instead.
+    """
+
+    def __init__(self, anchored: bool = False) -> None:
+        self.anchored = anchored
+        self.abandoned = False
+        self.buffer: list[str] = []
+        self.length = 0
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.stack: list[str] = []
+        self.in_string = False
+        self.string_start: Optional[int] = None
+        self.escape = False
+        # Offsets of commas directly inside the outermost value, used to cut
+        # a truncated value back to its last complete member.
+        self.commas: list[int] = []
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str) -> bool:
+        """Consume ``chunk``; return True once the first top-level value is complete."""
+        if self.complete or not chunk:
+            return self.complete
+        offset = self.length
+        self.buffer.append(chunk)
+        self.length += len(chunk)
+        if self.abandoned:
+            return False
+        for idx, char in enumerate(chunk, start=offset):
+            if self.start is None:
+                if self.anchored and not self._may_start(idx, char):
+                    return False
+                if char in "{[":
+                    self.start = idx
+                    self.stack.append("}" if char == "{" else "]")
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+                self.string_start = idx
+            elif char in "{[":
+                self.stack.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if not self.stack:
+                    self.end = idx + 1
+                    return True
+            elif char == "," and len(self.stack) == 1:
+                self.commas.append(idx)
+        return False
+
+    def _may_start(self, idx: int, char: str) -> bool:
+        """Anchored mode: whether the text before ``idx`` still allows a value to start."""
+        prefix = self.text[:idx]
+        if char in "{[" and ANCHOR_PREFIX_RE.fullmatch(prefix):
+            return True
+        if ANCHOR_PARTIAL_RE.fullmatch(prefix + char):
+            return True
+        self.abandoned = True
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+    def value_text(self) -> Optional[str]:
+        """The complete top-level value, or None while it is still open."""
+        if self.start is None or self.end is None:
+            return None
+        return self.text[self.start : self.end]
+
+
+def extract_json(text: str) -> Optional[str]:
+    """First balanced JSON object/array in ``text`` (ignoring prose around it), if any.
+
+    A balanced value that does not parse even with quoting fixed (e.g. a
+    ``{name}`` placeholder in the prose) is skipped for a later one that
+    does; when none parses, the first balanced value is returned.
+    """
+    first: Optional[str] = None
+    offset = 0
+    while True:
+        scanner = JsonScanner()
+        scanner.feed(text[offset:])
+        value = scanner.value_text()
+        if value is None:
+            return first
+        if first is None:
+            first = value
+        for candidate in (value, normalize_quoting(value)):
+            try:
+                json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+            return value
+        offset += scanner.start + 1
+
+
+def _close(fragment: str) -> str:
+    """Close every open bracket of ``fragment``, dropping a string cut in the middle.
+
+    A half-written string (often a URL) is not trusted: as a value it becomes
+    ``null``, as an array item or an object key it is removed.
+    """
+    scanner = JsonScanner()
+    scanner.feed(fragment)
+    closed = fragment
+    if scanner.in_string and scanner.string_start is not None:
+        closed = closed[: scanner.string_start]
+    closed = closed.rstrip()
+    if closed.endswith(":"):
+        closed += " null"
+    while closed.endswith(","):
+        closed = closed[:-1].rstrip()
+    return closed + "".join(reversed(scanner.stack))
+
+
+def repair_truncated(text: str) -> Optional[str]:
+    """Best-effort completion of a JSON value cut off mid-way (e.g. by ``max_tokens``).
+
+    The value is closed as-is first; if that does not parse, it is cut back
+    to each earlier top-level member boundary in turn, so a half-written
+    last field is dropped instead of the whole answer.
+    """
+    scanner = JsonScanner()
+    scanner.feed(text)
+    if scanner.start is None or scanner.complete:
+        return None
+    body = text[scanner.start :]
+    cuts = [len(body)] + [pos - scanner.start for pos in reversed(scanner.commas)]
+    for cut in cuts[:MAX_TRUNCATION_ATTEMPTS]:
+        candidate = _close(body[:cut])
+        try:
+            json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return candidate
+    return None
+
+
+def normalize_quoting(text: str) -> str:
+    """Fix typographic quotes and trailing commas, the usual hand-written JSON slips."""
+    return TRAILING_COMMA_RE.sub(r"\1", text.translate(SMART_QUOTES))
+
+
+def python_literal(text: str) -> Any:
+    """Parse a Python-style literal (single quotes, None/True/False) as a last resort."""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
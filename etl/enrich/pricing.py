@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+# Batch API jobs are billed at half the synchronous price.
+BATCH_DISCOUNT = 0.5
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """List price in euro cents (1 cent ~ 1 US cent) per million tokens, plus any per-request fee.
+
+    ``cached_input_per_mtok`` is the price of prompt tokens served from the
+    provider's prompt cache (defaults to the normal input price).
+    """
+
+    input_per_mtok: float
+    output_per_mtok: float
+    per_request: float = 0.0
+    cached_input_per_mtok: Optional[float] = None
+
+    def cost(
+        self,
+        prompt_tokens: Optional[int],
+        completion_tokens: Optional[int],
+        cached_tokens: Optional[int] = None,
+    ) -> float:
+        cached = min(cached_tokens or 0, prompt_tokens or 0)
+        cached_price = self.input_per_mtok if self.cached_input_per_mtok is None else self.cached_input_per_mtok
+        return (
+            ((prompt_tokens or 0) - cached) * self.input_per_mtok / 1_000_000
+            + cached * cached_price / 1_000_000
+            + (completion_tokens or 0) * self.output_per_mtok / 1_000_000
+            + self.per_request
+        )
+
+
+PRICES: dict[str, ModelPrice] = {
+    "gpt-4o-mini": ModelPrice(15, 60, cached_input_per_mtok=7.5),
+    "gpt-4o": ModelPrice(250, 1000, cached_input_per_mtok=125),
+    "gpt-4.1-nano": ModelPrice(10, 40, cached_input_per_mtok=2.5),
+    "gpt-4.1-mini": ModelPrice(40, 160, cached_input_per_mtok=10),
+    "gpt-4.1": ModelPrice(200, 800, cached_input_per_mtok=50),
+    "sonar": ModelPrice(100, 100, per_request=0.5),
+    "sonar-pro": ModelPrice(300, 1500, per_request=0.6),
+}
+
+
+def _load_overrides() -> dict[str, ModelPrice]:
+    """ENRICHMENT_PRICES='{"my-model": [input, output, per_request]}' (cents per million tokens)."""
+    raw = os.getenv("ENRICHMENT_PRICES")
+    if not raw:
+        return {}
+    return {model: ModelPrice(*values) for model, values in json.loads(raw).items()}
+
+
+PRICES.update(_load_overrides())
+_MODELS_LONGEST_FIRST = sorted(PRICES, key=len, reverse=True)
+
+
+def price_for(model: Optional[str]) -> Optional[ModelPrice]:
+    """Price of ``model``; dated snapshots (``gpt-4o-mini-2024-07-18``) match their base name."""
+    if not model:
+        return None
+    name = model.strip().lower()
+    if name in PRICES:
+        return PRICES[name]
+    for known in _MODELS_LONGEST_FIRST:
+        if name.startswith(known):
+            return PRICES[known]
+    return None
+
+
+def cost_cents(
+    model: Optional[str],
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    discount: float = 1.0,
+    cached_tokens: Optional[int] = None,
+) -> Optional[float]:
+    """Cost of one call in cents, or None when the model or the usage is unknown."""
+    price = price_for(model)
+    if price is None or (prompt_tokens is None and completion_tokens is None):
+        return None
+    return round(price.cost(prompt_tokens, completion_tokens, cached_tokens) * discount, 4)
@@ -2,8 +2,8 @@ from __future__ import annotations
 
 import json
 import math
-from textwrap import dedent
-from typing import Any, Mapping, Optional
+import re
+from typing import Any, Mapping, Optional, Sequence
 
 SCHEMA_EXAMPLE = {
     "size_class": None,
@@ -74,8 +74,20 @@ def _format_optional_details(business: Mapping[str, Any]) -> str:
     return "Dettagli aggiuntivi utili:\n" + "\n".join(details)
 
 
-def build_prompt(business: Mapping[str, Any], include_schema: bool = True) -> str:
-    """Craft the user prompt sent to the LLM."""
+INTRO = "Sei un analista marketing locale specializzato in attivita italiane di prossimita."
+
+COMMON_RULES = [
+    'Se non sei certo di un dato, imposta null e riduci "confidence".',
+    'Lavora SOLO su risultati entro il raggio indicato dalle coordinate: se le fonti portano fuori area o in un comune diverso, lascia i campi stimati a null, imposta "confidence" <= 0.25 e descrivi il problema in "provenance.reasoning".',
+    'Confronta CAP, provincia e regione nei dettagli con le fonti trovate: eventuali discrepanze vanno motivate in "provenance.reasoning".',
+    'Riporta le fonti principali (URL) in "provenance.citations" quando disponibili, privilegiando siti istituzionali o elenchi ufficiali italiani.',
+    "Non calcolare size_class, is_chain, marketing_attitude, umbrella_affinity, ad_budget_band o confidence: restituisci sempre null (saranno calcolati downstream).",
+    '"social": mappa piattaforma->URL solo se plausibile.',
+    '"provenance": motivazione sintetica o fonti sicure.',
+]
+
+
+def _business_lines(business: Mapping[str, Any]) -> list[str]:
     name = business.get("name") or "Attivita sconosciuta"
     category = business.get("category") or "attivita generica"
     address = business.get("address") or ""
@@ -84,11 +96,16 @@ def build_prompt(business: Mapping[str, Any], include_schema: bool = True) -> st
     lon = business.get("longitude")
     radius_val = business.get("search_radius_m")
     radius = int(radius_val) if isinstance(radius_val, (int, float)) and radius_val > 0 else None
-    coords_line = ""
+    lines = [
+        f"- Nome: {name}",
+        f"- Categoria: {category}",
+        f"- Indirizzo: {address}",
+        f"- Citta: {city}",
+    ]
     bbox_line = ""
     if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
         radius_hint = f" (raggio di ricerca ~{radius} m)" if radius else ""
-        coords_line = f"- Coordinate: lat {lat:.5f}, lon {lon:.5f}{radius_hint}"
+        lines.append(f"- Coordinate: lat {lat:.5f}, lon {lon:.5f}{radius_hint}")
         if radius:
             lat_delta = radius / 111_320
             lon_factor = max(math.cos(math.radians(lat)), 0.05) * 111_320
@@ -99,38 +116,116 @@ def build_prompt(business: Mapping[str, Any], include_schema: bool = True) -> st
                 f"lon {lon - lon_delta:.5f} .. {lon + lon_delta:.5f}"
             )
     details = _format_optional_details(business)
-    details_block = "\n".join(filter(None, [details, bbox_line]))
-    details_block = f"{details_block}\n" if details_block else ""
-
-    schema_block = json.dumps(SCHEMA_EXAMPLE, ensure_ascii=False, indent=2) if include_schema else "{}"
-
-    base = dedent(
-        f"""
-        Sei un analista marketing locale specializzato in attivita italiane di prossimita.
-        Devi arricchire le informazioni dell'attivita descritta qui sotto, partendo dai dati Google Places, compilando *solo* i campi dello schema dati.
-
-        Attivita:
-        - Nome: {name}
-        - Categoria: {category}
-        - Indirizzo: {address}
-        - Citta: {city}
-        {coords_line}
-        {details_block}
-
-        Regole:
-        - Output: un unico JSON valido (nessun testo prima o dopo).
-        - Se non sei certo di un dato, imposta null e riduci "confidence".
-        - Lavora SOLO su risultati entro il raggio indicato dalle coordinate: se le fonti portano fuori area o in un comune diverso, lascia i campi stimati a null, imposta "confidence" <= 0.25 e descrivi il problema in "provenance.reasoning".
-        - Confronta CAP, provincia e regione nei dettagli con le fonti trovate: eventuali discrepanze vanno motivate in "provenance.reasoning".
-        - Riporta le fonti principali (URL) in "provenance.citations" quando disponibili, privilegiando siti istituzionali o elenchi ufficiali italiani.
-        - Non calcolare size_class, is_chain, marketing_attitude, umbrella_affinity, ad_budget_band o confidence: restituisci sempre null (saranno calcolati downstream).
-        - "social": mappa piattaforma->URL solo se plausibile.
-        - "provenance": motivazione sintetica o fonti sicure.
-
-        Schema esempio:
-        {schema_block}
-        """
-    ).strip()
-
-    return base
+    lines.extend(filter(None, [details, bbox_line]))
+    return lines
+
+
+def _rules_block(output_rule: str) -> str:
+    return "Regole:\n" + "\n".join(f"- {rule}" for rule in [output_rule, *COMMON_RULES])
+
+
+# Bump when the prompt text changes: it is part of the input hash, so stored
+# responses produced by an older prompt are not reused.
+PROMPT_VERSION = 3
+
+SINGLE_TASK = (
+    f"{INTRO}\n"
+    "Devi arricchire le informazioni dell'attivita descritta nella sezione \"Attivita\" in fondo, partendo dai "
+    "dati Google Places, compilando *solo* i campi dello schema dati."
+)
+SINGLE_OUTPUT_RULE = "Output: un unico JSON valido (nessun testo prima o dopo)."
+BATCH_TASK = (
+    f"{INTRO}\n"
+    "Devi arricchire le informazioni di tutte le attivita elencate in fondo, partendo dai dati Google Places, "
+    "compilando *solo* i campi dello schema dati. Tratta ogni attivita in modo indipendente."
+)
+BATCH_OUTPUT_RULE = (
+    "Output: un unico array JSON valido (nessun testo prima o dopo) con un oggetto per ogni attivita, "
+    'nello stesso ordine, ciascuno con il campo "place_id" copiato esattamente.'
+)
+
+
+def _compile_prefix(task: str, output_rule: str, schema_example: Any) -> str:
+    return "\n\n".join(
+        [
+            task,
+            _rules_block(output_rule),
+            "Schema esempio:\n" + json.dumps(schema_example, ensure_ascii=False, indent=2),
+        ]
+    )
+
+
+# Static part of every prompt, rendered once. It comes first so consecutive
+# requests share a byte-identical prefix that providers can serve from their
+# prompt cache; only the short business section after it changes. At about
+# 400-650 estimated tokens it is below OpenAI's 1024-token caching minimum,
+# so with the default provider it is not billed as cached yet: the layout
+# only pays off once the static part grows past that (or on providers with
+# a lower threshold). ``benchmarks.prompt_layout`` reports the gap.
+_PREFIXES = {
+    (False, True): _compile_prefix(SINGLE_TASK, SINGLE_OUTPUT_RULE, SCHEMA_EXAMPLE),
+    (False, False): _compile_prefix(SINGLE_TASK, SINGLE_OUTPUT_RULE, {}),
+    (True, True): _compile_prefix(
+        BATCH_TASK, BATCH_OUTPUT_RULE, [{"place_id": "<place_id dell'attivita>", **SCHEMA_EXAMPLE}]
+    ),
+    (True, False): _compile_prefix(BATCH_TASK, BATCH_OUTPUT_RULE, []),
+}
 
+
+def prompt_prefix(batch: bool = False, include_schema: bool = True) -> str:
+    return _PREFIXES[(batch, include_schema)]
+
+
+def build_prompt(business: Mapping[str, Any], include_schema: bool = True) -> str:
+    """Craft the user prompt sent to the LLM: static prefix, then the business details."""
+    return prompt_prefix(False, include_schema) + "\n\nAttivita:\n" + "\n".join(_business_lines(business))
+
+
+def build_batch_prompt(businesses: Sequence[Mapping[str, Any]], include_schema: bool = True) -> str:
+    """Pack several businesses into one prompt sharing a single rules/schema block.
+
+    The model must answer with a JSON array whose items carry the ``place_id``
+    of the business they describe (see ``parse_enriched_facts_batch``).
+    """
+    sections = [prompt_prefix(True, include_schema), f"Attivita da arricchire: {len(businesses)}."]
+    for idx, business in enumerate(businesses, start=1):
+        header = f"Attivita {idx} (place_id: {business.get('place_id')}):"
+        sections.append(header + "\n" + "\n".join(_business_lines(business)))
+    return "\n\n".join(sections)
+
+
+FIX_PROMPT_MAX_CHARS = 6000
+# Word pieces, digit groups, single punctuation marks and line breaks: close
+# to how BPE tokenizers split Italian/English prompts. Spaces before a word
+# are merged into it, as the real tokenizers do.
+TOKEN_RE = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|\n+")
+
+
+def build_fix_prompt(raw_text: str) -> str:
+    """Short follow-up asking the model to turn its own malformed answer into valid JSON."""
+    return "\n\n".join(
+        [
+            "Il testo seguente doveva essere un unico JSON valido conforme a questo schema ma non lo e.",
+            "Schema esempio:\n" + json.dumps(SCHEMA_EXAMPLE, ensure_ascii=False),
+            "Correggi solo la sintassi senza aggiungere informazioni; usa null per i valori illeggibili. "
+            "Output: solo il JSON corretto (nessun testo prima o dopo).",
+            "Testo:\n" + raw_text.strip()[:FIX_PROMPT_MAX_CHARS],
+        ]
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Local approximation of the provider tokenizer (no network, no extra dependency).
+
+    Shared by the rate limiter, budget planning and the forecast, which
+    calibrates it against the usage reported by the provider.
+    """
+    tokens = 0
+    for match in TOKEN_RE.finditer(text):
+        piece = match.group()
+        if piece[0].isalpha():
+            # Common short words are a single token, longer ones ~4 characters per piece.
+            tokens += (len(piece) + 3) // 4
+        else:
+            tokens += 1
+    return max(1, tokens)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate_per_minute``.
+
+    A single acquisition larger than the bucket capacity is allowed once the
+    bucket is full: the balance goes negative and later callers wait for the
+    debt to be repaid, so oversized requests are paced instead of deadlocking.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until ``amount`` tokens are available; return the seconds waited."""
+        needed = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                delay = (needed - self._tokens) / self.rate_per_second
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, delta: float) -> None:
+        """Consume (positive) or give back (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class RateLimiter:
+    """Shared requests-per-minute / tokens-per-minute limiter for provider calls.
+
+    Either limit can be disabled by passing ``None`` (or a non-positive value).
+    """
+
+    def __init__(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float] = None) -> None:
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute and requests_per_minute > 0 else None
+        self.tokens = (
+            TokenBucket(tokens_per_minute, capacity=max(1.0, tokens_per_minute / 60.0))
+            if tokens_per_minute and tokens_per_minute > 0
+            else None
+        )
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Build the limiter from ENRICHMENT_RPM / ENRICHMENT_TPM.
+
+        When ENRICHMENT_RPM is unset the legacy ENRICHMENT_REQUEST_DELAY (seconds
+        between calls, default 1.0) is translated into an equivalent RPM.
+        """
+        rpm_env = os.getenv("ENRICHMENT_RPM")
+        if rpm_env is not None:
+            rpm = float(rpm_env)
+        else:
+            delay = float(os.getenv("ENRICHMENT_REQUEST_DELAY", "1.0"))
+            rpm = 60.0 / delay if delay > 0 else 0.0
+        tpm = float(os.getenv("ENRICHMENT_TPM", "0"))
+        return cls(requests_per_minute=rpm, tokens_per_minute=tpm)
+
+    def acquire(self, estimated_tokens: int = 0) -> float:
+        """Reserve one request slot and ``estimated_tokens``; return the seconds waited."""
+        waited = 0.0
+        if self.requests is not None:
+            waited += self.requests.acquire(1.0)
+        if self.tokens is not None and estimated_tokens > 0:
+            waited += self.tokens.acquire(float(estimated_tokens))
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the provider reports the real usage."""
+        if self.tokens is None or not actual_tokens:
+            return
+        delta = actual_tokens - estimated_tokens
+        if delta:
+            self.tokens.adjust(float(delta))
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Mapping, Optional, Sequence
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+from pydantic import ValidationError
+
+from .runner import BusinessRow
+from .schema import EnrichedFacts
+from .writer import business_facts_record
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("ENRICHMENT_REDERIVE_CHUNK", "5000"))
+
+# Latest parsed answer per business, with the payload the model saw.
+LATEST_RESPONSES_SQL = """
+    SELECT DISTINCT ON (r.business_id)
+      r.business_id, r.provider, r.input_payload, resp.model, resp.parsed_response, resp.created_at
+    FROM enrichment_request r
+    JOIN enrichment_response resp ON resp.request_id = r.request_id
+    JOIN places_clean p ON p.place_id = r.business_id
+    WHERE resp.parsed_response IS NOT NULL
+      AND (%(all)s OR r.business_id = ANY(%(ids)s))
+    ORDER BY r.business_id, resp.created_at DESC
+"""
+
+# Same columns as writer.BUSINESS_FACTS_UPSERT_SQL, but rows whose derived
+# values did not change are left alone and ``updated_at`` keeps the time of
+# the enrichment: re-deriving is not a fresh enrichment for the TTL.
+REDERIVE_UPSERT_SQL = """
+    INSERT INTO business_facts AS bf (
+      business_id, size_class, is_chain, website_url, social,
+      marketing_attitude, umbrella_affinity, ad_budget_band,
+      budget_source, confidence, provenance, updated_at,
+      source_provider, source_model
+    )
+    VALUES %s
+    ON CONFLICT (business_id) DO UPDATE SET
+      size_class = EXCLUDED.size_class,
+      is_chain = EXCLUDED.is_chain,
+      website_url = EXCLUDED.website_url,
+      social = EXCLUDED.social,
+      marketing_attitude = EXCLUDED.marketing_attitude,
+      umbrella_affinity = EXCLUDED.umbrella_affinity,
+      ad_budget_band = EXCLUDED.ad_budget_band,
+      budget_source = EXCLUDED.budget_source,
+      confidence = EXCLUDED.confidence,
+      provenance = EXCLUDED.provenance,
+      source_provider = EXCLUDED.source_provider,
+      source_model = EXCLUDED.source_model
+    WHERE (bf.size_class, bf.is_chain, bf.website_url, bf.social, bf.marketing_attitude,
+           bf.umbrella_affinity, bf.ad_budget_band, bf.budget_source, bf.confidence, bf.provenance)
+      IS DISTINCT FROM
+          (EXCLUDED.size_class, EXCLUDED.is_chain, EXCLUDED.website_url, EXCLUDED.social, EXCLUDED.marketing_attitude,
+           EXCLUDED.umbrella_affinity, EXCLUDED.ad_budget_band, EXCLUDED.budget_source, EXCLUDED.confidence,
+           EXCLUDED.provenance)
+    RETURNING 1
+"""
+REDERIVE_TEMPLATE = "(%s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s)"
+
+
+@dataclass
+class RederiveStats:
+    read: int = 0
+    updated: int = 0
+    invalid: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def log_summary(self, log: logging.Logger) -> None:
+        elapsed = time.monotonic() - self.started_at
+        log.info(
+            "Re-derived business_facts for %d businesses in %.1fs (%.0f/s): %d updated, %d unchanged, "
+            "%d skipped (stored response no longer matches the schema)",
+            self.read,
+            elapsed,
+            self.read / elapsed if elapsed > 0 else 0.0,
+            self.updated,
+            self.read - self.updated - self.invalid,
+            self.invalid,
+        )
+
+
+def facts_row(row: Mapping[str, Any]) -> tuple:
+    """business_facts values for one stored response, with the current business rules applied."""
+    business = BusinessRow.from_payload(row["input_payload"])
+    facts = EnrichedFacts.model_validate(row["parsed_response"])
+    record = business_facts_record(business, row["provider"], row["model"], facts)
+    # business_facts_record ends with (source_provider, source_model); keep the enrichment time.
+    return (*record[:-2], row["created_at"], *record[-2:])
+
+
+def rederive(
+    pg: Mapping[str, Any],
+    *,
+    business_ids: Optional[Sequence[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    log: Optional[logging.Logger] = None,
+) -> RederiveStats:
+    """Recompute business_facts from the latest stored LLM answers, without provider calls.
+
+    Responses are streamed with a server-side cursor and written back in
+    chunks of ``chunk_size`` rows, one ``execute_values`` upsert and commit
+    per chunk.
+    """
+    log = log or logger
+    stats = RederiveStats()
+    params = {"all": not business_ids, "ids": list(business_ids or [])}
+    with psycopg2.connect(**pg) as read_conn, psycopg2.connect(**pg) as write_conn:
+        with read_conn.cursor("rederive_responses", cursor_factory=RealDictCursor) as source:
+            source.itersize = chunk_size
+            source.execute(LATEST_RESPONSES_SQL, params)
+            while True:
+                rows = source.fetchmany(chunk_size)
+                if not rows:
+                    break
+                records = []
+                for row in rows:
+                    stats.read += 1
+                    try:
+                        records.append(facts_row(row))
+                    except (ValidationError, KeyError, TypeError, ValueError) as exc:
+                        stats.invalid += 1
+                        log.warning("Skipping %s: %s", row["business_id"], exc)
+                if records:
+                    with write_conn.cursor() as cur:
+                        stats.updated += len(
+                            execute_values(cur, REDERIVE_UPSERT_SQL, records, template=REDERIVE_TEMPLATE, page_size=1000, fetch=True)
+                        )
+                    write_conn.commit()
+                log.info("Re-derived %d businesses so far (%d updated)", stats.read, stats.updated)
+    return stats
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the provider keeps failing and the run should stop."""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, never shorter than ``Retry-After``."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 60.0) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("ENRICHMENT_RETRY_MAX_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("ENRICHMENT_RETRY_BASE_DELAY", "1.0")),
+            max_delay=float(os.getenv("ENRICHMENT_RETRY_MAX_DELAY", "60")),
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to sleep before retry number ``attempt`` (1-based)."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            return min(self.max_delay, max(retry_after, backoff))
+        return backoff
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight provider calls.
+
+    Every ``limit`` successful calls raise the limit by one (additive
+    increase) up to ``maximum``; a throttling response (429/503) halves it
+    (multiplicative decrease), at most once per ``decrease_cooldown`` seconds
+    so a burst of rejections from calls already in flight counts once.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, decrease_cooldown: float = 5.0) -> None:
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = self.maximum
+        self.lowest = self.maximum
+        self.decreases = 0
+        self.decrease_cooldown = decrease_cooldown
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.decrease_cooldown:
+                return
+            self._last_decrease = now
+            self._successes = 0
+            new_limit = max(self.minimum, self.limit // 2)
+            if new_limit < self.limit:
+                self.limit = new_limit
+                self.lowest = min(self.lowest, new_limit)
+                self.decreases += 1
+
+
+class CircuitBreaker:
+    """Pauses provider calls after consecutive transient failures.
+
+    After ``failure_threshold`` failures in a row the circuit opens and every
+    caller waits ``cooldown`` seconds; then a single trial call is let
+    through (half-open). A success closes the circuit. When the circuit opens
+    ``max_opens`` times without a success in between, the provider is
+    considered down and ``before_call`` raises ``CircuitOpenError`` so the
+    runner stops instead of failing the rest of the queue.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, max_opens: int = 3) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_opens = max(1, max_opens)
+        self.opens = 0
+        self.paused_seconds = 0.0
+        self.tripped = False
+        self._failures = 0
+        self._consecutive_opens = 0
+        self._open_until: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failure_threshold=int(os.getenv("ENRICHMENT_BREAKER_THRESHOLD", "5")),
+            cooldown=float(os.getenv("ENRICHMENT_BREAKER_COOLDOWN", "30")),
+            max_opens=int(os.getenv("ENRICHMENT_BREAKER_MAX_OPENS", "3")),
+        )
+
+    def before_call(self) -> None:
+        """Block while the circuit is open; raise once the provider is given up on."""
+        while True:
+            with self._lock:
+                if self.tripped:
+                    raise CircuitOpenError("Provider circuit breaker tripped; stopping the run")
+                if self._open_until is None:
+                    return
+                remaining = self._open_until - time.monotonic()
+                if remaining <= 0 and not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    return
+                delay = remaining if remaining > 0 else 0.5
+            time.sleep(delay)
+            with self._lock:
+                self.paused_seconds += delay
+
+    def trip(self) -> None:
+        """Give up on the provider at once (e.g. the API key was rejected)."""
+        with self._lock:
+            self.tripped = True
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._consecutive_opens = 0
+            self._open_until = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            trial_failed = self._trial_in_flight
+            self._trial_in_flight = False
+            if not trial_failed and (self._open_until is not None or self._failures < self.failure_threshold):
+                return
+            self.opens += 1
+            self._consecutive_opens += 1
+            if self._consecutive_opens >= self.max_opens:
+                self.tripped = True
+            self._open_until = time.monotonic() + self.cooldown
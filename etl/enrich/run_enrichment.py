@@ -3,8 +3,10 @@ import logging
 import os
 import sys
 
+import psycopg2
 from dotenv import load_dotenv
 
+from . import dead_letter, rederive, timing
 from .client import load_client_from_env
 from .runner import EnrichmentRunner
 
@@ -23,14 +25,69 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run LLM enrichment for CustomerTarget businesses.")
     parser.add_argument("--limit", type=int, default=50, help="Maximum number of businesses to enrich in this run.")
     parser.add_argument("--force", action="store_true", help="Ignore TTL and re-enrich even if data is recent.")
-    parser.add_argument("--ttl-days", type=int, default=int(os.getenv("ENRICHMENT_TTL_DAYS", "30")),
-                        help="Days before an enrichment is considered stale.")
+    parser.add_argument("--ttl-days", type=int, default=int(os.getenv("ENRICHMENT_TTL_DAYS", "180")),
+                        help="Days before an unchanged business is re-enriched anyway (changed ones are re-queued "
+                             "as soon as the change index sees a difference).")
     parser.add_argument("--dry-run", action="store_true", help="Show prompts without calling the provider.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ENRICHMENT_WORKERS", "1")),
+                        help="Number of concurrent provider calls (paced by ENRICHMENT_RPM / ENRICHMENT_TPM).")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("ENRICHMENT_BATCH_SIZE", "1")),
+                        help="Businesses packed into a single provider call (1 = one prompt per business).")
+    parser.add_argument("--flush-size", type=int, default=int(os.getenv("ENRICHMENT_FLUSH_SIZE", "50")),
+                        help="Results buffered before they are written to Postgres in one transaction.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call the provider, even when a completed response exists for the same input hash.")
+    parser.add_argument("--no-brand-cache", action="store_true",
+                        help="Do not reuse chain-level facts (website, social) across branches of the same brand.")
+    parser.add_argument("--budget-cents", type=float, default=None,
+                        help="Spend cap for this run: enrich the most valuable businesses per estimated cent until it is used.")
+    parser.add_argument("--plan-only", action="store_true",
+                        help="Only queue stale businesses in enrichment_request; leave the provider calls to workers.")
+    parser.add_argument("--work-only", action="store_true",
+                        help="Only claim and process already queued requests (for extra workers on other machines).")
+    parser.add_argument("--export-batch", metavar="PATH",
+                        help="Write provider batch-API requests (JSONL) for the candidates instead of calling the API.")
+    parser.add_argument("--ingest-batch", metavar="PATH",
+                        help="Load a provider batch results file (JSONL) produced from --export-batch.")
+    parser.add_argument("--list-dead", action="store_true",
+                        help="List dead-lettered requests (failed ENRICHMENT_MAX_ATTEMPTS times) and exit.")
+    parser.add_argument("--requeue-dead", nargs="*", metavar="PLACE_ID", default=None,
+                        help="Queue dead-lettered requests again with a fresh attempt budget (all, or only these "
+                             "place_ids) and exit.")
+    parser.add_argument("--rederive", nargs="*", metavar="PLACE_ID", default=None,
+                        help="Recompute business_facts from the latest stored LLM answers with the current business "
+                             "rules (all businesses, or only these place_ids), without provider calls, and exit.")
+    parser.add_argument("--report", action="store_true",
+                        help="Print p50/p95 of every enrichment phase per day, provider and model, then exit.")
+    parser.add_argument("--report-days", type=int, default=7, help="Days covered by --report.")
     parser.add_argument("--log-level", default=os.getenv("ENRICHMENT_LOG_LEVEL", "INFO"),
                         help="Logging level (DEBUG, INFO, ...).")
     return parser.parse_args()
 
 
+def manage_dead_letters(args: argparse.Namespace) -> int:
+    with psycopg2.connect(**build_pg_config()) as conn:
+        if args.requeue_dead is not None:
+            requeued = dead_letter.requeue(conn, args.requeue_dead)
+            logging.info("Requeued %d dead-lettered requests", requeued)
+            return 0
+        rows = dead_letter.list_dead(conn, limit=args.limit)
+    for row in rows:
+        print(
+            f"{row['business_id']}\t{row['name'] or ''}\t{row['provider']}\tattempts={row['attempt_count']}"
+            f"\t{row['finished_at']}\t{(row['error'] or '')[:200]}"
+        )
+    logging.info("%d dead-lettered requests listed (limit %d)", len(rows), args.limit)
+    return 0
+
+
+def print_timing_report(days: int) -> int:
+    with psycopg2.connect(**build_pg_config()) as conn:
+        rows = timing.report(conn, days)
+    print(timing.format_report(rows))
+    return 0
+
+
 def main() -> int:
     root_dir = os.path.dirname(os.path.dirname(__file__))
     load_dotenv(os.path.join(root_dir, "..", ".env"))
@@ -41,9 +98,42 @@ def main() -> int:
         format="%(asctime)s [%(levelname)s] %(message)s",
     )
 
+    if args.list_dead or args.requeue_dead is not None:
+        return manage_dead_letters(args)
+    if args.report:
+        return print_timing_report(args.report_days)
+    if args.rederive is not None:
+        stats = rederive.rederive(build_pg_config(), business_ids=args.rederive)
+        stats.log_summary(logging.getLogger(__name__))
+        if stats.updated:
+            logging.info("Run python -m feature_builder.build_metrics to refresh business_metrics")
+        return 0
+
     client = load_client_from_env()
-    runner = EnrichmentRunner(pg=build_pg_config(), client=client)
-    runner.run(limit=args.limit, dry_run=args.dry_run, force=args.force, ttl_days=args.ttl_days)
+    runner = EnrichmentRunner(
+        pg=build_pg_config(),
+        client=client,
+        workers=args.workers,
+        reuse_responses=False if args.no_cache else None,
+        use_brand_cache=False if args.no_brand_cache else None,
+        batch_size=args.batch_size,
+        flush_size=args.flush_size,
+    )
+    if args.ingest_batch:
+        stats = runner.ingest_batch(args.ingest_batch)
+        return 0 if stats.failed == 0 else 1
+    if args.export_batch:
+        runner.export_batch(args.export_batch, limit=args.limit, force=args.force, ttl_days=args.ttl_days)
+        return 0
+    runner.run(
+        limit=args.limit,
+        dry_run=args.dry_run,
+        force=args.force,
+        ttl_days=args.ttl_days,
+        plan=not args.work_only,
+        work=not args.plan_only,
+        budget_cents=args.budget_cents,
+    )
     return 0
 
 
@@ -5,23 +5,54 @@ import json
 import logging
 import os
 import re
+import socket
+import threading
 import time
 import uuid
-from dataclasses import dataclass, field
-from typing import Any, Iterable, Mapping, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Any, Callable, Iterable, Mapping, Optional
 
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extras import Json, RealDictCursor
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from pydantic import ValidationError
 
-from .client import CompletionResult, LLMClient, LLMError
-from .prompts import build_prompt
-from .schema import EnrichedFacts, parse_enriched_facts
-from common.business_rules import compute_business_facts
+from . import brand_cache, change_index, dead_letter, forecast, timing
+from .client import (
+    ChatCompletionsClient,
+    CompletionResult,
+    HedgedClient,
+    LLMClient,
+    LLMError,
+    parse_chat_completion,
+)
+from .pricing import BATCH_DISCOUNT, cost_cents
+from .prompts import PROMPT_VERSION, build_batch_prompt, build_fix_prompt, build_prompt, estimate_tokens
+from .ratelimit import RateLimiter
+from .resilience import AdaptiveConcurrency, CircuitBreaker, CircuitOpenError, RetryPolicy
+from .schema import EnrichedFacts, parse_enriched_facts, parse_enriched_facts_batch
+from .writer import ResultWriter
+from common.business_rules import default_affinity
 
 logger = logging.getLogger(__name__)
 
 SEARCH_RADIUS_METERS = int(os.getenv("ENRICHMENT_SEARCH_RADIUS_M", "200"))
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("ENRICHMENT_COMPLETION_TOKENS_ESTIMATE", "600"))
+BATCH_TOKENS_PER_BUSINESS = int(os.getenv("ENRICHMENT_BATCH_TOKENS_PER_BUSINESS", "500"))
+BATCH_EXPORT_LEASE_HOURS = float(os.getenv("ENRICHMENT_BATCH_LEASE_HOURS", "48"))
+BATCH_ENDPOINT_URL = "/v1/chat/completions"
+LEASE_SECONDS = int(os.getenv("ENRICHMENT_LEASE_SECONDS", "600"))
+# Leases of claimed requests are extended this often until their results are written.
+LEASE_RENEW_SECONDS = float(os.getenv("ENRICHMENT_LEASE_RENEW_SECONDS", str(max(1, LEASE_SECONDS // 3))))
+BUDGET_CANDIDATE_POOL = int(os.getenv("ENRICHMENT_BUDGET_CANDIDATE_POOL", "5000"))
+# Ask the model to fix an answer that local JSON repair could not recover.
+JSON_FIX_CALL = os.getenv("ENRICHMENT_JSON_FIX", "1").strip().lower() not in {"0", "false", "no", "off"}
+JSON_FIX_MAX_TOKENS = int(os.getenv("ENRICHMENT_JSON_FIX_MAX_TOKENS", "700"))
+# Prompts logged in full detail by a dry run; the rest only count towards the forecast.
+DRY_RUN_LOGGED_PROMPTS = int(os.getenv("ENRICHMENT_DRY_RUN_LOGGED_PROMPTS", "5"))
 
 
 POSTCODE_RE = re.compile(r"\b\d{4,5}\b")
@@ -186,6 +217,18 @@ class BusinessRow:
             longitude=row.get("longitude"),
         )
 
+    @classmethod
+    def from_payload(cls, payload: Mapping[str, Any]) -> "BusinessRow":
+        """Rebuild a row from the ``input_payload`` stored on enrichment_request."""
+        return cls.from_row(
+            {
+                **payload,
+                "opening_hours_json": payload.get("opening_hours"),
+                "facts_updated_at": None,
+                "facts_confidence": None,
+            }
+        )
+
     def __post_init__(self) -> None:
         self._resolved_city = _resolve_city(self.city, self.formatted_address)
         self._resolved_address = _resolve_address(self.address, self.formatted_address, self._resolved_city)
@@ -228,6 +271,7 @@ class BusinessRow:
             self.formatted_address or "",
             self.category or "",
             json.dumps(self.types or [], ensure_ascii=False, sort_keys=True),
+            self.raw_website or "",
             str(self.rating or ""),
             str(self.user_ratings_total or ""),
             str(self.latitude or ""),
@@ -262,6 +306,332 @@ class BusinessRow:
         }
 
 
+def _split_usage(value: Optional[int], parts: int) -> Optional[int]:
+    return None if value is None else round(value / parts)
+
+
+def _sum_usage(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    if first is None and second is None:
+        return None
+    return (first or 0) + (second or 0)
+
+
+@dataclass(eq=False)
+class PendingEnrichment:
+    """A business that still needs a provider call after the cache lookups."""
+
+    business: BusinessRow
+    input_hash: str
+    payload: dict[str, Any]
+    brand_key: Optional[str]
+    request_id: Optional[str] = None
+    # Milliseconds spent per pipeline phase (see timing.PHASES).
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class CachedResponse:
+    """Parsed facts from an earlier completed request with the same input hash."""
+
+    provider: str
+    model: Optional[str]
+    facts: EnrichedFacts
+
+
+@dataclass
+class RunStats:
+    """Thread-safe counters collected while a run is in progress."""
+
+    total: int
+    completed: int = 0
+    failed: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    brand_hits: int = 0
+    batch_calls: int = 0
+    batch_retried: int = 0
+    limiter_wait_seconds: float = 0.0
+    retries: int = 0
+    throttled: int = 0
+    released: int = 0
+    spent_cents: float = 0.0
+    budget_cents: Optional[float] = None
+    claimed: int = 0
+    repairs: dict[str, int] = field(default_factory=dict)
+    repaired_responses: int = 0
+    json_fix_calls: int = 0
+    json_fix_ok: int = 0
+    unparseable: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def reserve_claims(self, wanted: int) -> int:
+        """Take up to ``wanted`` slots from the run budget (``total`` claims and ``budget_cents``)."""
+        with self._lock:
+            if self.budget_cents is not None and self.spent_cents >= self.budget_cents:
+                return 0
+            granted = max(0, min(wanted, self.total - self.claimed))
+            self.claimed += granted
+            return granted
+
+    def release_claims(self, unused: int) -> None:
+        with self._lock:
+            self.claimed -= unused
+
+    def record(self, *, ok: bool) -> int:
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            return self.completed + self.failed
+
+    def record_cache(self, *, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def record_brand_hit(self) -> None:
+        with self._lock:
+            self.brand_hits += 1
+
+    def record_batch(self, *, size: int, retried: int) -> None:
+        with self._lock:
+            self.batch_calls += 1
+            self.batch_retried += retried
+
+    def record_provider_error(self, *, throttled: bool, retrying: bool) -> None:
+        with self._lock:
+            if throttled:
+                self.throttled += 1
+            if retrying:
+                self.retries += 1
+
+    def add_cost(self, cents: Optional[float]) -> None:
+        if not cents:
+            return
+        with self._lock:
+            self.spent_cents += cents
+
+    def record_repairs(self, repairs: list[str]) -> None:
+        """Count the local recoveries applied to one response (see ``schema._load_json``)."""
+        if not repairs:
+            return
+        with self._lock:
+            self.repaired_responses += 1
+            for kind in set(repairs):
+                kind = "dropped_fields" if kind.startswith("dropped:") else kind
+                self.repairs[kind] = self.repairs.get(kind, 0) + 1
+
+    def record_json_fix(self, *, ok: Optional[bool]) -> None:
+        """``ok`` is None when no follow-up call was made for an unparseable answer."""
+        with self._lock:
+            if ok is not None:
+                self.json_fix_calls += 1
+                self.json_fix_ok += int(ok)
+            if not ok:
+                self.unparseable += 1
+
+    def record_released(self) -> None:
+        with self._lock:
+            self.released += 1
+
+    def add_wait(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.limiter_wait_seconds += seconds
+
+    def log_summary(self, log: logging.Logger) -> None:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        done = self.completed + self.failed
+        log.info(
+            "Enrichment summary: %d/%d processed (completed=%d failed=%d) in %.1fs "
+            "(%.2f businesses/s, rate-limit wait %.1fs) | response cache hits=%d misses=%d | brand cache hits=%d",
+            done,
+            self.total,
+            self.completed,
+            self.failed,
+            elapsed,
+            done / elapsed,
+            self.limiter_wait_seconds,
+            self.cache_hits,
+            self.cache_misses,
+            self.brand_hits,
+        )
+        if self.batch_calls:
+            log.info(
+                "Batched calls: %d (items retried individually: %d)",
+                self.batch_calls,
+                self.batch_retried,
+            )
+        if self.spent_cents or self.budget_cents is not None:
+            log.info(
+                "Provider spend: %.2f cents%s (%.3f cents per completed business)",
+                self.spent_cents,
+                f" of a {self.budget_cents:.2f} cent budget" if self.budget_cents is not None else "",
+                self.spent_cents / max(1, self.completed),
+            )
+        if self.retries or self.throttled or self.released:
+            log.info(
+                "Provider errors: %d retries, %d throttled responses, %d claims released unprocessed",
+                self.retries,
+                self.throttled,
+                self.released,
+            )
+        if self.repaired_responses or self.json_fix_calls or self.unparseable:
+            log.info(
+                "JSON repairs: %d responses recovered locally (%s), %d/%d fixed by a follow-up call, %d unparseable",
+                self.repaired_responses,
+                ", ".join(f"{kind}={count}" for kind, count in sorted(self.repairs.items())) or "-",
+                self.json_fix_ok,
+                self.json_fix_calls,
+                self.unparseable,
+            )
+
+
+# A request can be claimed when it is queued (and not leased to an exported
+# batch) or when the worker running it let its lease expire, e.g. after a crash.
+CLAIMABLE_PREDICATE = """
+    (status = 'queued' AND (lease_expires_at IS NULL OR lease_expires_at < now()))
+    OR (
+      status = 'running'
+      AND COALESCE(lease_expires_at, started_at + make_interval(secs => %(lease_seconds)s)) < now()
+    )
+"""
+
+ENQUEUE_SQL = """
+    INSERT INTO enrichment_request (
+      request_id, business_id, provider, input_hash, input_payload, status, created_at, queued_at
+    )
+    VALUES %s
+    ON CONFLICT (business_id, input_hash) DO UPDATE
+    SET provider = EXCLUDED.provider,
+        input_payload = EXCLUDED.input_payload,
+        status = 'queued',
+        error = NULL,
+        started_at = NULL,
+        finished_at = NULL,
+        lease_expires_at = NULL,
+        claimed_by = NULL,
+        queued_at = EXCLUDED.queued_at
+    WHERE enrichment_request.status NOT IN ('queued', 'running', 'dead')
+       OR (enrichment_request.status <> 'dead' AND enrichment_request.lease_expires_at < now())
+    RETURNING request_id
+"""
+# clock_timestamp() keeps the planner's ordering (stalest first) within one statement.
+ENQUEUE_TEMPLATE = "(%s, %s, %s, %s, %s, 'queued', now(), clock_timestamp())"
+
+CLAIM_SQL = f"""
+    UPDATE enrichment_request
+       SET status = 'running',
+           claimed_by = %(worker)s,
+           started_at = now(),
+           finished_at = NULL,
+           error = NULL,
+           lease_expires_at = now() + make_interval(secs => %(lease_seconds)s)
+     WHERE request_id IN (
+       SELECT request_id
+       FROM enrichment_request
+       WHERE ({CLAIMABLE_PREDICATE})
+         AND (%(request_ids)s::text[] IS NULL OR request_id = ANY(%(request_ids)s))
+       ORDER BY queued_at NULLS LAST, created_at
+       LIMIT %(limit)s
+       FOR UPDATE SKIP LOCKED
+     )
+    RETURNING request_id, business_id, input_hash, input_payload
+"""
+
+
+LEASE_RENEW_SQL = """
+    UPDATE enrichment_request
+       SET lease_expires_at = now() + make_interval(secs => %(lease_seconds)s)
+     WHERE request_id = ANY(%(ids)s)
+       AND status = 'running'
+       AND left(claimed_by, length(%(owner)s)) = %(owner)s
+    RETURNING request_id
+"""
+
+
+class LeaseHeartbeat:
+    """Keeps extending the leases of requests claimed by this process until their results are written.
+
+    One claim can hold several businesses processed one after another, each
+    with retries, circuit-breaker pauses and the writer's buffering delay, so
+    a fixed lease could expire while the work is still in progress and let
+    another worker pay for the same business again.
+    """
+
+    def __init__(
+        self,
+        pg: Mapping[str, Any],
+        owner: str,
+        lease_seconds: int = LEASE_SECONDS,
+        interval: float = LEASE_RENEW_SECONDS,
+        logger_: Optional[logging.Logger] = None,
+    ) -> None:
+        self.pg = dict(pg)
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.interval = max(0.1, interval)
+        self.log = logger_ or logger
+        self.renewals = 0
+        self._ids: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, request_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._ids.update(request_ids)
+
+    def discard(self, request_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._ids.difference_update(request_ids)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="enrich-lease", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self) -> None:
+        conn = None
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if conn is None or conn.closed:
+                        conn = psycopg2.connect(**self.pg)
+                        conn.autocommit = True
+                    self.renew(conn)
+                except psycopg2.Error as exc:
+                    self.log.warning("Failed to renew enrichment leases: %s", exc)
+                    if conn is not None:
+                        conn.close()
+                    conn = None
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def renew(self, conn: psycopg2.extensions.connection) -> int:
+        """Extend the leases once; requests no longer running under this process are forgotten."""
+        with self._lock:
+            ids = list(self._ids)
+        if not ids:
+            return 0
+        with conn.cursor() as cur:
+            cur.execute(LEASE_RENEW_SQL, {"lease_seconds": self.lease_seconds, "ids": ids, "owner": self.owner})
+            renewed = {row[0] for row in cur.fetchall()}
+        self.discard(set(ids) - renewed)
+        self.renewals += len(renewed)
+        return len(renewed)
+
+
 class EnrichmentRunner:
     """Coordinates DB access and calls to the LLM provider."""
 
@@ -271,44 +641,662 @@ class EnrichmentRunner:
         client: Optional[LLMClient],
         provider_name: Optional[str] = None,
         logger_: Optional[logging.Logger] = None,
+        workers: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        reuse_responses: Optional[bool] = None,
+        use_brand_cache: Optional[bool] = None,
+        batch_size: Optional[int] = None,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
     ) -> None:
         self.pg = dict(pg)
         self.client = client
         self.provider_name = provider_name or os.getenv("LLM_PROVIDER", "unknown")
         self.log = logger_ or logger
-        self.prompt_version = int(os.getenv("ENRICHMENT_PROMPT_VERSION", "2"))
-        self.rate_sleep = float(os.getenv("ENRICHMENT_REQUEST_DELAY", "1.0"))
+        self.prompt_version = int(os.getenv("ENRICHMENT_PROMPT_VERSION", str(PROMPT_VERSION)))
+        self.workers = max(1, workers or int(os.getenv("ENRICHMENT_WORKERS", "1")))
+        self.rate_limiter = rate_limiter or RateLimiter.from_env()
+        if isinstance(client, HedgedClient):
+            # Hedges and failovers are paid calls: they share the run's limiter.
+            client.rate_limiter = self.rate_limiter
+            client.completion_tokens_estimate = COMPLETION_TOKENS_ESTIMATE
+        if reuse_responses is None:
+            reuse_responses = os.getenv("ENRICHMENT_REUSE_RESPONSES", "1").strip().lower() not in {"0", "false", "no"}
+        self.reuse_responses = reuse_responses
+        if use_brand_cache is None:
+            use_brand_cache = os.getenv("ENRICHMENT_BRAND_CACHE", "1").strip().lower() not in {"0", "false", "no"}
+        self.use_brand_cache = use_brand_cache
+        self.batch_size = max(1, batch_size or int(os.getenv("ENRICHMENT_BATCH_SIZE", "1")))
+        self.batch_tokens_per_business = BATCH_TOKENS_PER_BUSINESS
+        self.writer = ResultWriter(flush_size=flush_size, flush_interval=flush_interval, logger_=self.log)
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.breaker = circuit_breaker or CircuitBreaker.from_env()
+        self.concurrency = AdaptiveConcurrency(self.workers)
+        self._leases: Optional[LeaseHeartbeat] = None
+        self._claim_ids: Optional[list[str]] = None
+
+    def run(
+        self,
+        *,
+        limit: int,
+        dry_run: bool = False,
+        force: bool = False,
+        ttl_days: int = 180,
+        plan: bool = True,
+        work: bool = True,
+        budget_cents: Optional[float] = None,
+    ) -> None:
+        """Queue stale businesses (``plan``) and drain the queue (``work``).
 
-    def run(self, *, limit: int, dry_run: bool = False, force: bool = False, ttl_days: int = 30) -> None:
+        Several runs, on the same host or on different machines, can work the
+        same ``enrichment_request`` queue: rows are claimed with
+        ``FOR UPDATE SKIP LOCKED`` and a lease, so no business is sent to the
+        provider twice and claims left behind by a crashed worker are picked
+        up again once their lease expires.
+
+        With ``budget_cents`` the planner queues the businesses with the best
+        expected value per estimated cent that fit in the budget, workers only
+        claim the requests this run queued, and they stop claiming once the
+        actual spend (including discarded hedges and JSON fix calls) reaches it.
+        """
+        if dry_run or self.client is None:
+            with psycopg2.connect(**self.pg) as conn:
+                candidates = self._fetch_candidates(conn, limit=limit, force=force, ttl_days=ttl_days)
+                if not candidates:
+                    self.log.info("No businesses require enrichment")
+                    return
+                total = len(candidates)
+                self.log.info("Processing %d businesses (dry_run=%s)", total, dry_run)
+                businesses = [BusinessRow.from_row(row) for row in candidates]
+                for idx, business in enumerate(businesses[:DRY_RUN_LOGGED_PROMPTS], start=1):
+                    self._log_progress(idx, total, business)
+                    self._log_dry_run(business, dry_run)
+                if total > DRY_RUN_LOGGED_PROMPTS:
+                    self.log.info("... %d more prompts not shown", total - DRY_RUN_LOGGED_PROMPTS)
+                self._forecast(conn, businesses).log_summary(self.log)
+            return
+
+        request_ids = None
+        if plan:
+            queued = self.plan(limit=limit, force=force, ttl_days=ttl_days, budget_cents=budget_cents)
+            if budget_cents is not None:
+                # Other queued rows were not priced against this budget.
+                request_ids = queued
+                limit = min(limit, len(queued))
+        if work:
+            self.work(limit=limit, budget_cents=budget_cents, request_ids=request_ids)
+
+    def forecast(self, *, limit: int, force: bool = False, ttl_days: int = 180) -> Optional[forecast.Forecast]:
+        """Tokens, cost, duration and worker count for enriching the current candidates (no provider calls)."""
         with psycopg2.connect(**self.pg) as conn:
-            conn.autocommit = False
             candidates = self._fetch_candidates(conn, limit=limit, force=force, ttl_days=ttl_days)
             if not candidates:
-                self.log.info("No businesses require enrichment")
-                return
+                return None
+            return self._forecast(conn, [BusinessRow.from_row(row) for row in candidates])
 
-            total = len(candidates)
-            self.log.info("Processing %d businesses (dry_run=%s)", total, dry_run)
-            for idx, row in enumerate(candidates, start=1):
+    def _forecast(self, conn: psycopg2.extensions.connection, businesses: list[BusinessRow]) -> forecast.Forecast:
+        client = next(iter(getattr(self.client, "clients", [self.client])))
+        model = getattr(client, "model", None)
+        history = forecast.load_history(
+            conn,
+            model=model,
+            batch_size=self.batch_size,
+            prompt_for_payload=lambda payload: build_prompt(BusinessRow.from_payload(payload).to_prompt_dict()),
+        )
+        if self.batch_size > 1:
+            chunks = [businesses[i : i + self.batch_size] for i in range(0, len(businesses), self.batch_size)]
+            calls = [
+                (build_batch_prompt([business.to_prompt_dict() for business in chunk]), len(chunk)) for chunk in chunks
+            ]
+        else:
+            calls = [(build_prompt(business.to_prompt_dict()), 1) for business in businesses]
+        return forecast.build_forecast(
+            calls,
+            history=history,
+            model=model,
+            rate_limiter=self.rate_limiter,
+            workers=self.workers,
+            completion_tokens_estimate=COMPLETION_TOKENS_ESTIMATE,
+        )
+
+    def plan(
+        self,
+        *,
+        limit: int,
+        force: bool = False,
+        ttl_days: int = 180,
+        budget_cents: Optional[float] = None,
+    ) -> list[str]:
+        """Insert ``queued`` requests for up to ``limit`` stale businesses; return the queued request ids."""
+        provider = self._provider()
+        started = time.perf_counter()
+        with psycopg2.connect(**self.pg) as conn:
+            if budget_cents is None:
+                candidates = self._fetch_candidates(conn, limit=limit, force=force, ttl_days=ttl_days)
+            else:
+                pool = self._fetch_candidates(
+                    conn, limit=max(limit, BUDGET_CANDIDATE_POOL), force=force, ttl_days=ttl_days
+                )
+                candidates = self._select_within_budget(pool, limit=limit, budget_cents=budget_cents)
+            records = []
+            for row in candidates:
                 business = BusinessRow.from_row(row)
-                try:
-                    self.log.info(
-                        "Enrichment progress %d/%d: %s (%s)",
-                        idx,
-                        total,
+                records.append(
+                    (
+                        str(uuid.uuid4()),
                         business.place_id,
-                        business.category or "unknown",
+                        provider,
+                        business.hash_input(version=self.prompt_version),
+                        Json(business.to_payload(version=self.prompt_version)),
                     )
-                    if dry_run or self.client is None:
-                        self._log_dry_run(business, dry_run)
-                        conn.rollback()
-                        continue
-                    self._process_business(conn, business)
+                )
+            queued = []
+            if records:
+                with conn.cursor() as cur:
+                    queued = execute_values(cur, ENQUEUE_SQL, records, template=ENQUEUE_TEMPLATE, fetch=True)
+            if queued:
+                fetch_ms = (time.perf_counter() - started) * 1000 / len(records)
+                with conn.cursor() as cur:
+                    execute_values(
+                        cur,
+                        timing.PLAN_TIMING_SQL,
+                        [(request_id, round(fetch_ms, 3)) for (request_id,) in queued],
+                        template=timing.PLAN_TIMING_TEMPLATE,
+                    )
+        self.log.info("Queued %d of %d candidate businesses for enrichment", len(queued), len(candidates))
+        return [request_id for (request_id,) in queued]
+
+    def _select_within_budget(
+        self,
+        candidates: list[Mapping[str, Any]],
+        *,
+        limit: int,
+        budget_cents: float,
+    ) -> list[Mapping[str, Any]]:
+        """Greedy knapsack: best expected value per estimated cent first, until the budget is allocated."""
+        scored = []
+        for row in candidates:
+            cost = self._estimate_cost_cents(BusinessRow.from_row(row))
+            scored.append((self._expected_value(row) / max(cost, 1e-6), cost, row))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        selected: list[Mapping[str, Any]] = []
+        allocated = 0.0
+        for _, cost, row in scored:
+            if len(selected) >= limit:
+                break
+            if allocated + cost > budget_cents:
+                continue
+            selected.append(row)
+            allocated += cost
+        self.log.info(
+            "Budget %.2f cents: selected %d of %d candidates (estimated %.2f cents)",
+            budget_cents,
+            len(selected),
+            len(candidates),
+            allocated,
+        )
+        return selected
+
+    @staticmethod
+    def _expected_value(row: Mapping[str, Any]) -> float:
+        """Prior usefulness of enriching a business: sector affinity weighted by local density."""
+        density = float(row.get("density_score") or 0.0)
+        return default_affinity(row.get("category"), row.get("types")) * (0.5 + 0.5 * density)
+
+    def _estimate_cost_cents(self, business: BusinessRow) -> float:
+        prompt_tokens = estimate_tokens(build_prompt(business.to_prompt_dict()))
+        client = next(iter(getattr(self.client, "clients", [self.client])))
+        cost = cost_cents(getattr(client, "model", None), prompt_tokens, COMPLETION_TOKENS_ESTIMATE)
+        if cost is None:
+            # Unknown price: rank by tokens alone (1 cent per 1000 tokens).
+            cost = (prompt_tokens + COMPLETION_TOKENS_ESTIMATE) / 1000
+        return cost
+
+    def work(
+        self,
+        *,
+        limit: int,
+        budget_cents: Optional[float] = None,
+        request_ids: Optional[list[str]] = None,
+    ) -> RunStats:
+        """Claim and process up to ``limit`` queued requests with ``self.workers`` threads.
+
+        ``request_ids`` restricts the claims to those requests (a budgeted plan).
+        """
+        self._claim_ids = request_ids
+        with psycopg2.connect(**self.pg) as conn:
+            depth = self._queue_depth(conn)
+        stats = RunStats(total=min(limit, depth), budget_cents=budget_cents)
+        if not stats.total:
+            self._claim_ids = None
+            self.log.info("No queued enrichment requests")
+            return stats
+
+        self.log.info(
+            "Processing up to %d of %d queued businesses with %d worker(s), batch size %d",
+            stats.total,
+            depth,
+            self.workers,
+            self.batch_size,
+        )
+        pool = ThreadedConnectionPool(1, self.workers, **self.pg)
+        self._leases = LeaseHeartbeat(self.pg, self._worker_prefix(), logger_=self.log)
+        self.writer.on_flushed = self._leases.discard
+        self._leases.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrich") as executor:
+                futures = [executor.submit(self._work_loop, pool, stats) for _ in range(self.workers)]
+            failures = []
+            for future in futures:
+                exc = future.exception()
+                if exc is not None:
+                    self.log.error("Enrichment worker stopped: %s", exc, exc_info=exc)
+                    failures.append(exc)
+            # Results buffered by the surviving workers (and the failed ones) are still written.
+            with psycopg2.connect(**self.pg) as conn:
+                self.writer.flush(conn)
+            if failures:
+                raise failures[0]
+        finally:
+            self._leases.stop()
+            self.writer.on_flushed = None
+            self._leases = None
+            self._claim_ids = None
+            pool.closeall()
+        self._add_discarded_cost(stats)
+        stats.log_summary(self.log)
+        self._log_resilience_summary()
+        self.writer.log_summary()
+        self._log_transport_summary()
+        return stats
+
+    def _log_resilience_summary(self) -> None:
+        if self.concurrency.decreases or self.breaker.opens:
+            self.log.info(
+                "Adaptive concurrency: %d/%d (lowest %d, %d decreases) | circuit breaker opened %d time(s), "
+                "paused %.1fs%s",
+                self.concurrency.limit,
+                self.concurrency.maximum,
+                self.concurrency.lowest,
+                self.concurrency.decreases,
+                self.breaker.opens,
+                self.breaker.paused_seconds,
+                ", tripped: run stopped early" if self.breaker.tripped else "",
+            )
+
+    @staticmethod
+    def _worker_prefix() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:"
+
+    def _work_loop(self, pool: ThreadedConnectionPool, stats: RunStats) -> None:
+        worker = self._worker_prefix() + threading.current_thread().name
+        conn = pool.getconn()
+        try:
+            conn.autocommit = False
+            while not self.breaker.tripped:
+                wanted = stats.reserve_claims(self.batch_size)
+                if not wanted:
+                    return
+                try:
+                    pendings = self._claim(conn, worker, wanted)
                     conn.commit()
-                    time.sleep(self.rate_sleep)
                 except Exception as exc:  # noqa: BLE001
                     conn.rollback()
-                    self.log.exception("Enrichment failed for %s: %s", business.place_id, exc)
+                    stats.release_claims(wanted)
+                    self.log.exception("Failed to claim enrichment requests: %s", exc)
+                    return
+                stats.release_claims(wanted - len(pendings))
+                if not pendings:
+                    return
+                self._process_claimed(conn, pendings, stats)
+                self.writer.maybe_flush(conn)
+        finally:
+            pool.putconn(conn)
+
+    def _claim(self, conn: psycopg2.extensions.connection, worker: str, limit: int) -> list[PendingEnrichment]:
+        started = time.perf_counter()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                CLAIM_SQL,
+                {
+                    "worker": worker,
+                    "lease_seconds": LEASE_SECONDS,
+                    "limit": limit,
+                    "request_ids": self._claim_ids,
+                },
+            )
+            rows = cur.fetchall()
+        pendings = []
+        for row in rows:
+            business = BusinessRow.from_payload(row["input_payload"])
+            pendings.append(
+                PendingEnrichment(
+                    business=business,
+                    input_hash=row["input_hash"],
+                    payload=row["input_payload"],
+                    brand_key=self._brand_key(business),
+                    request_id=row["request_id"],
+                )
+            )
+        for pending in pendings:
+            pending.timings["claim_ms"] = (time.perf_counter() - started) * 1000 / len(pendings)
+        if self._leases is not None:
+            self._leases.add(pending.request_id for pending in pendings)
+        return pendings
+
+    def _queue_depth(self, conn: psycopg2.extensions.connection) -> int:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT count(*) FROM enrichment_request
+                WHERE ({CLAIMABLE_PREDICATE})
+                  AND (%(request_ids)s::text[] IS NULL OR request_id = ANY(%(request_ids)s))
+                """,
+                {"lease_seconds": LEASE_SECONDS, "request_ids": self._claim_ids},
+            )
+            return int(cur.fetchone()[0])
+
+    def _log_transport_summary(self) -> None:
+        if isinstance(self.client, HedgedClient):
+            self.client.log_summary(self.log)
+        for client in getattr(self.client, "clients", [self.client]):
+            transport = getattr(client, "transport_stats", None)
+            if transport is None:
+                continue
+            per_call = transport.saved_ms_per_call()
+            self.log.info(
+                "%s connections: %d new, %d reused%s",
+                getattr(client, "label", "Provider"),
+                transport.cold_calls,
+                transport.warm_calls,
+                f" (~{per_call:.0f} ms saved per reused call, {transport.total_saved_ms() / 1000:.1f}s total)"
+                if per_call is not None
+                else "",
+            )
+            if transport.streamed_calls:
+                self.log.info(
+                    "%s streaming: %d calls, avg time to first token %.0f ms, %d closed early "
+                    "(up to ~%.1fs of generation avoided)",
+                    getattr(client, "label", "Provider"),
+                    transport.streamed_calls,
+                    transport.ttft_ms / transport.streamed_calls,
+                    transport.early_stops,
+                    transport.stream_saved_ms / 1000,
+                )
+
+    def export_batch(self, path: str, *, limit: int, force: bool = False, ttl_days: int = 180) -> int:
+        """Write provider batch-API requests for every candidate to a JSONL file.
+
+        Each line follows the OpenAI batch input format; ``custom_id`` is the
+        ``enrichment_request.request_id``, which keeps the business metadata
+        (``input_payload``) in the database. Exported rows stay ``queued`` and
+        are leased to the batch for ENRICHMENT_BATCH_LEASE_HOURS so online runs
+        skip them until the results are ingested. Returns the number of lines.
+        """
+        # With several providers configured the batch goes to the primary one.
+        client = next(iter(getattr(self.client, "clients", [self.client])))
+        if not isinstance(client, ChatCompletionsClient):
+            raise ValueError("Batch export requires LLM_PROVIDER to be configured")
+        provider = self._provider()
+        stats = RunStats(total=0)
+        written = 0
+        with psycopg2.connect(**self.pg) as conn, open(path, "w", encoding="utf-8") as fh:
+            conn.autocommit = False
+            candidates = self._fetch_candidates(conn, limit=limit, force=force, ttl_days=ttl_days)
+            stats.total = len(candidates)
+            for row in candidates:
+                business = BusinessRow.from_row(row)
+                pending = self._pending_for(business)
+                if self._resolve_from_cache(conn, pending, stats):
+                    conn.commit()
+                    continue
+                with conn.cursor() as cur:
+                    request_id = self._upsert_request(
+                        cur,
+                        business.place_id,
+                        provider,
+                        pending.input_hash,
+                        pending.payload,
+                        status="queued",
+                        lease_hours=BATCH_EXPORT_LEASE_HOURS,
+                    )
+                conn.commit()
+                body = client.build_payload(
+                    build_prompt(business.to_prompt_dict()),
+                    client.default_temperature,
+                    client.default_max_tokens,
+                )
+                line = {"custom_id": request_id, "method": "POST", "url": BATCH_ENDPOINT_URL, "body": body}
+                fh.write(json.dumps(line, ensure_ascii=False) + "\n")
+                written += 1
+            self.writer.flush(conn)
+        self.log.info(
+            "Exported %d batch requests to %s (%d resolved from cache without export)",
+            written,
+            path,
+            stats.cache_hits + stats.brand_hits,
+        )
+        return written
+
+    def ingest_batch(self, path: str) -> RunStats:
+        """Bulk-write the results of a provider batch job produced by ``export_batch``.
+
+        Malformed lines are counted as failed without stopping the ingest;
+        results for requests that are no longer ``queued`` (re-queued with a
+        new payload, completed or dead-lettered since the export) are skipped.
+        When the results cannot be stored they are all reported as failed:
+        the requests stay queued and the file can be ingested again.
+        """
+        lines: list[dict[str, Any]] = []
+        malformed = 0
+        with open(path, "r", encoding="utf-8") as fh:
+            for number, raw in enumerate(fh, start=1):
+                if not raw.strip():
+                    continue
+                try:
+                    line = json.loads(raw)
+                    if not isinstance(line, dict):
+                        raise ValueError("not a JSON object")
+                except ValueError as exc:
+                    malformed += 1
+                    self.log.warning("Skipping line %d of %s: %s", number, path, exc)
+                    continue
+                lines.append(line)
+        stats = RunStats(total=len(lines) + malformed)
+        for _ in range(malformed):
+            stats.record(ok=False)
+        if not lines:
+            self.log.info("Batch results file %s has no usable lines", path)
+            return stats
+
+        with psycopg2.connect(**self.pg) as conn:
+            conn.autocommit = False
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT request_id, business_id, provider, input_payload, status
+                    FROM enrichment_request
+                    WHERE request_id = ANY(%s)
+                    """,
+                    ([str(line.get("custom_id")) for line in lines],),
+                )
+                requests_by_id = {row["request_id"]: row for row in cur.fetchall()}
+
+            skipped = 0
+            buffered = succeeded = 0
+            for line in lines:
+                request_id = str(line.get("custom_id"))
+                request = requests_by_id.get(request_id)
+                if request is None:
+                    self.log.warning("Skipping batch result %s: no matching enrichment_request", request_id)
+                    stats.record(ok=False)
+                    continue
+                if request["status"] != "queued":
+                    self.log.warning(
+                        "Skipping batch result %s: request is %s, not queued", request_id, request["status"]
+                    )
+                    skipped += 1
+                    continue
+                try:
+                    business = BusinessRow.from_payload(request["input_payload"])
+                    result = self._batch_line_result(line)
+                    repairs: list[str] = []
+                    facts = parse_enriched_facts(result.text, repairs)
+                    stats.record_repairs(repairs)
+                except (LLMError, ValueError) as exc:
+                    self.writer.add_error(request_id, str(exc))
+                    buffered += 1
+                    stats.record(ok=False)
+                    continue
+                self.writer.add_success(
+                    request_id, business, request["provider"], result, facts, brand_key=self._brand_key(business)
+                )
+                buffered += 1
+                succeeded += 1
+            written = self.writer.flush(conn)
+            # Nothing was stored: the rows stay queued and the file must be ingested again.
+            flush_failed = buffered > 0 and written == 0
+            for _ in range(succeeded):
+                stats.record(ok=not flush_failed)
+        if flush_failed:
+            self.log.error(
+                "Could not store the %d batch results from %s; the requests are still queued, ingest the file again",
+                buffered,
+                path,
+            )
+        self.log.info(
+            "Ingested batch results from %s: %d completed, %d failed, %d skipped (no longer queued)",
+            path,
+            stats.completed,
+            stats.failed,
+            skipped,
+        )
+        return stats
+
+    @staticmethod
+    def _batch_line_result(line: Mapping[str, Any]) -> CompletionResult:
+        error = line.get("error")
+        response = line.get("response") or {}
+        if error:
+            raise LLMError(f"Batch request failed: {error}")
+        status_code = int(response.get("status_code") or 0)
+        if status_code >= 400 or not response.get("body"):
+            raise LLMError(f"Batch API error {status_code}: {response.get('body')}")
+        result = parse_chat_completion(response["body"], label="Batch")
+        result.cost_cents = cost_cents(
+            result.model,
+            result.prompt_tokens,
+            result.completion_tokens,
+            discount=BATCH_DISCOUNT,
+            cached_tokens=result.cached_tokens,
+        )
+        return result
+
+    def _process_claimed(
+        self,
+        conn: psycopg2.extensions.connection,
+        claimed: list[PendingEnrichment],
+        stats: RunStats,
+    ) -> None:
+        pendings: list[PendingEnrichment] = []
+        for pending in claimed:
+            try:
+                with timing.measure(pending.timings, "cache_ms"):
+                    resolved = self._resolve_from_cache(conn, pending, stats)
+                conn.commit()
+            except Exception as exc:  # noqa: BLE001
+                self._record_failure(conn, pending, stats, exc)
+                continue
+            if resolved:
+                self._finish(stats, pending.business, ok=True)
+            else:
+                pendings.append(pending)
+
+        retry = pendings
+        if len(pendings) > 1:
+            try:
+                retry = self._enrich_batch(conn, pendings, stats)
+                conn.commit()
+            except Exception as exc:  # noqa: BLE001
+                conn.rollback()
+                self.log.warning("Batched enrichment failed (%s); retrying %d businesses alone", exc, len(pendings))
+                retry = pendings
+            for pending in pendings:
+                if pending not in retry:
+                    self._finish(stats, pending.business, ok=True)
+        for pending in retry:
+            self._attempt(conn, pending, stats, partial(self._enrich_single, conn, pending, stats))
+
+    def _attempt(
+        self,
+        conn: psycopg2.extensions.connection,
+        pending: PendingEnrichment,
+        stats: RunStats,
+        action: Callable[[], None],
+    ) -> None:
+        """Run ``action`` in its own transaction; failures are logged, counted and recorded."""
+        try:
+            action()
+            conn.commit()
+        except CircuitOpenError:
+            self._release_claim(conn, pending, stats)
+            return
+        except Exception as exc:  # noqa: BLE001
+            self._record_failure(conn, pending, stats, exc)
+            return
+        self._finish(stats, pending.business, ok=True)
+
+    def _release_claim(self, conn: psycopg2.extensions.connection, pending: PendingEnrichment, stats: RunStats) -> None:
+        """Put a claimed request back in the queue untouched (the provider is unavailable)."""
+        conn.rollback()
+        if pending.request_id is not None:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE enrichment_request
+                       SET status = 'queued',
+                           claimed_by = NULL,
+                           started_at = NULL,
+                           lease_expires_at = NULL
+                     WHERE request_id = %s
+                       AND status = 'running'
+                    """,
+                    (pending.request_id,),
+                )
+            conn.commit()
+            if self._leases is not None:
+                self._leases.discard([pending.request_id])
+        stats.record_released()
+
+    def _record_failure(
+        self,
+        conn: psycopg2.extensions.connection,
+        pending: PendingEnrichment,
+        stats: RunStats,
+        exc: Exception,
+    ) -> None:
+        """Roll back the failed work and release the claim by marking the request as errored."""
+        conn.rollback()
+        self.log.exception("Enrichment failed for %s: %s", pending.business.place_id, exc)
+        if pending.request_id is not None:
+            self.writer.add_error(pending.request_id, str(exc), timings=pending.timings, provider=self._provider())
+        self._finish(stats, pending.business, ok=False)
+
+    def _finish(self, stats: RunStats, business: BusinessRow, *, ok: bool) -> None:
+        done = stats.record(ok=ok)
+        self._log_progress(done, stats.total, business)
+
+    def _log_progress(self, idx: int, total: int, business: BusinessRow) -> None:
+        self.log.info(
+            "Enrichment progress %d/%d: %s (%s)",
+            idx,
+            total,
+            business.place_id,
+            business.category or "unknown",
+        )
 
     def _fetch_candidates(
         self,
@@ -318,14 +1306,12 @@ class EnrichmentRunner:
         force: bool,
         ttl_days: int,
     ) -> list[Mapping[str, Any]]:
-        clause: str
-        params: list[Any]
-        if force:
-            clause = "TRUE"
-            params = [limit]
-        else:
-            clause = "bf.business_id IS NULL OR bf.updated_at < now() - (%s || ' days')::interval"
-            params = [str(ttl_days), limit]
+        if not force:
+            updated = change_index.refresh(conn)
+            if updated:
+                self.log.info("Change index: %d businesses with a new baseline or field diff", updated)
+        clause = "TRUE" if force else change_index.STALE_PREDICATE
+        params = {"ttl_days": ttl_days, "limit": limit}
 
         query = sql.SQL(
             """
@@ -345,13 +1331,17 @@ class EnrichmentRunner:
               pr.opening_hours_json,
               pr.rating,
               pr.user_ratings_total,
+              psd.density_score,
               bf.updated_at AS facts_updated_at,
               bf.confidence AS facts_confidence,
+              ci.changed_fields,
               ST_Y(p.location::geometry) AS latitude,
               ST_X(p.location::geometry) AS longitude
             FROM places_clean p
             JOIN places_raw pr ON pr.place_id = p.place_id
             LEFT JOIN business_facts bf ON bf.business_id = p.place_id
+            LEFT JOIN place_sector_density psd ON psd.place_id = p.place_id
+            LEFT JOIN enrichment_change_index ci ON ci.business_id = p.place_id
             LEFT JOIN LATERAL (
               SELECT i.comune
               FROM istat_comuni i
@@ -360,11 +1350,24 @@ class EnrichmentRunner:
               ORDER BY i.popolazione DESC NULLS LAST, i.comune
               LIMIT 1
             ) city_guess ON TRUE
-            WHERE {where_clause}
-            ORDER BY bf.updated_at NULLS FIRST, p.place_id
-            LIMIT %s
+            WHERE ({where_clause})
+              AND NOT EXISTS (
+                SELECT 1
+                FROM enrichment_request q
+                WHERE q.business_id = p.place_id
+                  AND (q.status = 'queued' OR (q.status = 'running' AND q.lease_expires_at > now()))
+              )
+              AND NOT {blocked}
+            ORDER BY
+              -- businesses that failed before go after fresh ones, whatever their facts say
+              (SELECT COALESCE(max(f.attempt_count), 0) FROM enrichment_request f WHERE f.business_id = p.place_id),
+              bf.updated_at IS NOT NULL,
+              COALESCE(cardinality(ci.changed_fields), 0) = 0,
+              bf.updated_at,
+              p.place_id
+            LIMIT %(limit)s
             """
-        ).format(where_clause=sql.SQL(clause))
+        ).format(where_clause=sql.SQL(clause), blocked=sql.SQL(dead_letter.BLOCKED_PREDICATE))
 
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query, params)
@@ -382,39 +1385,317 @@ class EnrichmentRunner:
             prompt[:400],
         )
 
-    def _process_business(self, conn: psycopg2.extensions.connection, business: BusinessRow) -> None:
+    def _complete(
+        self,
+        prompt: str,
+        stats: RunStats,
+        max_tokens: Optional[int] = None,
+        timings: Optional[dict[str, float]] = None,
+    ) -> CompletionResult:
+        """Call the provider with retries on transient errors.
+
+        Retries use exponential backoff with jitter and honour ``Retry-After``;
+        throttling responses shrink the adaptive concurrency limit and repeated
+        failures open the circuit breaker, which pauses every worker. Auth and
+        configuration errors (401/403/404) trip the breaker at once. Time
+        spent waiting for the rate limiter and in HTTP calls is added to
+        ``timings``.
+        """
         assert self.client is not None
-        payload = business.to_payload(version=self.prompt_version)
-        input_hash = business.hash_input(version=self.prompt_version)
-        provider = self.provider_name or self.client.__class__.__name__
+        estimated = estimate_tokens(prompt) + (max_tokens or COMPLETION_TOKENS_ESTIMATE)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            self.concurrency.acquire()
+            try:
+                with timing.measure(timings, "limiter_ms"):
+                    stats.add_wait(self.rate_limiter.acquire(estimated))
+                with timing.measure(timings, "http_ms"):
+                    result = self.client.complete(prompt=prompt, max_tokens=max_tokens)
+            except LLMError as exc:
+                if exc.fatal:
+                    # Every claimed row would fail the same way: stop the run
+                    # and put the claims back without counting an attempt.
+                    self.breaker.trip()
+                    self.log.error("Provider rejected the request configuration (%s); stopping the run", exc)
+                    raise CircuitOpenError(str(exc)) from exc
+                if not exc.retryable:
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if exc.throttled:
+                    self.concurrency.on_throttle()
+                retrying = attempt < self.retry_policy.max_attempts
+                stats.record_provider_error(throttled=exc.throttled, retrying=retrying)
+                if not retrying:
+                    raise
+                delay = self.retry_policy.delay(attempt, exc.retry_after)
+                self.log.warning(
+                    "Provider call failed (%s); retry %d/%d in %.1fs",
+                    exc,
+                    attempt,
+                    self.retry_policy.max_attempts - 1,
+                    delay,
+                )
+            else:
+                self.breaker.record_success()
+                self.concurrency.on_success()
+                break
+            finally:
+                self.concurrency.release()
+                self._add_discarded_cost(stats)
+            time.sleep(delay)
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            request_id = self._upsert_request(cur, business.place_id, provider, input_hash, payload)
+        if result.latency_ms is not None:
+            self.log.debug(
+                "Provider call took %.0f ms (%s connection%s)",
+                result.latency_ms,
+                "reused" if result.connection_reused else "new",
+                f", first token after {result.ttft_ms:.0f} ms" if result.ttft_ms is not None else "",
+            )
+        stats.add_cost(result.cost_cents)
+        if result.prompt_tokens is not None or result.completion_tokens is not None:
+            self.rate_limiter.settle(estimated, (result.prompt_tokens or 0) + (result.completion_tokens or 0))
+        return result
 
-        prompt = build_prompt(business.to_prompt_dict())
-        try:
-            result = self.client.complete(prompt=prompt)
-        except LLMError as exc:
-            self._mark_request_error(conn, request_id, str(exc))
-            raise
+    def _add_discarded_cost(self, stats: RunStats) -> None:
+        """Charge answers the hedged client paid for but did not return."""
+        if isinstance(self.client, HedgedClient):
+            stats.add_cost(self.client.drain_discarded_cost())
+
+    def _pending_for(self, business: BusinessRow) -> PendingEnrichment:
+        return PendingEnrichment(
+            business=business,
+            input_hash=business.hash_input(version=self.prompt_version),
+            payload=business.to_payload(version=self.prompt_version),
+            brand_key=self._brand_key(business),
+        )
+
+    def _brand_key(self, business: BusinessRow) -> Optional[str]:
+        if not self.use_brand_cache:
+            return None
+        return brand_cache.brand_key(business.name, business.raw_website)
+
+    def _resolve_from_cache(
+        self,
+        conn: psycopg2.extensions.connection,
+        pending: PendingEnrichment,
+        stats: RunStats,
+    ) -> bool:
+        """Complete ``pending`` from stored data when possible; return False if the provider is needed."""
+        business = pending.business
+        if self.reuse_responses:
+            cached = self._load_cached_response(conn, business.place_id, pending.input_hash)
+            stats.record_cache(hit=cached is not None)
+            if cached is not None:
+                self.log.info("Reusing stored response for %s (input hash unchanged)", business.place_id)
+                self.writer.add_reused(
+                    pending.request_id, business, cached.provider, cached.model, cached.facts, timings=pending.timings
+                )
+                return True
+
+        entry = (
+            brand_cache.lookup(conn, pending.brand_key, business.place_id, business.raw_website)
+            if pending.brand_key
+            else None
+        )
+        if entry is not None:
+            self._apply_brand_entry(conn, pending, entry)
+            stats.record_brand_hit()
+            return True
+        return False
+
+    def _provider(self) -> str:
+        assert self.client is not None
+        return self.provider_name or self.client.__class__.__name__
+
+    def _enrich_single(
+        self,
+        conn: psycopg2.extensions.connection,
+        pending: PendingEnrichment,
+        stats: RunStats,
+    ) -> None:
+        business = pending.business
+        with timing.measure(pending.timings, "prompt_ms"):
+            prompt = build_prompt(business.to_prompt_dict())
+        result = self._complete(prompt, stats, timings=pending.timings)
+        repairs: list[str] = []
         try:
-            facts = parse_enriched_facts(result.text)
+            with timing.measure(pending.timings, "parse_ms"):
+                facts = parse_enriched_facts(result.text, repairs)
         except ValueError as exc:
             snippet = result.text.strip()
             snippet = snippet[:500] + ("…" if len(snippet) > 500 else "")
-            self.log.error(
+            self.log.warning(
                 "Failed to parse LLM response for %s: %s | response snippet: %s",
                 business.place_id,
                 exc,
                 snippet,
             )
-            self._mark_request_error(conn, request_id, str(exc))
+            if not JSON_FIX_CALL:
+                stats.record_json_fix(ok=None)
+                raise
+            result, facts = self._fix_response(business, result, stats, pending.timings)
+        stats.record_repairs(repairs)
+        self._persist_success(pending, result, facts)
+
+    def _fix_response(
+        self,
+        business: BusinessRow,
+        result: CompletionResult,
+        stats: RunStats,
+        timings: Optional[dict[str, float]] = None,
+    ) -> tuple[CompletionResult, EnrichedFacts]:
+        """Recover an unparseable answer with a cheap follow-up call instead of paying for a new one."""
+        with timing.measure(timings, "prompt_ms"):
+            fix_prompt = build_fix_prompt(result.text)
+        fix = self._complete(fix_prompt, stats, max_tokens=JSON_FIX_MAX_TOKENS, timings=timings)
+        repairs: list[str] = []
+        try:
+            with timing.measure(timings, "parse_ms"):
+                facts = parse_enriched_facts(fix.text, repairs)
+        except ValueError:
+            stats.record_json_fix(ok=False)
             raise
+        stats.record_json_fix(ok=True)
+        stats.record_repairs(repairs)
+        self.log.info("Fixed the JSON answer for %s with a follow-up call", business.place_id)
+        combined = replace(
+            result,
+            prompt_tokens=_sum_usage(result.prompt_tokens, fix.prompt_tokens),
+            completion_tokens=_sum_usage(result.completion_tokens, fix.completion_tokens),
+            cost_cents=_sum_usage(result.cost_cents, fix.cost_cents),
+            raw={**(result.raw or {}), "json_fix": fix.raw},
+        )
+        return combined, facts
 
-        with conn.cursor() as cur:
-            self._store_response(cur, request_id, result, facts)
-            self._upsert_business_facts(cur, business, provider, result, facts)
-            self._mark_request_complete(cur, request_id)
+    def _enrich_batch(
+        self,
+        conn: psycopg2.extensions.connection,
+        pendings: list[PendingEnrichment],
+        stats: RunStats,
+    ) -> list[PendingEnrichment]:
+        """Enrich several businesses with one provider call; return those to retry individually."""
+        shared: dict[str, float] = {}
+        with timing.measure(shared, "prompt_ms"):
+            prompt = build_batch_prompt([pending.business.to_prompt_dict() for pending in pendings])
+        result = self._complete(prompt, stats, max_tokens=self.batch_tokens_per_business * len(pendings), timings=shared)
+        repairs: list[str] = []
+        with timing.measure(shared, "parse_ms"):
+            parsed, errors = parse_enriched_facts_batch(result.text, repairs)
+        stats.record_repairs(repairs)
+
+        size = len(pendings)
+        for pending in pendings:
+            for phase, elapsed in shared.items():
+                pending.timings[phase] = pending.timings.get(phase, 0.0) + elapsed / size
+        share = replace(
+            result,
+            prompt_tokens=_split_usage(result.prompt_tokens, size),
+            completion_tokens=_split_usage(result.completion_tokens, size),
+            cost_cents=result.cost_cents / size if result.cost_cents is not None else None,
+        )
+        retry: list[PendingEnrichment] = []
+        for pending in pendings:
+            place_id = pending.business.place_id
+            facts = parsed.get(place_id)
+            if facts is None:
+                self.log.warning(
+                    "Batched response has no valid entry for %s (%s); retrying it alone",
+                    place_id,
+                    errors.get(place_id, "missing"),
+                )
+                retry.append(pending)
+                continue
+            self._persist_success(pending, share, facts, batch_size=size)
+        stats.record_batch(size=size, retried=len(retry))
+        return retry
+
+    def _persist_success(
+        self,
+        pending: PendingEnrichment,
+        result: CompletionResult,
+        facts: EnrichedFacts,
+        batch_size: int = 1,
+    ) -> None:
+        assert pending.request_id is not None
+        self.writer.add_success(
+            pending.request_id,
+            pending.business,
+            result.provider or self._provider(),
+            result,
+            facts,
+            brand_key=pending.brand_key,
+            request_provider=result.provider,
+            timings=pending.timings,
+            batch_size=batch_size,
+        )
+
+    def _apply_brand_entry(
+        self,
+        conn: psycopg2.extensions.connection,
+        pending: PendingEnrichment,
+        entry: brand_cache.BrandEntry,
+    ) -> None:
+        """Complete a branch from chain-level facts without calling the provider."""
+        facts = entry.to_facts()
+        result = CompletionResult(
+            text=facts.model_dump_json(),
+            model=entry.source_model,
+            prompt_tokens=None,
+            completion_tokens=None,
+            cost_cents=0,
+            raw={"source": "brand_cache", "brand_key": entry.brand_key, "source_request_id": entry.source_request_id},
+        )
+        business = pending.business
+        self.log.info("Reusing brand facts for %s from %s", business.place_id, entry.brand_key)
+        request_id = pending.request_id
+        if request_id is None:
+            with conn.cursor() as cur:
+                request_id = self._upsert_request(
+                    cur, business.place_id, "brand_cache", pending.input_hash, pending.payload
+                )
+        self.writer.add_success(
+            request_id,
+            business,
+            "brand_cache",
+            result,
+            facts,
+            request_provider="brand_cache",
+            timings=pending.timings,
+            batch_size=0,
+        )
+
+    def _load_cached_response(
+        self,
+        conn: psycopg2.extensions.connection,
+        business_id: str,
+        input_hash: str,
+    ) -> Optional[CachedResponse]:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT r.provider, resp.model, resp.parsed_response
+                FROM enrichment_request r
+                JOIN enrichment_response resp ON resp.request_id = r.request_id
+                WHERE r.business_id = %s
+                  AND r.input_hash = %s
+                  AND resp.parsed_response IS NOT NULL
+                ORDER BY resp.created_at DESC
+                LIMIT 1
+                """,
+                (business_id, input_hash),
+            )
+            row = cur.fetchone()
+        if not row:
+            return None
+        try:
+            facts = EnrichedFacts.model_validate(row["parsed_response"])
+        except ValidationError as exc:
+            self.log.warning("Stored response for %s no longer matches the schema: %s", business_id, exc)
+            return None
+        return CachedResponse(provider=row["provider"], model=row["model"], facts=facts)
 
     def _upsert_request(
         self,
@@ -423,24 +1704,43 @@ class EnrichmentRunner:
         provider: str,
         input_hash: str,
         payload: dict[str, Any],
+        status: str = "running",
+        lease_hours: Optional[float] = None,
     ) -> str:
         request_id = str(uuid.uuid4())
         cur.execute(
             """
             INSERT INTO enrichment_request (
-              request_id, business_id, provider, input_hash, input_payload, status, created_at, started_at
+              request_id, business_id, provider, input_hash, input_payload, status, created_at, started_at,
+              lease_expires_at, queued_at
+            )
+            VALUES (
+              %(request_id)s, %(business_id)s, %(provider)s, %(input_hash)s, %(payload)s, %(status)s, now(),
+              CASE WHEN %(status)s = 'running' THEN now() END,
+              now() + make_interval(secs => %(lease_seconds)s),
+              CASE WHEN %(status)s = 'queued' THEN now() END
             )
-            VALUES (%s, %s, %s, %s, %s, 'running', now(), now())
             ON CONFLICT (business_id, input_hash) DO UPDATE
             SET provider = EXCLUDED.provider,
                 input_payload = EXCLUDED.input_payload,
-                status = 'running',
+                status = EXCLUDED.status,
                 error = NULL,
-                started_at = now(),
-                finished_at = NULL
+                started_at = EXCLUDED.started_at,
+                finished_at = NULL,
+                lease_expires_at = EXCLUDED.lease_expires_at,
+                queued_at = EXCLUDED.queued_at,
+                claimed_by = NULL
             RETURNING request_id
             """,
-            (request_id, business_id, provider, input_hash, Json(payload)),
+            {
+                "request_id": request_id,
+                "business_id": business_id,
+                "provider": provider,
+                "input_hash": input_hash,
+                "payload": Json(payload),
+                "status": status,
+                "lease_seconds": lease_hours * 3600 if lease_hours is not None else None,
+            },
         )
         row = cur.fetchone()
         if not row:
@@ -448,120 +1748,3 @@ class EnrichmentRunner:
         if isinstance(row, dict):
             return row["request_id"]
         return row[0]
-
-    def _store_response(
-        self,
-        cur: psycopg2.extensions.cursor,
-        request_id: str,
-        result: CompletionResult,
-        facts: EnrichedFacts,
-    ) -> None:
-        response_id = str(uuid.uuid4())
-        cur.execute(
-            """
-            INSERT INTO enrichment_response (
-              response_id, request_id, model, raw_response, parsed_response,
-              prompt_tokens, completion_tokens, cost_cents, created_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now())
-            """,
-            (
-                response_id,
-                request_id,
-                result.model,
-                Json(result.raw),
-                Json(facts.model_dump(mode="json")),
-                result.prompt_tokens,
-                result.completion_tokens,
-                result.cost_cents,
-            ),
-        )
-
-    def _upsert_business_facts(
-        self,
-        cur: psycopg2.extensions.cursor,
-        business: BusinessRow,
-        provider: str,
-        result: CompletionResult,
-        facts: EnrichedFacts,
-    ) -> None:
-        business_id = business.place_id
-        facts_json = facts.model_dump(mode="json")
-        overrides = compute_business_facts(
-            name=business.name,
-            category=business.category,
-            types=business.types,
-            has_website=business.has_website or bool(facts_json.get("website_url")),
-            has_phone=business.has_phone,
-            hours_weekly=business.hours_weekly,
-            existing=facts_json,
-        )
-        for key, value in overrides.items():
-            if value is not None and (facts_json.get(key) in (None, "")):
-                facts_json[key] = value
-        social = facts_json.get("social")
-        cur.execute(
-            """
-            INSERT INTO business_facts (
-              business_id, size_class, is_chain, website_url, social,
-              marketing_attitude, umbrella_affinity, ad_budget_band,
-              budget_source, confidence, provenance, updated_at,
-              source_provider, source_model
-            )
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s, now(), %s, %s)
-            ON CONFLICT (business_id) DO UPDATE SET
-              size_class = EXCLUDED.size_class,
-              is_chain = EXCLUDED.is_chain,
-              website_url = EXCLUDED.website_url,
-              social = EXCLUDED.social,
-              marketing_attitude = EXCLUDED.marketing_attitude,
-              umbrella_affinity = EXCLUDED.umbrella_affinity,
-              ad_budget_band = EXCLUDED.ad_budget_band,
-              budget_source = EXCLUDED.budget_source,
-              confidence = EXCLUDED.confidence,
-              provenance = EXCLUDED.provenance,
-              updated_at = EXCLUDED.updated_at,
-              source_provider = EXCLUDED.source_provider,
-              source_model = EXCLUDED.source_model
-            """,
-            (
-                business_id,
-                facts_json.get("size_class"),
-                facts_json.get("is_chain"),
-                facts_json.get("website_url"),
-                Json(social) if social else None,
-                facts_json.get("marketing_attitude"),
-                facts_json.get("umbrella_affinity"),
-                facts_json.get("ad_budget_band"),
-                "LLM_infer" if facts_json.get("ad_budget_band") else None,
-                facts_json.get("confidence"),
-                Json(facts_json.get("provenance")) if facts_json.get("provenance") else None,
-                provider,
-                result.model,
-            ),
-        )
-
-    def _mark_request_complete(self, cur: psycopg2.extensions.cursor, request_id: str) -> None:
-        cur.execute(
-            """
-            UPDATE enrichment_request
-               SET status = 'completed',
-                   error = NULL,
-                   finished_at = now()
-             WHERE request_id = %s
-            """,
-            (request_id,),
-        )
-
-    def _mark_request_error(self, conn: psycopg2.extensions.connection, request_id: str, message: str) -> None:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE enrichment_request
-                   SET status = 'error',
-                       error = %s,
-                       finished_at = now()
-                 WHERE request_id = %s
-                """,
-                (message[:500], request_id),
-            )
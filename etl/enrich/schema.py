@@ -1,9 +1,11 @@
 import json
 import re
-from typing import Any, Dict, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field, HttpUrl, ValidationError
 
+from .jsonscan import extract_json, normalize_quoting, python_literal, repair_truncated
+
 
 SizeClass = Literal["micro", "piccola", "media", "grande"]
 BudgetBand = Literal["basso", "medio", "alto"]
@@ -44,14 +46,72 @@ def _maybe_fix_url(url: Any) -> Any:
     return value
 
 
-def parse_enriched_facts(raw_text: str) -> EnrichedFacts:
-    """Parse a JSON string returned by the LLM into EnrichedFacts."""
+def _load_json(raw_text: str, repairs: Optional[List[str]] = None) -> Any:
+    """Decode the LLM answer, recovering the usual malformations locally.
+
+    In order: the whole text, the first balanced JSON value inside it (prose
+    or fences around it), the same with typographic quotes and trailing
+    commas fixed, a truncated value closed at its last complete member, and
+    finally a Python-style literal. Each recovery step taken is appended to
+    ``repairs``.
+    """
     candidate = _strip_code_fence(raw_text.strip())
     try:
-        payload = json.loads(candidate)
+        return json.loads(candidate)
     except json.JSONDecodeError as exc:
-        raise ValueError(f"LLM response is not valid JSON: {exc}: {raw_text}") from exc
-
+        error = exc
+
+    extracted = extract_json(candidate)
+    attempts = []
+    if extracted is not None:
+        attempts.append(("extracted", extracted))
+        attempts.append(("quoting", normalize_quoting(extracted)))
+    else:
+        attempts.append(("quoting", normalize_quoting(candidate)))
+        truncated = repair_truncated(normalize_quoting(candidate))
+        if truncated is not None:
+            attempts.append(("truncated", truncated))
+    for kind, text in attempts:
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError:
+            continue
+        if repairs is not None:
+            repairs.append(kind)
+        return payload
+
+    literal = python_literal(extracted or candidate)
+    if isinstance(literal, (dict, list)):
+        if repairs is not None:
+            repairs.append("python_literal")
+        return literal
+    raise ValueError(f"LLM response is not valid JSON: {error}: {raw_text}") from error
+
+
+def _drop_invalid_fields(payload: Dict[str, Any], exc: ValidationError, repairs: Optional[List[str]]) -> bool:
+    """Null out the fields named in ``exc``; return False if nothing could be dropped."""
+    dropped = False
+    for error in exc.errors():
+        loc = error.get("loc") or ()
+        if not loc or loc[0] not in EnrichedFacts.model_fields:
+            continue
+        field_name = loc[0]
+        container = payload.get(field_name)
+        if field_name == "social" and len(loc) > 1 and isinstance(container, dict) and loc[1] in container:
+            container.pop(loc[1])
+            label = f"social.{loc[1]}"
+        elif payload.get(field_name) is not None:
+            payload[field_name] = None
+            label = str(field_name)
+        else:
+            continue
+        dropped = True
+        if repairs is not None:
+            repairs.append(f"dropped:{label}")
+    return dropped
+
+
+def _validate_facts(payload: Any, repairs: Optional[List[str]] = None) -> EnrichedFacts:
     if not isinstance(payload, dict):
         raise ValueError(f"Expected JSON object, got {type(payload)}")
 
@@ -64,9 +124,78 @@ def parse_enriched_facts(raw_text: str) -> EnrichedFacts:
             str(k): _maybe_fix_url(v) for k, v in social.items() if v is not None
         }
 
+    # Invalid fields are dropped one by one (set to null) instead of rejecting
+    # the whole answer; a few rounds cover errors revealed only after a fix.
+    for _ in range(len(EnrichedFacts.model_fields)):
+        try:
+            return EnrichedFacts.model_validate(payload)
+        except ValidationError as exc:
+            if not _drop_invalid_fields(payload, exc, repairs):
+                raise ValueError(f"Response does not match schema: {exc}") from exc
+    raise ValueError("Response does not match schema after dropping invalid fields")
+
+
+def parse_enriched_facts(raw_text: str, repairs: Optional[List[str]] = None) -> EnrichedFacts:
+    """Parse a JSON string returned by the LLM into EnrichedFacts.
+
+    A single-item array (the batched answer shape) is accepted as well.
+    Local recoveries (see ``_load_json``) and dropped fields are appended to
+    ``repairs`` when a list is given.
+    """
+    payload = _load_json(raw_text, repairs)
+    if isinstance(payload, list) and len(payload) == 1:
+        payload = payload[0]
+    return _validate_facts(payload, repairs)
+
+
+def parse_enriched_facts_batch(
+    raw_text: str,
+    repairs: Optional[List[str]] = None,
+) -> Tuple[Dict[str, EnrichedFacts], Dict[str, str]]:
+    """Parse a batched answer into facts keyed by ``place_id``.
+
+    Accepts a JSON array of objects carrying ``place_id``, an object wrapping
+    such an array (e.g. ``{"results": [...]}``) or an object keyed by
+    ``place_id``. Returns ``(parsed, errors)``: items that fail validation are
+    reported in ``errors`` so the caller can retry them one by one. Raises
+    ``ValueError`` only when the response as a whole is unusable.
+    """
+    payload = _load_json(raw_text, repairs)
+    if isinstance(payload, dict):
+        arrays = [value for value in payload.values() if isinstance(value, list)]
+        if len(arrays) == 1:
+            payload = arrays[0]
+        else:
+            payload = [
+                {**value, "place_id": key} for key, value in payload.items() if isinstance(value, dict)
+            ]
+    if not isinstance(payload, list):
+        raise ValueError(f"Expected JSON array, got {type(payload)}")
+
+    parsed: Dict[str, EnrichedFacts] = {}
+    errors: Dict[str, str] = {}
+    for item in payload:
+        if not isinstance(item, dict) or not item.get("place_id"):
+            continue
+        place_id = str(item.pop("place_id"))
+        try:
+            parsed[place_id] = _validate_facts(item, repairs)
+        except ValueError as exc:
+            errors[place_id] = str(exc)
+    if not parsed and not errors:
+        raise ValueError("Batched response contains no item with a place_id")
+    return parsed, errors
+
+
+def is_usable_response(raw_text: str) -> bool:
+    """Tell whether a single or batched answer yields at least one valid record."""
     try:
-        facts = EnrichedFacts.model_validate(payload)
-    except ValidationError as exc:
-        raise ValueError(f"Response does not match schema: {exc}") from exc
-
-    return facts
+        parse_enriched_facts(raw_text)
+        return True
+    except ValueError:
+        pass
+    try:
+        parsed, _ = parse_enriched_facts_batch(raw_text)
+    except ValueError:
+        return False
+    return bool(parsed)
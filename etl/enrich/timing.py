@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# Phases measured in the process, in pipeline order (milliseconds). For a
+# batched call prompt/http/parse are split evenly among its businesses, and
+# fetch (planner query), claim and persist (result flush) are amortised over
+# the rows they handled. queue_wait_ms (queued -> claimed) and total_ms
+# (claimed -> written) are derived from enrichment_request when stored.
+PHASES = (
+    "fetch_ms",
+    "claim_ms",
+    "cache_ms",
+    "prompt_ms",
+    "limiter_ms",
+    "http_ms",
+    "parse_ms",
+    "rules_ms",
+    "persist_ms",
+)
+REPORT_PHASES = ("queue_wait_ms", *PHASES, "total_ms")
+
+PLAN_TIMING_SQL = """
+    INSERT INTO enrichment_timing (request_id, fetch_ms, recorded_at)
+    VALUES %s
+    ON CONFLICT (request_id) DO UPDATE
+    SET fetch_ms = EXCLUDED.fetch_ms,
+        {reset},
+        recorded_at = EXCLUDED.recorded_at
+""".format(reset=",\n        ".join(f"{name} = NULL" for name in ("queue_wait_ms", *PHASES[1:], "total_ms")))
+PLAN_TIMING_TEMPLATE = "(%s, %s, now())"
+
+_WORKER_PHASES = PHASES[1:]
+TIMING_UPSERT_SQL = """
+    INSERT INTO enrichment_timing (
+      request_id, provider, model, batch_size, status, queue_wait_ms, {columns}, total_ms, recorded_at
+    )
+    SELECT
+      v.request_id, v.provider, v.model, v.batch_size, r.status,
+      EXTRACT(EPOCH FROM r.started_at - r.queued_at) * 1000,
+      {values},
+      EXTRACT(EPOCH FROM r.finished_at - r.started_at) * 1000,
+      now()
+    FROM (VALUES %s) AS v(request_id, provider, model, batch_size, {columns})
+    JOIN enrichment_request r ON r.request_id = v.request_id
+    ON CONFLICT (request_id) DO UPDATE
+    SET provider = EXCLUDED.provider,
+        model = EXCLUDED.model,
+        batch_size = EXCLUDED.batch_size,
+        status = EXCLUDED.status,
+        queue_wait_ms = EXCLUDED.queue_wait_ms,
+        {updates},
+        total_ms = EXCLUDED.total_ms,
+        recorded_at = EXCLUDED.recorded_at
+""".format(
+    columns=", ".join(_WORKER_PHASES),
+    values=", ".join(f"v.{name}::numeric" for name in _WORKER_PHASES),
+    updates=",\n        ".join(f"{name} = EXCLUDED.{name}" for name in _WORKER_PHASES),
+)
+
+
+def timing_record(
+    request_id: str,
+    provider: Optional[str],
+    model: Optional[str],
+    batch_size: int,
+    timings: Mapping[str, float],
+) -> tuple:
+    return (
+        request_id,
+        provider,
+        model,
+        batch_size,
+        *(round(timings[name], 3) if name in timings else None for name in _WORKER_PHASES),
+    )
+
+
+@contextmanager
+def measure(timings: Optional[dict[str, float]], phase: str) -> Iterator[None]:
+    """Add the duration of the ``with`` block to ``timings[phase]`` (milliseconds)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def report(conn: psycopg2.extensions.connection, days: int = 7) -> list[dict[str, Any]]:
+    """p50/p95 of every phase per provider, model and day over the last ``days`` days."""
+    percentiles = ",\n".join(
+        f"percentile_cont(0.5) WITHIN GROUP (ORDER BY {name}) AS {name}_p50, "
+        f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {name}) AS {name}_p95"
+        for name in REPORT_PHASES
+    )
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            f"""
+            SELECT
+              date_trunc('day', recorded_at)::date AS day,
+              COALESCE(provider, '-') AS provider,
+              COALESCE(model, '-') AS model,
+              count(*) AS requests,
+              count(*) FILTER (WHERE status = 'completed') AS completed,
+              {percentiles}
+            FROM enrichment_timing
+            WHERE recorded_at >= now() - make_interval(days => %s)
+              AND status IS NOT NULL
+            GROUP BY 1, 2, 3
+            ORDER BY 1 DESC, 2, 3
+            """,
+            (days,),
+        )
+        return cur.fetchall()
+
+
+def format_report(rows: list[Mapping[str, Any]]) -> str:
+    if not rows:
+        return "No enrichment timings recorded in the selected period."
+    short = [name[: -len("_ms")] for name in REPORT_PHASES]
+    lines = [
+        f"{'day':<11}{'provider':<12}{'model':<22}{'req':>6}{'ok':>6}  "
+        + "".join(f"{name:>17}" for name in short),
+        f"{'':<57}" + "".join(f"{'p50 / p95 ms':>17}" for _ in short),
+    ]
+
+    def fmt(value: Any) -> str:
+        return "-" if value is None else f"{float(value):.0f}"
+
+    for row in rows:
+        cells = "".join(f"{fmt(row[name + '_p50']) + ' / ' + fmt(row[name + '_p95']):>17}" for name in REPORT_PHASES)
+        lines.append(
+            f"{str(row['day']):<11}{row['provider'][:11]:<12}{row['model'][:21]:<22}"
+            f"{row['requests']:>6}{row['completed']:>6}  {cells}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+from . import brand_cache, dead_letter, timing
+from .client import CompletionResult
+from .schema import EnrichedFacts
+from common.business_rules import compute_business_facts
+
+if TYPE_CHECKING:
+    from .runner import BusinessRow
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = int(os.getenv("ENRICHMENT_FLUSH_SIZE", "50"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("ENRICHMENT_FLUSH_INTERVAL", "2.0"))
+
+RESPONSE_INSERT_SQL = """
+    INSERT INTO enrichment_response (
+      response_id, request_id, model, raw_response, parsed_response,
+      prompt_tokens, completion_tokens, cost_cents, created_at
+    )
+    VALUES %s
+"""
+RESPONSE_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, now())"
+
+BUSINESS_FACTS_UPSERT_SQL = """
+    INSERT INTO business_facts (
+      business_id, size_class, is_chain, website_url, social,
+      marketing_attitude, umbrella_affinity, ad_budget_band,
+      budget_source, confidence, provenance, updated_at,
+      source_provider, source_model
+    )
+    VALUES %s
+    ON CONFLICT (business_id) DO UPDATE SET
+      size_class = EXCLUDED.size_class,
+      is_chain = EXCLUDED.is_chain,
+      website_url = EXCLUDED.website_url,
+      social = EXCLUDED.social,
+      marketing_attitude = EXCLUDED.marketing_attitude,
+      umbrella_affinity = EXCLUDED.umbrella_affinity,
+      ad_budget_band = EXCLUDED.ad_budget_band,
+      budget_source = EXCLUDED.budget_source,
+      confidence = EXCLUDED.confidence,
+      provenance = EXCLUDED.provenance,
+      updated_at = EXCLUDED.updated_at,
+      source_provider = EXCLUDED.source_provider,
+      source_model = EXCLUDED.source_model
+"""
+BUSINESS_FACTS_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now(), %s, %s)"
+
+# ``provider`` is only set when the result came from somewhere else than the
+# provider that queued the request (e.g. the brand cache). Failures count
+# towards the dead-letter limit and schedule the next attempt.
+REQUEST_STATUS_UPDATE_SQL = f"""
+    UPDATE enrichment_request r
+       SET status = {dead_letter.ERROR_STATUS_SQL},
+           error = v.error,
+           provider = COALESCE(v.provider, r.provider),
+           attempt_count = {dead_letter.ATTEMPT_COUNT_SQL},
+           next_attempt_at = {dead_letter.NEXT_ATTEMPT_SQL},
+           finished_at = now(),
+           lease_expires_at = NULL
+      FROM (VALUES %s) AS v(request_id, status, error, provider)
+     WHERE r.request_id = v.request_id
+"""
+
+
+def response_record(request_id: str, result: CompletionResult, facts: EnrichedFacts) -> tuple:
+    return (
+        str(uuid.uuid4()),
+        request_id,
+        result.model,
+        Json(result.raw),
+        Json(facts.model_dump(mode="json")),
+        result.prompt_tokens,
+        result.completion_tokens,
+        result.cost_cents,
+    )
+
+
+def merge_rule_overrides(business: "BusinessRow", facts_json: dict[str, Any]) -> dict[str, Any]:
+    """Fill the fields the LLM left empty with the deterministic business rules."""
+    overrides = compute_business_facts(
+        name=business.name,
+        category=business.category,
+        types=business.types,
+        has_website=business.has_website or bool(facts_json.get("website_url")),
+        has_phone=business.has_phone,
+        hours_weekly=business.hours_weekly,
+        existing=facts_json,
+    )
+    for key, value in overrides.items():
+        if value is not None and (facts_json.get(key) in (None, "")):
+            facts_json[key] = value
+    return facts_json
+
+
+def business_facts_record(
+    business: "BusinessRow",
+    provider: str,
+    model: Optional[str],
+    facts: EnrichedFacts,
+) -> tuple:
+    facts_json = merge_rule_overrides(business, facts.model_dump(mode="json"))
+    social = facts_json.get("social")
+    return (
+        business.place_id,
+        facts_json.get("size_class"),
+        facts_json.get("is_chain"),
+        facts_json.get("website_url"),
+        Json(social) if social else None,
+        facts_json.get("marketing_attitude"),
+        facts_json.get("umbrella_affinity"),
+        facts_json.get("ad_budget_band"),
+        "LLM_infer" if facts_json.get("ad_budget_band") else None,
+        facts_json.get("confidence"),
+        Json(facts_json.get("provenance")) if facts_json.get("provenance") else None,
+        provider,
+        model,
+    )
+
+
+@dataclass
+class _Buffer:
+    responses: list[tuple] = field(default_factory=list)
+    facts: dict[str, tuple] = field(default_factory=dict)
+    statuses: dict[str, tuple] = field(default_factory=dict)
+    brands: list[tuple] = field(default_factory=list)
+    # request_id -> (provider, model, batch_size, phase timings in ms)
+    timings: dict[str, tuple] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.statuses) + len(self.facts)
+
+
+class ResultWriter:
+    """Buffers enrichment outcomes and writes them in set-based groups.
+
+    Each flush is one transaction with one ``execute_values`` statement per
+    table (responses, business_facts, request statuses), instead of four or
+    five statements and a commit per business. Workers add results from any
+    thread and call ``maybe_flush`` with their own connection; the buffer is
+    swapped under the lock so other workers keep adding while a flush runs.
+    Requests stay ``running`` under their lease until flushed, so results lost
+    to a crash are simply claimed again.
+    """
+
+    def __init__(
+        self,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        logger_: Optional[logging.Logger] = None,
+    ) -> None:
+        self.flush_size = max(1, flush_size or FLUSH_SIZE)
+        self.flush_interval = FLUSH_INTERVAL_SECONDS if flush_interval is None else flush_interval
+        self.log = logger_ or logger
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+        # Called with the request ids of every flush, written or not (lease renewal stops for them).
+        self.on_flushed: Optional[Callable[[Iterable[str]], None]] = None
+        self._buffer = _Buffer()
+        self._stored_brands: set[str] = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_success(
+        self,
+        request_id: str,
+        business: "BusinessRow",
+        provider: str,
+        result: CompletionResult,
+        facts: EnrichedFacts,
+        brand_key: Optional[str] = None,
+        request_provider: Optional[str] = None,
+        timings: Optional[dict[str, float]] = None,
+        batch_size: int = 1,
+    ) -> None:
+        response = response_record(request_id, result, facts)
+        with timing.measure(timings, "rules_ms"):
+            facts_row = business_facts_record(business, provider, result.model, facts)
+        with self._lock:
+            if timings is not None:
+                self._buffer.timings[request_id] = (provider, result.model, batch_size, timings)
+            self._buffer.responses.append(response)
+            self._buffer.facts[business.place_id] = facts_row
+            self._buffer.statuses[request_id] = (request_id, "completed", None, request_provider)
+            if brand_key:
+                self._buffer.brands.append(
+                    (brand_key, facts.model_dump(mode="json"), request_id, provider, result.model, business.place_id)
+                )
+
+    def add_reused(
+        self,
+        request_id: Optional[str],
+        business: "BusinessRow",
+        provider: str,
+        model: Optional[str],
+        facts: EnrichedFacts,
+        timings: Optional[dict[str, float]] = None,
+    ) -> None:
+        """Facts taken from an earlier response: no new enrichment_response row."""
+        with timing.measure(timings, "rules_ms"):
+            facts_row = business_facts_record(business, provider, model, facts)
+        with self._lock:
+            self._buffer.facts[business.place_id] = facts_row
+            if request_id is not None:
+                self._buffer.statuses[request_id] = (request_id, "completed", None, None)
+                if timings is not None:
+                    self._buffer.timings[request_id] = (provider, model, 0, timings)
+
+    def add_error(
+        self,
+        request_id: str,
+        message: str,
+        timings: Optional[dict[str, float]] = None,
+        provider: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._buffer.statuses[request_id] = (request_id, "error", message[:500], None)
+            if timings is not None:
+                self._buffer.timings[request_id] = (provider, None, 1, timings)
+
+    def maybe_flush(self, conn: psycopg2.extensions.connection) -> None:
+        # A chain (``brand:``) entry this writer has not stored yet is flushed
+        # right away so other branches of the same chain, claimed by other
+        # workers, can already reuse it. ``site:`` entries exist for nearly
+        # every business with a website and wait for the normal flush.
+        with self._lock:
+            due = (
+                len(self._buffer) >= self.flush_size
+                or any(
+                    row[0].startswith("brand:") and row[0] not in self._stored_brands for row in self._buffer.brands
+                )
+                or (len(self._buffer) and time.monotonic() - self._last_flush >= self.flush_interval)
+            )
+        if due:
+            self.flush(conn)
+
+    def flush(self, conn: psycopg2.extensions.connection) -> int:
+        """Write everything buffered so far in one transaction; return the number of requests written."""
+        with self._lock:
+            buffer, self._buffer = self._buffer, _Buffer()
+            self._last_flush = time.monotonic()
+        if not len(buffer):
+            return 0
+        started = time.perf_counter()
+        try:
+            return self._write(conn, buffer, started)
+        finally:
+            if self.on_flushed is not None:
+                self.on_flushed(list(buffer.statuses))
+
+    def _write(self, conn: psycopg2.extensions.connection, buffer: _Buffer, started: float) -> int:
+        try:
+            with conn.cursor() as cur:
+                if buffer.responses:
+                    execute_values(cur, RESPONSE_INSERT_SQL, buffer.responses, template=RESPONSE_TEMPLATE)
+                if buffer.facts:
+                    execute_values(
+                        cur, BUSINESS_FACTS_UPSERT_SQL, list(buffer.facts.values()), template=BUSINESS_FACTS_TEMPLATE
+                    )
+                if buffer.statuses:
+                    execute_values(cur, REQUEST_STATUS_UPDATE_SQL, list(buffer.statuses.values()))
+                for brand_row in buffer.brands:
+                    brand_cache.store(cur, *brand_row)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            with self._lock:
+                self.failed_flushes += 1
+            self.log.exception(
+                "Failed to write %d enrichment results; their requests keep their previous status "
+                "(claimed ones are picked up again once the lease expires)",
+                len(buffer.statuses),
+            )
+            return 0
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += len(buffer.statuses)
+            self._stored_brands.update(row[0] for row in buffer.brands)
+        if buffer.timings:
+            self._write_timings(conn, buffer, (time.perf_counter() - started) * 1000 / max(1, len(buffer.statuses)))
+        return len(buffer.statuses)
+
+    def _write_timings(self, conn: psycopg2.extensions.connection, buffer: _Buffer, persist_ms: float) -> None:
+        """Store per-phase durations after the results themselves are committed (best effort)."""
+        records = []
+        for request_id, (provider, model, batch_size, timings) in buffer.timings.items():
+            timings["persist_ms"] = timings.get("persist_ms", 0.0) + persist_ms
+            records.append(timing.timing_record(request_id, provider, model, batch_size, timings))
+        try:
+            with conn.cursor() as cur:
+                execute_values(cur, timing.TIMING_UPSERT_SQL, records)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            self.log.warning("Failed to store timings for %d enrichment requests", len(records), exc_info=True)
+
+    def log_summary(self, log: Optional[logging.Logger] = None) -> None:
+        if not self.flushes and not self.failed_flushes:
+            return
+        (log or self.log).info(
+            "Result writer: %d requests in %d flushes (%.1f per flush), %d failed flushes",
+            self.rows_written,
+            self.flushes,
+            self.rows_written / max(1, self.flushes),
+            self.failed_flushes,
+        )
@@ -5,20 +5,31 @@ import json
 import logging
 import math
 import os
+import queue
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Iterable, List, Mapping, Optional, Set, Tuple
 
 import psycopg2
 import requests
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from requests.adapters import HTTPAdapter
+
+from etl import places_landing, places_tiles
+from etl.places_landing import KEEP_CONTACT_SQL, TIER_BASIC, TIER_FULL, LandingWriter
+from etl.places_tiles import Tile
+from etl.enrich.ratelimit import TokenBucket
+from common.business_rules import default_affinity
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
 logger = logging.getLogger("etl.google_places")
 
 API = os.getenv("GOOGLE_PLACES_API_KEY")
-if not API:
-    raise SystemExit("GOOGLE_PLACES_API_KEY non configurata nel .env")
 
 PG = dict(
     host=os.getenv("POSTGRES_HOST", "localhost"),
@@ -32,10 +43,35 @@ FIELDS = (
     "place_id,name,formatted_address,formatted_phone_number,website,"
     "types,rating,user_ratings_total,opening_hours,geometry/location"
 )
+# Tiered mode: every place gets the basic mask, only targets the contact one.
+BASIC_FIELDS = "place_id,name,formatted_address,types,geometry/location,business_status"
+CONTACT_FIELDS = "place_id,formatted_phone_number,website,opening_hours,rating,user_ratings_total"
 TEXT_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
 DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
 GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
 
+# Pipeline: text-search producers -> details fetchers -> one batching writer.
+SEARCH_WORKERS = int(os.getenv("GOOGLE_PLACES_SEARCH_WORKERS", "4"))
+DETAILS_WORKERS = int(os.getenv("GOOGLE_PLACES_DETAILS_WORKERS", "8"))
+# Place Details calls per second across all fetchers (0 = no pacing).
+DETAILS_QPS = float(os.getenv("GOOGLE_PLACES_DETAILS_QPS", "10"))
+WRITE_BATCH_SIZE = int(os.getenv("GOOGLE_PLACES_WRITE_BATCH", "100"))
+WRITE_FLUSH_SECONDS = float(os.getenv("GOOGLE_PLACES_WRITE_FLUSH_SECONDS", "2"))
+QUEUE_SIZE = int(os.getenv("GOOGLE_PLACES_QUEUE_SIZE", "500"))
+DETAILS_MAX_ATTEMPTS = int(os.getenv("GOOGLE_PLACES_DETAILS_ATTEMPTS", "4"))
+# Known places refreshed less than this many days ago are not fetched again.
+MAX_AGE_DAYS = float(os.getenv("GOOGLE_PLACES_MAX_AGE_DAYS", "30"))
+FRESHNESS_BATCH = 500
+# Split text searches into quadtree tiles until none hits the 60-result cap.
+TILING = os.getenv("GOOGLE_PLACES_TILING", "0").strip().lower() in {"1", "true", "yes", "on"}
+# Write raw Details responses to NDJSON landing files instead of places_raw.
+LANDING = os.getenv("GOOGLE_PLACES_LANDING", "0").strip().lower() in {"1", "true", "yes", "on"}
+TIERED = os.getenv("GOOGLE_PLACES_TIERED", "0").strip().lower() in {"1", "true", "yes", "on"}
+# Minimum default_affinity of the category for the contact-fields call.
+CONTACT_MIN_AFFINITY = float(os.getenv("GOOGLE_PLACES_CONTACT_MIN_AFFINITY", "0.6"))
+RETRYABLE_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+_DONE = object()
+
 
 def text_search(
     session: requests.Session,
@@ -44,7 +80,8 @@ def text_search(
     lng: float,
     radius: int,
     sleep_seconds: float,
-) -> Iterable[str]:
+) -> Iterable[Tuple[str, Optional[float], Optional[float]]]:
+    """Yield ``(place_id, lat, lng)`` for every result (coordinates None without geometry)."""
     params = {"key": API, "query": query, "location": f"{lat},{lng}", "radius": radius}
     logger.info("Text search '%s' (r=%sm)", query, radius)
     page = 0
@@ -73,7 +110,8 @@ def text_search(
         for res in payload.get("results", []):
             pid = res.get("place_id")
             if pid:
-                yield pid
+                location = (res.get("geometry") or {}).get("location") or {}
+                yield pid, location.get("lat"), location.get("lng")
         token = payload.get("next_page_token")
         if not token:
             break
@@ -82,69 +120,105 @@ def text_search(
         params = {"key": API, "pagetoken": token}
 
 
-def fetch_details(session: requests.Session, place_id: str) -> Optional[dict]:
-    resp = session.get(
-        DETAILS_URL,
-        params={"key": API, "place_id": place_id, "fields": FIELDS},
-        timeout=30,
+def fetch_details(session: requests.Session, place_id: str, fields: str = FIELDS) -> Optional[dict]:
+    """Place Details with exponential backoff on quota errors, 5xx and network failures."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            resp = session.get(
+                DETAILS_URL,
+                params={"key": API, "place_id": place_id, "fields": fields},
+                timeout=30,
+            )
+            if resp.status_code == 429 or resp.status_code >= 500:
+                raise requests.HTTPError(f"HTTP {resp.status_code}", response=resp)
+            resp.raise_for_status()
+            payload = resp.json()
+            status = payload.get("status")
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as exc:
+            retryable = not isinstance(exc, requests.HTTPError) or exc.response is None or (
+                exc.response.status_code == 429 or exc.response.status_code >= 500
+            )
+            if not retryable or attempt >= DETAILS_MAX_ATTEMPTS:
+                raise
+            status = None
+            logger.debug("Details %s fallita (%s), nuovo tentativo %d", place_id, exc, attempt)
+        else:
+            logger.debug("Details status=%s per place_id=%s", status, place_id)
+            if status not in RETRYABLE_STATUSES or attempt >= DETAILS_MAX_ATTEMPTS:
+                if status and status != "OK":
+                    logger.warning("Place details status %s per %s: %s", status, place_id, payload.get("error_message"))
+                    return None
+                return payload.get("result")
+        time.sleep(min(30.0, 2 ** (attempt - 1)))
+
+
+def contact_target(record: Mapping[str, object], min_affinity: float = CONTACT_MIN_AFFINITY) -> bool:
+    """Cheap targeting pre-filter on basic fields: open business whose category affinity reaches ``min_affinity``.
+
+    The category is the first Google type, as in normalize_places.sql.
+    """
+    if record.get("business_status") == "CLOSED_PERMANENTLY":
+        return False
+    types = list(record.get("types") or [])
+    return default_affinity(types[0] if types else None, types) >= min_affinity
+
+
+UPSERT_PLACES_SQL = """
+    INSERT INTO places_raw (
+      place_id, name, formatted_address, phone, website, types,
+      rating, user_ratings_total, opening_hours_json, details_tier, location, source_ts
     )
-    resp.raise_for_status()
-    payload = resp.json()
-    status = payload.get("status")
-    logger.debug("Details status=%s per place_id=%s", status, place_id)
-    if status and status != "OK":
-        logger.warning("Place details status %s per %s: %s", status, place_id, payload.get("error_message"))
-        return None
-    return payload.get("result")
+    VALUES %%s
+    ON CONFLICT (place_id) DO UPDATE SET
+      name = EXCLUDED.name,
+      formatted_address = EXCLUDED.formatted_address,
+      types = EXCLUDED.types,
+      location = EXCLUDED.location,
+      %s,
+      source_ts = now()
+""" % KEEP_CONTACT_SQL
+UPSERT_PLACES_TEMPLATE = (
+    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, now())"
+)
 
 
-def upsert_place(conn: psycopg2.extensions.connection, record: Mapping[str, object]) -> None:
+def place_record(record: Mapping[str, object], tier: str = TIER_FULL) -> Optional[tuple]:
     geometry = record.get("geometry") or {}
     location = geometry.get("location") if isinstance(geometry, Mapping) else {}
     lat = location.get("lat") if isinstance(location, Mapping) else None
     lng = location.get("lng") if isinstance(location, Mapping) else None
     if lat is None or lng is None:
         logger.debug("Skipping %s: missing coordinates", record.get("place_id"))
-        return
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO places_raw (
-              place_id, name, formatted_address, phone, website, types,
-              rating, user_ratings_total, opening_hours_json, location, source_ts
-            )
-            VALUES (
-              %(place_id)s, %(name)s, %(formatted_address)s, %(phone)s, %(website)s, %(types)s,
-              %(rating)s, %(user_ratings_total)s, %(opening_hours_json)s,
-              ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography,
-              now()
-            )
-            ON CONFLICT (place_id) DO UPDATE SET
-              name = EXCLUDED.name,
-              formatted_address = EXCLUDED.formatted_address,
-              phone = EXCLUDED.phone,
-              website = EXCLUDED.website,
-              types = EXCLUDED.types,
-              rating = EXCLUDED.rating,
-              user_ratings_total = EXCLUDED.user_ratings_total,
-              opening_hours_json = EXCLUDED.opening_hours_json,
-              location = EXCLUDED.location,
-              source_ts = now()
-            """,
-            {
-                "place_id": record["place_id"],
-                "name": record.get("name"),
-                "formatted_address": record.get("formatted_address"),
-                "phone": record.get("formatted_phone_number"),
-                "website": record.get("website"),
-                "types": record.get("types"),
-                "rating": record.get("rating"),
-                "user_ratings_total": record.get("user_ratings_total"),
-                "opening_hours_json": json.dumps(record.get("opening_hours")) if record.get("opening_hours") else None,
-                "lat": lat,
-                "lng": lng,
-            },
-        )
+        return None
+    return (
+        record["place_id"],
+        record.get("name"),
+        record.get("formatted_address"),
+        record.get("formatted_phone_number"),
+        record.get("website"),
+        record.get("types"),
+        record.get("rating"),
+        record.get("user_ratings_total"),
+        json.dumps(record.get("opening_hours")) if record.get("opening_hours") else None,
+        tier,
+        lng,
+        lat,
+    )
+
+
+def upsert_places(conn: psycopg2.extensions.connection, records: Iterable[Tuple[Mapping[str, object], str]]) -> int:
+    """Upsert a batch of ``(Details result, tier)`` pairs in one statement; returns the rows written."""
+    rows = {}
+    for record, tier in records:
+        row = place_record(record, tier)
+        if row is not None:
+            rows[row[0]] = row
+    if rows:
+        with conn.cursor() as cur:
+            execute_values(cur, UPSERT_PLACES_SQL, list(rows.values()), template=UPSERT_PLACES_TEMPLATE)
+    return len(rows)
 
 
 def parse_queries(args: argparse.Namespace) -> List[str]:
@@ -200,10 +274,497 @@ def geocode_location(
     return lat, lng, radius
 
 
+FRESHNESS_SQL = """
+    SELECT place_id, source_ts >= now() - %s * interval '1 day' AS fresh
+    FROM places_raw
+    WHERE place_id = ANY(%s)
+"""
+
+REFRESH_CANDIDATES_SQL = """
+    SELECT place_id
+    FROM places_raw
+    WHERE (source_ts IS NULL OR source_ts < now() - %(days)s * interval '1 day')
+      AND (
+        %(lat)s::float8 IS NULL
+        OR ST_DWithin(location, ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography, %(radius)s)
+      )
+    ORDER BY source_ts NULLS FIRST
+    LIMIT %(limit)s
+"""
+
+
+@dataclass
+class IngestStats:
+    queries: int = 0
+    search_calls: int = 0
+    tiles_searched: int = 0
+    tiles_split: int = 0
+    tiles_reused: int = 0
+    found: int = 0
+    duplicates: int = 0
+    skipped_fresh: int = 0
+    details_ok: int = 0
+    details_failed: int = 0
+    fetched: int = 0
+    refreshed: int = 0
+    contact_fetched: int = 0
+    contact_skipped: int = 0
+    contact_failed: int = 0
+    written: int = 0
+    landed: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def log_summary(self) -> None:
+        elapsed = time.monotonic() - self.started_at
+        if self.tiles_searched or self.tiles_reused:
+            logger.info(
+                "Tiling: %d tile cercati, %d divisi perche saturi, %d saltati grazie ai tile registrati",
+                self.tiles_searched,
+                self.tiles_split,
+                self.tiles_reused,
+            )
+        if self.search_calls:
+            logger.info(
+                "Text search: %d chiamate, %.1f place_id nuovi per chiamata",
+                self.search_calls,
+                self.found / self.search_calls,
+            )
+        logger.info(
+            "Import completato in %.1fs: %d query, %d place_id (%d duplicati), %d saltati perche aggiornati, "
+            "%d nuovi scaricati, %d aggiornati, %d details falliti, %d righe scritte in %d batch (%.1f place/s)",
+            elapsed,
+            self.queries,
+            self.found,
+            self.duplicates,
+            self.skipped_fresh,
+            self.fetched,
+            self.refreshed,
+            self.details_failed,
+            self.written,
+            self.batches,
+            self.written / elapsed if elapsed > 0 else 0.0,
+        )
+        if self.contact_fetched or self.contact_skipped or self.contact_failed:
+            logger.info(
+                "Field mask a livelli: %d place con dati di contatto, %d solo base (sotto soglia), %d contatti falliti",
+                self.contact_fetched,
+                self.contact_skipped,
+                self.contact_failed,
+            )
+        if self.landed:
+            logger.info("Landing: %d risposte Place Details salvate su file", self.landed)
+
+
+def _pages(results: int) -> int:
+    """Text search calls behind ``results`` results (20 per page)."""
+    return max(1, math.ceil(results / 20))
+
+
+def _new_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _put(target: queue.Queue, item: object, abort: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is aborted."""
+    while not abort.is_set():
+        try:
+            target.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class PlacesPipeline:
+    """Text-search producers -> freshness check -> bounded pool of details fetchers -> single batching writer.
+
+    Stages are connected by bounded queues, so a slow stage applies
+    backpressure instead of buffering the whole import in memory. The
+    freshness stage looks up found place_ids in ``places_raw`` in batches and
+    drops those refreshed within ``max_age_days``, so re-imports only pay
+    for new or stale places. Details calls are paced by a shared token
+    bucket (``details_qps``) to stay within the API quota; the writer upserts
+    ``batch_size`` places per statement or, with a ``landing`` writer,
+    appends the raw responses to NDJSON files for ``places_landing.load_files``.
+    With ``tiered`` the fetchers request the basic field mask for every place
+    and the contact mask only for places passing ``contact_target``.
+    """
+
+    def __init__(
+        self,
+        *,
+        lat: Optional[float],
+        lng: Optional[float],
+        radius: int,
+        sleep_seconds: float,
+        limit: Optional[int] = None,
+        search_workers: int = SEARCH_WORKERS,
+        details_workers: int = DETAILS_WORKERS,
+        details_qps: float = DETAILS_QPS,
+        batch_size: int = WRITE_BATCH_SIZE,
+        queue_size: int = QUEUE_SIZE,
+        max_age_days: float = MAX_AGE_DAYS,
+        tiling: bool = TILING,
+        landing: Optional[LandingWriter] = None,
+        tiered: bool = TIERED,
+        contact_min_affinity: float = CONTACT_MIN_AFFINITY,
+    ) -> None:
+        self.lat = lat
+        self.lng = lng
+        self.radius = radius
+        self.sleep_seconds = sleep_seconds
+        self.limit = limit
+        self.search_workers = max(1, search_workers)
+        self.details_workers = max(1, details_workers)
+        self.batch_size = max(1, batch_size)
+        self.max_age_days = max_age_days
+        self.tiling = tiling
+        self.landing = landing
+        self.tiered = tiered
+        self.contact_min_affinity = contact_min_affinity
+        self.bucket = TokenBucket(details_qps * 60, capacity=max(1.0, details_qps)) if details_qps > 0 else None
+        self.session = _new_session(self.search_workers + self.details_workers)
+        self.found: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.ids: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.details: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.seen: Set[str] = set()
+        self.stats = IngestStats()
+        self._seen_lock = threading.Lock()
+        self._limit_reached = threading.Event()
+        self._abort = threading.Event()
+
+    def _accept(self, place_id: str) -> bool:
+        with self._seen_lock:
+            if place_id in self.seen:
+                self.stats.add("duplicates")
+                return False
+            self.seen.add(place_id)
+            self.stats.add("found")
+            return True
+
+    def _search(self, query: str) -> None:
+        results = 0
+        try:
+            for place_id, _, _ in text_search(self.session, query, self.lat, self.lng, self.radius, self.sleep_seconds):
+                results += 1
+                if self._limit_reached.is_set() or self._abort.is_set():
+                    return
+                if self._accept(place_id) and not _put(self.found, place_id, self._abort):
+                    return
+        except requests.RequestException as exc:
+            logger.error("Text search '%s' fallita: %s", query, exc)
+        finally:
+            self.stats.add("queries")
+            self.stats.add("search_calls", _pages(results))
+
+    def _search_tiles(self, conn: psycopg2.extensions.connection, queries: List[str]) -> None:
+        """Search every query tile by tile, splitting saturated tiles into their four children.
+
+        Tiles run concurrently on ``search_workers`` threads. Tiles recorded as
+        saturated by earlier runs are split straight away, without paying for
+        a search whose results would be capped anyway.
+        """
+        roots = places_tiles.root_tiles(self.lat, self.lng, self.radius)
+        saturated = {query: places_tiles.load_saturated(conn, query) for query in queries}
+        logger.info(
+            "Tiling: %d tile iniziali (zoom %d, ~%.0f m) per %d query",
+            len(roots),
+            roots[0].zoom if roots else 0,
+            roots[0].width_m() if roots else 0,
+            len(queries),
+        )
+        tasks = deque((query, tile) for query in queries for tile in roots)
+        records: List[tuple] = []
+        lock = threading.Condition()
+        active = 0
+
+        def worker() -> None:
+            nonlocal active
+            while True:
+                with lock:
+                    while not tasks and active:
+                        lock.wait()
+                    if not tasks or self._limit_reached.is_set() or self._abort.is_set():
+                        tasks.clear()
+                        lock.notify_all()
+                        return
+                    query, tile = tasks.popleft()
+                    active += 1
+                children: List[Tile] = []
+                try:
+                    children = self._search_tile(query, tile, saturated[query], records)
+                finally:
+                    with lock:
+                        tasks.extend(
+                            (query, child)
+                            for child in children
+                            if places_tiles.intersects(child, self.lat, self.lng, self.radius)
+                        )
+                        active -= 1
+                        lock.notify_all()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.search_workers, thread_name_prefix="places-tiles") as searchers:
+                for future in [searchers.submit(worker) for _ in range(self.search_workers)]:
+                    future.result()
+        finally:
+            places_tiles.record_tiles(conn, records)
+        self.stats.add("queries", len(queries))
+
+    def _search_tile(self, query: str, tile: Tile, saturated: Set[str], records: List[tuple]) -> List[Tile]:
+        if tile.quadkey in saturated and tile.can_split():
+            self.stats.add("tiles_reused")
+            return tile.children()
+        lat, lng = tile.center()
+        results = in_tile = 0
+        try:
+            for place_id, place_lat, place_lng in text_search(
+                self.session, query, lat, lng, tile.radius_m(), self.sleep_seconds
+            ):
+                results += 1
+                if place_lat is not None and place_lng is not None and tile.contains(place_lat, place_lng):
+                    in_tile += 1
+                if self._limit_reached.is_set() or self._abort.is_set():
+                    return []
+                if self._accept(place_id) and not _put(self.found, place_id, self._abort):
+                    return []
+        except requests.RequestException as exc:
+            logger.error("Text search '%s' fallita sul tile %s: %s", query, tile.quadkey, exc)
+            return []
+        finally:
+            self.stats.add("tiles_searched")
+            self.stats.add("search_calls", _pages(results))
+        # Results outside the tile are neighbours' places: only in-tile ones are recorded.
+        is_saturated = places_tiles.is_saturated(results, in_tile)
+        records.append(places_tiles.tile_record(query, tile, in_tile, is_saturated))
+        if is_saturated and tile.can_split():
+            self.stats.add("tiles_split")
+            return tile.children()
+        return []
+
+    def _refresh_candidates(self, conn: psycopg2.extensions.connection, older_than_days: float) -> None:
+        with conn.cursor() as cur:
+            cur.execute(
+                REFRESH_CANDIDATES_SQL,
+                {"days": older_than_days, "lat": self.lat, "lng": self.lng, "radius": self.radius, "limit": self.limit},
+            )
+            place_ids = [row[0] for row in cur.fetchall()]
+        logger.info("%d place da aggiornare (source_ts piu vecchio di %s giorni)", len(place_ids), older_than_days)
+        for place_id in place_ids:
+            if self._limit_reached.is_set() or self._abort.is_set():
+                return
+            if self._accept(place_id) and not _put(self.found, place_id, self._abort):
+                return
+
+    def _freshness_loop(self, conn: psycopg2.extensions.connection) -> None:
+        """Forward new or stale place_ids to the fetchers, looked up in batches."""
+        try:
+            self._check_freshness(conn)
+        except Exception:
+            self._abort.set()
+            raise
+
+    def _check_freshness(self, conn: psycopg2.extensions.connection) -> None:
+        scheduled = 0
+        done = False
+        while not done:
+            try:
+                batch = [self.found.get(timeout=0.5)]
+            except queue.Empty:
+                if self._abort.is_set():
+                    return
+                continue
+            while len(batch) < FRESHNESS_BATCH:
+                try:
+                    batch.append(self.found.get_nowait())
+                except queue.Empty:
+                    break
+            if _DONE in batch:
+                done = True
+                batch = [item for item in batch if item is not _DONE]
+            if not batch:
+                break
+            with conn.cursor() as cur:
+                cur.execute(FRESHNESS_SQL, (self.max_age_days, batch))
+                known = dict(cur.fetchall())
+            for place_id in batch:
+                if known.get(place_id):
+                    self.stats.add("skipped_fresh")
+                    continue
+                if self.limit and scheduled >= self.limit:
+                    if not self._limit_reached.is_set():
+                        logger.info("Limit %s raggiunto", self.limit)
+                        self._limit_reached.set()
+                    continue
+                scheduled += 1
+                if not _put(self.ids, (place_id, place_id in known), self._abort):
+                    return
+        for _ in range(self.details_workers):
+            _put(self.ids, _DONE, self._abort)
+
+    def _fetch_loop(self) -> None:
+        try:
+            self._fetch_ids()
+        except Exception:
+            self._abort.set()
+            raise
+
+    def _fetch_ids(self) -> None:
+        while True:
+            try:
+                item = self.ids.get(timeout=0.5)
+            except queue.Empty:
+                if self._abort.is_set():
+                    return
+                continue
+            if item is _DONE or self._abort.is_set():
+                return
+            place_id, known = item
+            detail = self._fetch(place_id, BASIC_FIELDS if self.tiered else FIELDS)
+            if not detail:
+                self.stats.add("details_failed")
+                continue
+            self.stats.add("details_ok")
+            self.stats.add("refreshed" if known else "fetched")
+            tier = TIER_FULL
+            if self.tiered:
+                tier = TIER_BASIC
+                if not contact_target(detail, self.contact_min_affinity):
+                    self.stats.add("contact_skipped")
+                else:
+                    contact = self._fetch(place_id, CONTACT_FIELDS)
+                    if contact:
+                        detail = {**detail, **contact}
+                        tier = TIER_FULL
+                        self.stats.add("contact_fetched")
+                    else:
+                        self.stats.add("contact_failed")
+            if not _put(self.details, (detail, tier), self._abort):
+                return
+
+    def _fetch(self, place_id: str, fields: str) -> Optional[dict]:
+        if self.bucket is not None:
+            self.bucket.acquire()
+        try:
+            return fetch_details(self.session, place_id, fields)
+        except (requests.RequestException, ValueError) as exc:
+            logger.warning("Place details fallita per %s: %s", place_id, exc)
+            return None
+
+    def _write_loop(self, conn: psycopg2.extensions.connection) -> None:
+        batch: List[Tuple[dict, str]] = []
+        deadline = time.monotonic() + WRITE_FLUSH_SECONDS
+        done = False
+        while not done:
+            try:
+                item = self.details.get(timeout=max(0.05, deadline - time.monotonic()))
+            except queue.Empty:
+                # An aborted pipeline may never deliver _DONE (_put gives up on abort).
+                if self._abort.is_set():
+                    return
+                item = None
+            if item is _DONE:
+                done = True
+            elif item is not None:
+                batch.append(item)
+            if batch and (done or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(conn, batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + WRITE_FLUSH_SECONDS
+
+    def _flush(self, conn: psycopg2.extensions.connection, batch: List[Tuple[dict, str]]) -> None:
+        if self.landing is not None:
+            try:
+                landed = self.landing.append(batch)
+            except Exception:
+                self._abort.set()
+                raise
+            self.stats.add("landed", landed)
+            self.stats.add("batches")
+            logger.info("Salvati %d details su file (totale %d, details in coda %d)", landed, self.stats.landed, self.details.qsize())
+            return
+        try:
+            written = upsert_places(conn, batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self._abort.set()
+            raise
+        self.stats.add("written", written)
+        self.stats.add("batches")
+        logger.info("Scritti %d place (totale %d, details in coda %d)", written, self.stats.written, self.details.qsize())
+
+    def run(self, queries: List[str]) -> IngestStats:
+        def produce(conn: psycopg2.extensions.connection) -> None:
+            if self.tiling:
+                self._search_tiles(conn, queries)
+                return
+            with ThreadPoolExecutor(max_workers=self.search_workers, thread_name_prefix="places-search") as searchers:
+                list(searchers.map(self._search, queries))
+
+        return self._execute(produce)
+
+    def refresh(self, older_than_days: float) -> IngestStats:
+        """Fetch Details again for known places whose ``source_ts`` is older than ``older_than_days``."""
+        self.max_age_days = older_than_days
+        return self._execute(lambda conn: self._refresh_candidates(conn, older_than_days))
+
+    def _execute(self, produce) -> IngestStats:
+        with psycopg2.connect(**PG) as conn, psycopg2.connect(**PG) as lookup_conn:
+            conn.autocommit = False
+            lookup_conn.autocommit = True
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="places-db") as db_stages:
+                writer = db_stages.submit(self._write_loop, conn)
+                freshness = db_stages.submit(self._freshness_loop, lookup_conn)
+                try:
+                    with ThreadPoolExecutor(max_workers=self.details_workers, thread_name_prefix="places-details") as fetchers:
+                        fetch_futures = [fetchers.submit(self._fetch_loop) for _ in range(self.details_workers)]
+                        try:
+                            produce(lookup_conn)
+                        finally:
+                            _put(self.found, _DONE, self._abort)
+                        freshness.result()
+                        for future in fetch_futures:
+                            future.result()
+                finally:
+                    # Fetchers are done (or aborted): let the writer flush and exit.
+                    _put(self.details, _DONE, self._abort)
+                try:
+                    writer.result()
+                finally:
+                    if self.landing is not None:
+                        self.landing.close()
+        self.stats.log_summary()
+        return self.stats
+
+
+def load_landing(paths: List[str], directory: str) -> int:
+    """Load landing files (all pending ones in ``directory`` when ``paths`` is empty) into places_raw."""
+    files = paths or places_landing.pending_files(directory)
+    with psycopg2.connect(**PG) as conn:
+        return places_landing.load_files(conn, files)
+
+
 def run(args: argparse.Namespace) -> None:
     logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s")
-    queries = parse_queries(args)
-    seen: Set[str] = set()
+    if args.load_landing is not None:
+        load_landing(args.load_landing, args.landing_dir)
+        return
+    if not API:
+        raise SystemExit("GOOGLE_PLACES_API_KEY non configurata nel .env")
+    refresh_mode = args.refresh_older_than is not None
+    queries = parse_queries(args) if not refresh_mode else []
 
     session = requests.Session()
 
@@ -219,30 +780,41 @@ def run(args: argparse.Namespace) -> None:
             lng = loc_lng
         radius = loc_radius if args.radius is None else max(args.radius, loc_radius)
 
-    if lat is None or lng is None:
+    if (lat is None or lng is None) and not refresh_mode:
         raise SystemExit("Specificare una coppia lat/lng oppure usare --location.")
 
     if radius is None:
         radius = 3000
 
     radius = int(radius)
-    logger.info("Coordinate finali: lat=%.6f, lon=%.6f, radius=%sm", lat, lng, radius)
+    if lat is not None and lng is not None:
+        logger.info("Coordinate finali: lat=%.6f, lon=%.6f, radius=%sm", lat, lng, radius)
+    else:
+        lat = lng = None
 
-    with psycopg2.connect(**PG) as conn:
-        conn.autocommit = True
-        for query in queries:
-            for place_id in text_search(session, query, lat, lng, radius, args.sleep_seconds):
-                if args.limit and len(seen) >= args.limit:
-                    logger.info("Limit %s raggiunto", args.limit)
-                    return
-                if place_id in seen:
-                    continue
-                seen.add(place_id)
-                detail = fetch_details(session, place_id)
-                if not detail:
-                    continue
-                upsert_place(conn, detail)
-        logger.info("Upsert completato (%d place_id)", len(seen))
+    landing = LandingWriter(args.landing_dir, fields=BASIC_FIELDS if args.tiered else FIELDS) if args.landing else None
+    pipeline = PlacesPipeline(
+        lat=lat,
+        lng=lng,
+        radius=radius,
+        sleep_seconds=args.sleep_seconds,
+        limit=args.limit,
+        search_workers=args.search_workers,
+        details_workers=args.details_workers,
+        details_qps=args.details_qps,
+        batch_size=args.write_batch,
+        max_age_days=args.max_age_days,
+        tiling=args.tiling,
+        landing=landing,
+        tiered=args.tiered,
+        contact_min_affinity=args.contact_min_affinity,
+    )
+    if refresh_mode:
+        pipeline.refresh(args.refresh_older_than)
+    else:
+        pipeline.run(queries)
+    if landing is not None and not args.no_load:
+        load_landing(landing.completed, args.landing_dir)
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -255,6 +827,42 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--queries-file", help="File testo con una query per riga (commenti con #).")
     parser.add_argument("--limit", type=int, help="Massimo numero di place_id da importare.")
     parser.add_argument("--sleep-seconds", type=float, default=2.0, help="Delay tra pagine successive (default 2s).")
+    parser.add_argument("--search-workers", type=int, default=SEARCH_WORKERS,
+                        help="Query text-search eseguite in parallelo (default GOOGLE_PLACES_SEARCH_WORKERS o 4).")
+    parser.add_argument("--details-workers", type=int, default=DETAILS_WORKERS,
+                        help="Chiamate Place Details concorrenti (default GOOGLE_PLACES_DETAILS_WORKERS o 8).")
+    parser.add_argument("--details-qps", type=float, default=DETAILS_QPS,
+                        help="Massimo di chiamate Place Details al secondo, 0 = nessun limite (default 10).")
+    parser.add_argument("--write-batch", type=int, default=WRITE_BATCH_SIZE,
+                        help="Place scritti su places_raw per singola INSERT (default 100).")
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS,
+                        help="Non richiama Place Details per i place gia in places_raw aggiornati da meno di questi "
+                             "giorni (default GOOGLE_PLACES_MAX_AGE_DAYS o 30; 0 = scarica sempre).")
+    parser.add_argument("--refresh-older-than", type=float, default=None, metavar="DAYS",
+                        help="Modalita refresh periodico: nessuna text search, riscarica i details dei place con "
+                             "source_ts piu vecchio di DAYS (nell'area indicata, se presente; --limit per lotti).")
+    parser.add_argument("--tiling", action=argparse.BooleanOptionalAction, default=TILING,
+                        help="Divide l'area in tile (quadtree) e suddivide quelli che raggiungono il limite di 60 "
+                             "risultati; i tile saturi vengono ricordati in places_search_tiles per i run successivi "
+                             "(default GOOGLE_PLACES_TILING; --no-tiling lo disattiva per un run).")
+    parser.add_argument("--tiered", action=argparse.BooleanOptionalAction, default=TIERED,
+                        help="Place Details in due passaggi: campi base per tutti i place, telefono/sito/orari/rating "
+                             "solo per quelli con affinita di categoria sufficiente (places_raw.details_tier; "
+                             "default GOOGLE_PLACES_TIERED, --no-tiered lo disattiva).")
+    parser.add_argument("--contact-min-affinity", type=float, default=CONTACT_MIN_AFFINITY,
+                        help="Con --tiered: affinita minima (default_affinity della categoria) per richiedere i campi "
+                             "di contatto (default GOOGLE_PLACES_CONTACT_MIN_AFFINITY o 0.6).")
+    parser.add_argument("--landing", action=argparse.BooleanOptionalAction, default=LANDING,
+                        help="Salva le risposte Place Details grezze in file NDJSON compressi (GOOGLE_PLACES_LANDING_DIR) "
+                             "invece di scrivere direttamente su places_raw; a fine import i file vengono caricati con COPY "
+                             "(default GOOGLE_PLACES_LANDING, --no-landing lo disattiva).")
+    parser.add_argument("--no-load", action="store_true",
+                        help="Con --landing: scrive solo i file, senza caricarli (usare poi --load-landing).")
+    parser.add_argument("--load-landing", nargs="*", default=None, metavar="PATH",
+                        help="Nessuna chiamata a Google: carica i file di landing indicati (o tutti quelli in attesa "
+                             "nella cartella di landing) in places_raw. Passando file gia caricati li ricarica.")
+    parser.add_argument("--landing-dir", default=places_landing.LANDING_DIR,
+                        help="Cartella dei file di landing (default GOOGLE_PLACES_LANDING_DIR o data/landing/google_places).")
     parser.add_argument("--log-level", default="INFO", help="Livello di logging (INFO/DEBUG/...).")
     return parser
 
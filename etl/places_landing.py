@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import psycopg2
+
+logger = logging.getLogger("etl.google_places")
+
+# Raw Place Details responses, one JSON document per line, gzip-compressed.
+# Files are written as ``*.part`` and renamed when complete, so the loader
+# never reads a file that is still growing; loaded files move to ``loaded/``
+# and can be loaded again (replayed) by passing their path explicitly.
+LANDING_DIR = os.getenv(
+    "GOOGLE_PLACES_LANDING_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "data", "landing", "google_places"),
+)
+ROTATE_RECORDS = int(os.getenv("GOOGLE_PLACES_LANDING_ROTATE", "5000"))
+LOADED_SUBDIR = "loaded"
+
+# Field mask a places_raw row was fetched with (places_raw.details_tier).
+TIER_BASIC = "basic"
+TIER_FULL = "full"
+# Columns only requested for the full tier: a basic refresh of a row that
+# already holds them keeps the stored values instead of wiping them.
+CONTACT_COLUMNS = ("phone", "website", "rating", "user_ratings_total", "opening_hours_json")
+KEEP_CONTACT_SQL = ",\n      ".join(
+    f"{column} = CASE WHEN EXCLUDED.details_tier = '{TIER_BASIC}' AND places_raw.details_tier = '{TIER_FULL}' "
+    f"THEN places_raw.{column} ELSE EXCLUDED.{column} END"
+    for column in (*CONTACT_COLUMNS, "details_tier")
+)
+
+
+class LandingWriter:
+    """Appends raw Details results to rotating ``.ndjson.gz`` files (thread-safe)."""
+
+    def __init__(self, directory: str = LANDING_DIR, fields: Optional[str] = None, rotate_records: int = ROTATE_RECORDS) -> None:
+        self.directory = os.path.abspath(directory)
+        self.fields = fields
+        self.rotate_records = max(1, rotate_records)
+        self.completed: List[str] = []
+        self.records = 0
+        self._lock = threading.Lock()
+        self._handle: Optional[gzip.GzipFile] = None
+        self._path: Optional[str] = None
+        self._in_file = 0
+        self._sequence = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _open(self) -> None:
+        self._sequence += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._path = os.path.join(self.directory, f"details-{stamp}-{os.getpid()}-{self._sequence:04d}.ndjson.gz")
+        self._handle = gzip.open(self._path + ".part", "wb")
+        self._in_file = 0
+
+    def _close_file(self) -> None:
+        if self._handle is None or self._path is None:
+            return
+        self._handle.close()
+        os.replace(self._path + ".part", self._path)
+        self.completed.append(self._path)
+        self._handle = None
+        self._path = None
+
+    def append(self, results: Iterable[Tuple[Mapping[str, object], str]]) -> int:
+        """Append ``(result, tier)`` pairs; returns the lines written."""
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        written = 0
+        with self._lock:
+            for result, tier in results:
+                if self._handle is None:
+                    self._open()
+                line = {
+                    "place_id": result.get("place_id"),
+                    "fetched_at": fetched_at,
+                    "fields": self.fields,
+                    "tier": tier,
+                    "result": result,
+                }
+                self._handle.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+                self._in_file += 1
+                written += 1
+                if self._in_file >= self.rotate_records:
+                    self._close_file()
+            self.records += written
+        return written
+
+    def close(self) -> List[str]:
+        """Finish the current file; returns every file completed by this writer."""
+        with self._lock:
+            self._close_file()
+            return list(self.completed)
+
+
+def pending_files(directory: str = LANDING_DIR) -> List[str]:
+    """Completed landing files not loaded yet, oldest first."""
+    return sorted(glob.glob(os.path.join(os.path.abspath(directory), "*.ndjson.gz")))
+
+
+STAGE_SQL = """
+    CREATE TEMP TABLE places_landing_stage (doc JSONB NOT NULL) ON COMMIT DROP
+"""
+# CSV with control characters as quote and delimiter: every line is taken
+# verbatim as one JSON document (backslashes in JSON are not COPY escapes).
+COPY_SQL = "COPY places_landing_stage (doc) FROM STDIN WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+
+# Latest document per place_id; source_ts is the fetch time, so replaying an
+# old file never overwrites a newer row.
+MERGE_SQL = """
+    INSERT INTO places_raw (
+      place_id, name, formatted_address, phone, website, types,
+      rating, user_ratings_total, opening_hours_json, location, details_tier, source_ts
+    )
+    SELECT
+      d.place_id,
+      d.result->>'name',
+      d.result->>'formatted_address',
+      d.result->>'formatted_phone_number',
+      d.result->>'website',
+      CASE WHEN jsonb_typeof(d.result->'types') = 'array'
+        THEN ARRAY(SELECT jsonb_array_elements_text(d.result->'types'))
+      END,
+      (d.result->>'rating')::numeric,
+      (d.result->>'user_ratings_total')::int,
+      NULLIF(d.result->'opening_hours', 'null'::jsonb),
+      ST_SetSRID(ST_MakePoint(
+        (d.result->'geometry'->'location'->>'lng')::float8,
+        (d.result->'geometry'->'location'->>'lat')::float8
+      ), 4326)::geography,
+      d.tier,
+      d.fetched_at
+    FROM (
+      SELECT DISTINCT ON (doc->>'place_id')
+        doc->>'place_id' AS place_id,
+        doc->'result' AS result,
+        COALESCE(doc->>'tier', '%(full)s') AS tier,
+        (doc->>'fetched_at')::timestamptz AT TIME ZONE current_setting('TimeZone') AS fetched_at
+      FROM places_landing_stage
+      WHERE doc->>'place_id' IS NOT NULL
+        AND doc->'result'->'geometry'->'location'->>'lat' IS NOT NULL
+        AND doc->'result'->'geometry'->'location'->>'lng' IS NOT NULL
+      ORDER BY doc->>'place_id', (doc->>'fetched_at')::timestamptz DESC
+    ) d
+    ON CONFLICT (place_id) DO UPDATE SET
+      name = EXCLUDED.name,
+      formatted_address = EXCLUDED.formatted_address,
+      types = EXCLUDED.types,
+      location = EXCLUDED.location,
+      %(keep_contact)s,
+      source_ts = EXCLUDED.source_ts
+    WHERE places_raw.source_ts IS NULL OR places_raw.source_ts <= EXCLUDED.source_ts
+""" % {"full": TIER_FULL, "keep_contact": KEEP_CONTACT_SQL}
+
+
+def load_files(conn: psycopg2.extensions.connection, paths: Sequence[str], archive: bool = True) -> int:
+    """COPY landing files into a staging table and merge them into places_raw in one statement.
+
+    Everything happens in one transaction; on success files from the
+    landing directory are moved to ``loaded/``. Returns the rows merged.
+    """
+    if not paths:
+        logger.info("Nessun file di landing da caricare")
+        return 0
+    with conn.cursor() as cur:
+        cur.execute(STAGE_SQL)
+        for path in paths:
+            with gzip.open(path, "rb") as fh:
+                cur.copy_expert(COPY_SQL, fh)
+        cur.execute("SELECT count(*) FROM places_landing_stage")
+        staged = cur.fetchone()[0]
+        cur.execute(MERGE_SQL)
+        merged = cur.rowcount
+    conn.commit()
+    logger.info("Caricati %d documenti da %d file di landing: %d righe scritte in places_raw", staged, len(paths), merged)
+    if archive:
+        for path in paths:
+            _archive(path)
+    return merged
+
+
+def _archive(path: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.path.basename(directory) == LOADED_SUBDIR:
+        return
+    target = os.path.join(directory, LOADED_SUBDIR)
+    os.makedirs(target, exist_ok=True)
+    shutil.move(path, os.path.join(target, os.path.basename(path)))
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Iterable, List, Set, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+# Quadtree over the Web Mercator tile grid (the same x/y/zoom and quadkeys
+# used by map tiles), so tiles recorded by one run line up with the next
+# one whatever the search centre and radius.
+EARTH_CIRCUMFERENCE_M = 40_075_016.686
+MAX_MERCATOR_LAT = 85.05112878
+# Tiles narrower than this are never split further.
+MIN_TILE_M = float(os.getenv("GOOGLE_PLACES_MIN_TILE_M", "250"))
+# A text search returning at least this many results hit the 3-page cap.
+SATURATION_RESULTS = int(os.getenv("GOOGLE_PLACES_TILE_SATURATION", "60"))
+# ... and a capped search only saturates the tile when at least this many of
+# its results lie inside it: the search circle covers ~1.6x the tile area and
+# location is only a bias, so the rest belongs to neighbouring tiles.
+SATURATION_IN_TILE = int(os.getenv("GOOGLE_PLACES_TILE_SATURATION_IN_TILE", "30"))
+# Recorded saturated tiles younger than this are split without searching them again.
+TILE_TTL_DAYS = float(os.getenv("GOOGLE_PLACES_TILE_TTL_DAYS", "90"))
+
+
+@dataclass(frozen=True)
+class Tile:
+    x: int
+    y: int
+    zoom: int
+
+    @property
+    def quadkey(self) -> str:
+        digits = []
+        for level in range(self.zoom, 0, -1):
+            mask = 1 << (level - 1)
+            digits.append(str((1 if self.x & mask else 0) + (2 if self.y & mask else 0)))
+        return "".join(digits)
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """(south, west, north, east) in degrees."""
+        count = 2 ** self.zoom
+        west = self.x / count * 360.0 - 180.0
+        east = (self.x + 1) / count * 360.0 - 180.0
+        north = _tile_lat(self.y, count)
+        south = _tile_lat(self.y + 1, count)
+        return south, west, north, east
+
+    def contains(self, lat: float, lng: float) -> bool:
+        south, west, north, east = self.bounds()
+        return south <= lat < north and west <= lng < east
+
+    def center(self) -> Tuple[float, float]:
+        south, west, north, east = self.bounds()
+        return (south + north) / 2, (west + east) / 2
+
+    def width_m(self) -> float:
+        lat, _ = self.center()
+        return EARTH_CIRCUMFERENCE_M * math.cos(math.radians(lat)) / 2 ** self.zoom
+
+    def radius_m(self) -> int:
+        """Search radius covering the whole tile (half its diagonal)."""
+        return int(math.ceil(self.width_m() * math.sqrt(2) / 2))
+
+    def can_split(self) -> bool:
+        return self.width_m() / 2 >= MIN_TILE_M
+
+    def children(self) -> List["Tile"]:
+        return [
+            Tile(self.x * 2 + dx, self.y * 2 + dy, self.zoom + 1)
+            for dy in (0, 1)
+            for dx in (0, 1)
+        ]
+
+
+def _tile_lat(y: int, count: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / count))))
+
+
+def tile_for(lat: float, lng: float, zoom: int) -> Tile:
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    count = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * count)
+    sin_lat = math.sin(math.radians(lat))
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * count)
+    return Tile(min(max(x, 0), count - 1), min(max(y, 0), count - 1), zoom)
+
+
+def _distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    mean_lat = math.radians((lat1 + lat2) / 2)
+    dx = math.radians(lng2 - lng1) * math.cos(mean_lat)
+    dy = math.radians(lat2 - lat1)
+    return math.hypot(dx, dy) * EARTH_CIRCUMFERENCE_M / (2 * math.pi)
+
+
+def intersects(tile: Tile, lat: float, lng: float, radius: float) -> bool:
+    south, west, north, east = tile.bounds()
+    nearest_lat = min(max(lat, south), north)
+    nearest_lng = min(max(lng, west), east)
+    return _distance_m(lat, lng, nearest_lat, nearest_lng) <= radius
+
+
+def root_tiles(lat: float, lng: float, radius: float) -> List[Tile]:
+    """Tiles about as wide as the search diameter that intersect the search circle."""
+    width_at_zoom0 = EARTH_CIRCUMFERENCE_M * math.cos(math.radians(lat))
+    zoom = max(0, math.ceil(math.log2(width_at_zoom0 / max(2 * radius, MIN_TILE_M))))
+    dlat = math.degrees(radius / (EARTH_CIRCUMFERENCE_M / (2 * math.pi)))
+    dlng = dlat / max(math.cos(math.radians(lat)), 0.05)
+    top_left = tile_for(lat + dlat, lng - dlng, zoom)
+    bottom_right = tile_for(lat - dlat, lng + dlng, zoom)
+    tiles = []
+    for x in range(top_left.x, bottom_right.x + 1):
+        for y in range(top_left.y, bottom_right.y + 1):
+            tile = Tile(x, y, zoom)
+            if intersects(tile, lat, lng, radius):
+                tiles.append(tile)
+    return tiles
+
+
+def load_saturated(conn: psycopg2.extensions.connection, query: str) -> Set[str]:
+    """Quadkeys of tiles recently found saturated for ``query`` (searched again only below them)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT quadkey
+            FROM places_search_tiles
+            WHERE query = %s
+              AND saturated
+              AND searched_at >= now() - %s * interval '1 day'
+            """,
+            (query, TILE_TTL_DAYS),
+        )
+        return {row[0] for row in cur.fetchall()}
+
+
+RECORD_TILES_SQL = """
+    INSERT INTO places_search_tiles (
+      query, quadkey, zoom, center_lat, center_lng, radius_m, results, saturated, searched_at
+    )
+    VALUES %s
+    ON CONFLICT (query, quadkey) DO UPDATE SET
+      radius_m = EXCLUDED.radius_m,
+      results = EXCLUDED.results,
+      saturated = EXCLUDED.saturated,
+      searched_at = EXCLUDED.searched_at
+"""
+RECORD_TILES_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, now())"
+
+
+def is_saturated(results: int, in_tile: int) -> bool:
+    """Whether a tile search hit the result cap with the tile itself still full."""
+    return results >= SATURATION_RESULTS and in_tile >= SATURATION_IN_TILE
+
+
+def tile_record(query: str, tile: Tile, results: int, saturated: bool) -> tuple:
+    lat, lng = tile.center()
+    return (query, tile.quadkey, tile.zoom, lat, lng, tile.radius_m(), results, saturated)
+
+
+def record_tiles(conn: psycopg2.extensions.connection, records: Iterable[tuple]) -> None:
+    records = list(records)
+    if records:
+        with conn.cursor() as cur:
+            execute_values(cur, RECORD_TILES_SQL, records, template=RECORD_TILES_TEMPLATE)
@@ -11,8 +11,23 @@ CREATE TABLE places_raw (
   user_ratings_total INT,
   opening_hours_json JSONB,
   location GEOGRAPHY(POINT, 4326),
+  details_tier TEXT NOT NULL DEFAULT 'full',
   source_ts TIMESTAMP DEFAULT now()
 );
+
+CREATE TABLE IF NOT EXISTS places_search_tiles (
+  query TEXT NOT NULL,
+  quadkey TEXT NOT NULL,
+  zoom INT NOT NULL,
+  center_lat DOUBLE PRECISION NOT NULL,
+  center_lng DOUBLE PRECISION NOT NULL,
+  radius_m INT NOT NULL,
+  results INT NOT NULL,
+  saturated BOOLEAN NOT NULL,
+  searched_at TIMESTAMP NOT NULL DEFAULT now(),
+  PRIMARY KEY (query, quadkey)
+);
+
 CREATE TABLE istat_comuni (
   istat_code TEXT PRIMARY KEY,
   comune TEXT,
@@ -65,12 +80,21 @@ CREATE TABLE IF NOT EXISTS enrichment_request (
   error TEXT,
   created_at TIMESTAMP NOT NULL DEFAULT now(),
   started_at TIMESTAMP,
-  finished_at TIMESTAMP
+  finished_at TIMESTAMP,
+  lease_expires_at TIMESTAMP,
+  queued_at TIMESTAMP,
+  claimed_by TEXT,
+  attempt_count INT NOT NULL DEFAULT 0,
+  next_attempt_at TIMESTAMP
 );
 
 CREATE UNIQUE INDEX IF NOT EXISTS enrichment_request_business_hash_idx
   ON enrichment_request (business_id, input_hash);
 
+CREATE INDEX IF NOT EXISTS enrichment_request_queue_idx
+  ON enrichment_request (status, queued_at)
+  WHERE status IN ('queued', 'running');
+
 CREATE TABLE IF NOT EXISTS enrichment_response (
   response_id TEXT PRIMARY KEY,
   request_id TEXT REFERENCES enrichment_request(request_id) ON DELETE CASCADE,
@@ -83,6 +107,53 @@ CREATE TABLE IF NOT EXISTS enrichment_response (
   created_at TIMESTAMP NOT NULL DEFAULT now()
 );
 
+CREATE TABLE IF NOT EXISTS enrichment_change_index (
+  business_id TEXT PRIMARY KEY REFERENCES places_clean(place_id) ON DELETE CASCADE,
+  baseline_request_id TEXT REFERENCES enrichment_request(request_id) ON DELETE SET NULL,
+  changed_fields TEXT[] NOT NULL DEFAULT '{}',
+  detected_at TIMESTAMP,
+  checked_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS enrichment_change_index_changed_idx
+  ON enrichment_change_index (business_id)
+  WHERE cardinality(changed_fields) > 0;
+
+CREATE TABLE IF NOT EXISTS enrichment_timing (
+  request_id TEXT PRIMARY KEY REFERENCES enrichment_request(request_id) ON DELETE CASCADE,
+  provider TEXT,
+  model TEXT,
+  batch_size INT,
+  status TEXT,
+  queue_wait_ms NUMERIC,
+  fetch_ms NUMERIC,
+  claim_ms NUMERIC,
+  cache_ms NUMERIC,
+  prompt_ms NUMERIC,
+  limiter_ms NUMERIC,
+  http_ms NUMERIC,
+  parse_ms NUMERIC,
+  rules_ms NUMERIC,
+  persist_ms NUMERIC,
+  total_ms NUMERIC,
+  recorded_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS enrichment_timing_recorded_idx
+  ON enrichment_timing (recorded_at);
+
+CREATE TABLE IF NOT EXISTS enrichment_brand_cache (
+  brand_key TEXT PRIMARY KEY,
+  website_url TEXT,
+  social JSONB,
+  source_request_id TEXT REFERENCES enrichment_request(request_id) ON DELETE SET NULL,
+  source_provider TEXT,
+  source_model TEXT,
+  source_businesses TEXT[] NOT NULL DEFAULT '{}',
+  hits INT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
 CREATE TABLE IF NOT EXISTS business_facts (
   business_id TEXT PRIMARY KEY REFERENCES places_clean(place_id) ON DELETE CASCADE,
   size_class TEXT CHECK (size_class IN ('micro','piccola','media','grande')),